@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark of the REST API status listing with and without ``USER_TASKS_FAST_STATUS_LIST``.
+
+Not collected by default; run it explicitly with ``make benchmark`` or::
+
+    pytest tests/benchmark_status_list.py -s --no-cov
+"""
+
+import timeit
+from uuid import uuid4
+
+from django.contrib import auth
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from user_tasks.models import UserTaskArtifact, UserTaskStatus
+
+User = auth.get_user_model()
+
+REPEATS = 5
+
+
+class BenchmarkStatusList(TestCase):
+    """
+    Timing of status listings serialized from model instances and from database rows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Create a superuser who can list all the statuses.
+        """
+        super().setUpTestData()
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def test_100_rows(self):
+        """Compare the serialization paths for 100 statuses."""
+        self._compare(100)
+
+    def test_1000_rows(self):
+        """Compare the serialization paths for 1,000 statuses."""
+        self._compare(1000)
+
+    def _compare(self, rows):
+        """
+        Create the given number of statuses with two artifacts each, then time listing them both ways.
+        """
+        statuses = UserTaskStatus.objects.bulk_create([
+            UserTaskStatus(user=self.user, task_id=str(uuid4()), task_class='benchmark.task', name=f'Task {index}',
+                           total_steps=5)
+            for index in range(rows)
+        ])
+        UserTaskArtifact.objects.bulk_create([
+            UserTaskArtifact(status=status, name=name, url='https://example.com/')
+            for status in statuses for name in ('Output', 'Log')
+        ])
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('usertaskstatus-list')
+        results = {}
+        for fast in (False, True):
+            with override_settings(USER_TASKS_FAST_STATUS_LIST=fast):
+                content = client.get(url).content
+                seconds = min(timeit.repeat(lambda: client.get(url), number=1, repeat=REPEATS))
+            results[fast] = (content, seconds)
+        assert results[True][0] == results[False][0]
+        print(f'\n{rows} statuses: serializer {results[False][1] * 1000:.1f} ms, '
+              f'rows {results[True][1] * 1000:.1f} ms ({results[False][1] / results[True][1]:.1f}x)')
@@ -6,6 +6,7 @@ import pytest
 from celery import Celery
 
 from django.conf import settings
+from django.core.cache import caches
 
 
 @pytest.fixture(autouse=True, scope='session')
@@ -18,6 +19,16 @@ def start_celery_app():
     app.config_from_object('django.conf:settings')
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Clear the caches after each test, so that state cached by one test can't affect another.
+    """
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
 @pytest.fixture(autouse=True, scope='session')
 def manage_temp_dirs():
     """
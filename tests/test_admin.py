@@ -3,10 +3,14 @@
 Tests for the ``django-user-tasks`` admin module.
 """
 
+from uuid import uuid4
+
 from django.contrib import auth
 from django.test import TestCase
 from django.urls import reverse
 
+from user_tasks.models import UserTaskStatus, UserTaskTombstone
+
 User = auth.get_user_model()
 
 
@@ -38,3 +42,31 @@ class AdminTestCase(TestCase):
         """
         response = self.client.get(reverse('admin:user_tasks_usertaskstatus_changelist'))
         assert response.status_code == 200
+
+    def test_archived_artifact_list(self):
+        """
+        Make sure the main ArchivedUserTaskArtifact admin page loads.
+        """
+        response = self.client.get(reverse('admin:user_tasks_archivedusertaskartifact_changelist'))
+        assert response.status_code == 200
+
+    def test_archived_status_list(self):
+        """
+        Make sure the main ArchivedUserTaskStatus admin page loads.
+        """
+        response = self.client.get(reverse('admin:user_tasks_archivedusertaskstatus_changelist'))
+        assert response.status_code == 200
+
+    def test_status_bulk_delete(self):
+        """
+        Make sure statuses deleted via the admin bulk action leave tombstones.
+        """
+        status = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_admin.sample_task', name='SampleTask',
+            total_steps=5)
+        response = self.client.post(reverse('admin:user_tasks_usertaskstatus_changelist'), {
+            'action': 'delete_selected', '_selected_action': [status.pk], 'post': 'yes',
+        })
+        assert response.status_code == 302
+        assert not UserTaskStatus.objects.exists()
+        assert list(UserTaskTombstone.objects.values_list('uuid', flat=True)) == [status.uuid]
@@ -0,0 +1,96 @@
+"""
+Tests for the ``django-user-tasks`` management commands.
+"""
+
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from uuid import uuid4
+
+from django.contrib import auth
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from user_tasks.archive import archive_statuses
+from user_tasks.models import UserTaskArtifact, UserTaskStatus
+from user_tasks.tasks import purge_old_user_tasks
+
+User = auth.get_user_model()
+
+
+class TestSweepUserTaskArtifactFiles(TestCase):
+    """
+    Tests of the command which deletes orphaned artifact files.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('test_user', 'test@example.com', 'password')
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.storage = FileSystemStorage(location=directory.name)
+        patcher = mock.patch.object(UserTaskArtifact._meta.get_field('file'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sweep(self):
+        """Only old files which aren't referenced by any artifact should be deleted."""
+        status = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_commands.sample_task', name='SampleTask',
+            total_steps=1, state=UserTaskStatus.SUCCEEDED)
+        artifact = UserTaskArtifact.objects.create(status=status, file=ContentFile(b'Data', name='live.txt'))
+        archived_status = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_commands.sample_task', name='SampleTask',
+            total_steps=1, state=UserTaskStatus.SUCCEEDED)
+        archived = UserTaskArtifact.objects.create(
+            status=archived_status, file=ContentFile(b'Data', name='archived.txt'))
+        UserTaskStatus.objects.filter(pk=status.pk).update(modified=now() + timedelta(hours=1))
+        archive_statuses(now() + timedelta(seconds=1), 10)
+        orphan = self.storage.save('user_tasks/2020/01/01/orphan.txt', ContentFile(b'Data'))
+        recent = self.storage.save('user_tasks/2020/01/02/recent.txt', ContentFile(b'Data'))
+        old = (now() - timedelta(days=2)).timestamp()
+        for name in (artifact.file.name, archived.file.name, orphan):
+            os.utime(self.storage.path(name), (old, old))
+
+        out = StringIO()
+        call_command('sweep_user_task_artifact_files', dry_run=True, stdout=out)
+        assert out.getvalue().splitlines() == [orphan, 'Found 1 orphaned user task artifact files']
+        assert self.storage.exists(orphan)
+
+        call_command('sweep_user_task_artifact_files', batch_size=1, stdout=StringIO())
+        assert not self.storage.exists(orphan)
+        assert self.storage.exists(recent)
+        assert self.storage.exists(artifact.file.name)
+        assert self.storage.exists(archived.file.name)
+
+    def test_sweep_exports(self):
+        """Exports of purged records saved in the same storage as the artifact files shouldn't be swept."""
+        status = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_commands.sample_task', name='SampleTask',
+            total_steps=1, state=UserTaskStatus.SUCCEEDED)
+        UserTaskStatus.objects.filter(pk=status.pk).update(created=now() - timedelta(days=31))
+        with override_settings(USER_TASKS_EXPORT_STORAGE='django.core.files.storage.FileSystemStorage',
+                               MEDIA_ROOT=self.storage.location):
+            export = purge_old_user_tasks()['export']
+        assert self.storage.exists(export)
+        old = (now() - timedelta(days=2)).timestamp()
+        os.utime(self.storage.path(export), (old, old))
+        out = StringIO()
+        call_command('sweep_user_task_artifact_files', stdout=out)
+        assert out.getvalue() == 'Deleted 0 orphaned user task artifact files\n'
+        assert self.storage.exists(export)
+
+    def test_empty_storage(self):
+        """The command should cope with there not being any artifact files at all."""
+        out = StringIO()
+        call_command('sweep_user_task_artifact_files', stdout=out)
+        assert out.getvalue() == 'Deleted 0 orphaned user task artifact files\n'
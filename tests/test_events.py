@@ -0,0 +1,101 @@
+"""
+Tests for the task status event publish/subscribe backends.
+"""
+
+from unittest import mock
+from uuid import uuid4
+
+from django.contrib import auth
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from user_tasks.events import CacheEventBackend, LocalEventBackend, get_backend
+from user_tasks.models import UserTaskStatus
+
+User = auth.get_user_model()
+
+
+class TestLocalEventBackend(TestCase):
+    """
+    Tests of the in-process event backend.
+    """
+
+    def test_publish(self):
+        """Events should be delivered only to current subscribers to the matching user's channel."""
+        backend = LocalEventBackend()
+        backend.publish(1, {'number': 0})
+        subscription = backend.subscribe(1)
+        other_subscription = backend.subscribe(2)
+        backend.publish(1, {'number': 1})
+        backend.publish(1, {'number': 2})
+        assert subscription.get(0) == [{'number': 1}, {'number': 2}]
+        assert not subscription.get(0)
+        assert not other_subscription.get(0)
+        subscription.close()
+        other_subscription.close()
+        backend.publish(1, {'number': 3})
+        assert not subscription.get(0)
+        assert not backend._subscriptions  # pylint: disable=protected-access
+
+
+class TestCacheEventBackend(TestCase):
+    """
+    Tests of the event backend which passes events through the cache.
+    """
+
+    def test_publish(self):
+        """Events published after subscribing should be received by each subscriber to the user's channel."""
+        backend = CacheEventBackend()
+        backend.publish(1, {'number': 0})
+        subscription = backend.subscribe(1)
+        other_subscription = backend.subscribe(2)
+        backend.publish(1, {'number': 1})
+        backend.publish(1, {'number': 2})
+        backend.publish(2, {'number': 3})
+        assert subscription.get(0) == [{'number': 1}, {'number': 2}]
+        assert other_subscription.get(0) == [{'number': 3}]
+        subscription.close()
+
+    @mock.patch('user_tasks.events.time.sleep')
+    @mock.patch('user_tasks.events.time.monotonic', side_effect=[100, 100, 101])
+    def test_timeout(self, _mock_monotonic, mock_sleep):
+        """Subscribers should stop waiting for events once the timeout expires."""
+        subscription = CacheEventBackend().subscribe(1)
+        assert not subscription.get(1)
+        mock_sleep.assert_called_once_with(0.5)
+
+
+class TestStatusEvents(TestCase):
+    """
+    Tests of the events published when task statuses change.
+    """
+
+    @override_settings(USER_TASKS_EVENT_BACKEND='user_tasks.events.LocalEventBackend')
+    def test_status_changes(self):
+        """Each committed change to a status should publish an event describing its progress."""
+        user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        subscription = get_backend().subscribe(user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            status = UserTaskStatus.objects.create(
+                user=user, task_id=str(uuid4()), task_class='test_events.sample_task', name='SampleTask',
+                total_steps=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            status.start()
+            status.increment_completed_steps(2)
+        events = subscription.get(0)
+        subscription.close()
+        assert [event['state'] for event in events] == ['Pending', 'In Progress', 'In Progress']
+        assert events[-1] == {
+            'uuid': str(status.uuid), 'state': 'In Progress', 'completed_steps': 2, 'total_steps': 4,
+            'modified': status.modified.isoformat(),
+        }
+
+    def test_no_backend(self):
+        """No events should be published, or cache requests made for them, unless a backend is configured."""
+        user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        assert get_backend() is None
+        with self.captureOnCommitCallbacks(execute=True):
+            UserTaskStatus.objects.create(
+                user=user, task_id=str(uuid4()), task_class='test_events.sample_task', name='SampleTask',
+                total_steps=4)
+        assert caches['default'].get(f'user_tasks.events.{user.id}') is None
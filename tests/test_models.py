@@ -4,16 +4,24 @@ Tests for the `django-user-tasks` models module.
 """
 
 import logging
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 from uuid import uuid4
 
 import pytest
 
+from django.apps import apps
 from django.contrib import auth
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
 from user_tasks.exceptions import TaskCanceledException
-from user_tasks.models import UserTaskArtifact, UserTaskStatus
+from user_tasks.models import UserTaskArtifact, UserTaskStatus, UserTaskTombstone
 
 User = auth.get_user_model()
 
@@ -45,6 +53,71 @@ class TestUserTaskStatus(TestCase):
         status.cancel()
         assert status.state == UserTaskStatus.SUCCEEDED
 
+    @mock.patch('user_tasks.models.current_app')
+    def test_cancel_queryset(self, mock_app):
+        """Canceling many statuses at once should cancel only the unfinished ones, revoking tasks in one broadcast."""
+        parent = self._status(is_container=True, state=UserTaskStatus.PENDING)
+        child = self._status(parent=parent, state=UserTaskStatus.PENDING)
+        retrying = self._status(state=UserTaskStatus.RETRYING)
+        running = self._status()
+        finished = self._status(state=UserTaskStatus.SUCCEEDED)
+        statuses = UserTaskStatus.objects.filter(pk__in=[parent.pk, retrying.pk, running.pk, finished.pk])
+        with CaptureQueriesContext(connection) as queries:
+            canceled = statuses.cancel()
+        assert len([query for query in queries if query['sql'].startswith('UPDATE')]) == 1
+        assert {status.pk for status in canceled} == {parent.pk, child.pk, retrying.pk, running.pk}
+        mock_app.control.revoke.assert_called_once()
+        assert set(mock_app.control.revoke.call_args[0][0]) == {child.task_id, retrying.task_id}
+        states = dict(UserTaskStatus.objects.values_list('pk', 'state'))
+        assert states == {
+            parent.pk: UserTaskStatus.CANCELED,
+            child.pk: UserTaskStatus.CANCELED,
+            retrying.pk: UserTaskStatus.CANCELED,
+            running.pk: UserTaskStatus.CANCELED,
+            finished.pk: UserTaskStatus.SUCCEEDED,
+        }
+
+    def test_root(self):
+        """Nested statuses should record the outermost status containing them."""
+        parent = self._status(is_container=True)
+        child = self._status(parent=parent, is_container=True)
+        grandchild = self._status(parent=child)
+        assert parent.root_id is None
+        assert child.root_id == parent.pk
+        assert grandchild.root_id == parent.pk
+
+    def test_backfill_roots(self):
+        """The migration adding the root field should fill it in for existing nested statuses."""
+        parent = self._status(is_container=True)
+        child = self._status(parent=parent, is_container=True)
+        grandchild = self._status(parent=child)
+        UserTaskStatus.objects.update(root=None)
+        migration = import_module('user_tasks.migrations.0012_status_root')
+        with mock.patch.object(migration, 'BATCH_SIZE', 1):
+            migration.backfill_roots(apps, None)
+        roots = dict(UserTaskStatus.objects.values_list('pk', 'root_id'))
+        assert roots == {parent.pk: None, child.pk: parent.pk, grandchild.pk: parent.pk}
+
+    def test_artifact_user_root(self):
+        """New artifacts should get the user and root of their status."""
+        parent = self._status(is_container=True)
+        child = self._status(parent=parent)
+        artifact = UserTaskArtifact.objects.create(status=child, text='Lorem ipsum')
+        assert artifact.user_id == child.user_id
+        assert artifact.root_id == parent.pk
+        artifact = UserTaskArtifact.objects.create(status=parent, text='Lorem ipsum')
+        assert artifact.root_id == parent.pk
+
+    def test_bulk_create_artifacts(self):
+        """Artifacts created in bulk should also get the user and root of their status."""
+        parent = self._status(is_container=True)
+        child = self._status(parent=parent)
+        with self.assertNumQueries(2):
+            UserTaskArtifact.objects.bulk_create(
+                [UserTaskArtifact(status=status, text='Lorem ipsum') for status in (parent, child)])
+        values = set(UserTaskArtifact.objects.values_list('user_id', 'root_id'))
+        assert values == {(self.user.pk, parent.pk)}
+
     def test_fail_with_parent(self):
         """A task which fails should also mark any parent as having failed."""
         parent = self._status(is_container=True)
@@ -67,6 +140,17 @@ class TestUserTaskStatus(TestCase):
         assert status.completed_steps == 1
         assert parent.completed_steps == 1
 
+    def test_increment_completed_steps_cache_failure(self):
+        """An unavailable cache shouldn't make progress updates fail after they've been saved."""
+        status = self._status(total_steps=2)
+        with mock.patch('user_tasks.notifications._cache', side_effect=ConnectionError):
+            with self.assertLogs('user_tasks.notifications', logging.ERROR):
+                with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                    status.increment_completed_steps()
+        assert callbacks
+        status.refresh_from_db()
+        assert status.completed_steps == 1
+
     def test_increment_completed_steps_explicit_steps(self):
         """increment_completed_steps() should support explicit step counts greater than 1."""
         status = self._status(total_steps=5)
@@ -191,6 +275,15 @@ class TestUserTaskStatus(TestCase):
         assert parent.state == UserTaskStatus.SUCCEEDED
         assert parent.completed_steps == child1.total_steps + child2.total_steps
 
+    def test_delete(self):
+        """Deleting a status should leave tombstones for it and the statuses nested inside it."""
+        parent = self._status(is_container=True)
+        status = self._status(parent=parent)
+        self._status()
+        parent.delete()
+        assert set(UserTaskTombstone.objects.values_list('uuid', flat=True)) == {parent.uuid, status.uuid}
+        assert UserTaskStatus.objects.count() == 1
+
     def _status(self, **kwargs):
         """Generate a sample UserTaskStatus instance, optionally overriding fields with keyword arguments."""
         data = {
@@ -243,3 +336,77 @@ class TestUserTaskArtifact(TestCase):
             'task_id': str(uuid4()), 'total_steps': 5, 'user': self.user}
         data.update(kwargs)
         return UserTaskStatus.objects.create(**data)
+
+
+class TestSystemChecks(TestCase):
+    """
+    Tests of Django's system checks of the models, which pytest-django doesn't run on its own.
+    """
+
+    def test_check(self):
+        """The models (including their index names) should pass the system checks run by migrate and runserver."""
+        call_command('check', stdout=StringIO(), stderr=StringIO())
+
+
+class TestArtifactMigrations(TransactionTestCase):
+    """
+    Tests of the migrations filling in the user and root fields of artifacts and statuses.
+    """
+
+    migrate_from = [('user_tasks', '0013_artifact_user_root')]
+
+    def tearDown(self):
+        super().tearDown()
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill_artifacts(self):
+        """The user and root of existing artifacts should be filled in before the fields are made required."""
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        old_apps = executor.loader.project_state(self.migrate_from).apps
+        user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        status_model = old_apps.get_model('user_tasks', 'UserTaskStatus')
+        artifact_model = old_apps.get_model('user_tasks', 'UserTaskArtifact')
+        parent = status_model.objects.create(
+            user_id=user.pk, task_id=str(uuid4()), task_class='test_models.sample_task', name='SampleTask',
+            state=UserTaskStatus.IN_PROGRESS, total_steps=5, is_container=True)
+        child = status_model.objects.create(
+            user_id=user.pk, task_id=str(uuid4()), task_class='test_models.sample_task', name='SampleTask',
+            state=UserTaskStatus.IN_PROGRESS, total_steps=5, parent=parent, root=parent)
+        for status in (parent, child):
+            artifact_model.objects.create(status=status, text='Lorem ipsum')
+        migration = import_module('user_tasks.migrations.0013_artifact_user_root')
+        with mock.patch.object(migration, 'BATCH_SIZE', 1):
+            migration.backfill_artifacts(old_apps, None)
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        values = set(UserTaskArtifact.objects.values_list('user_id', 'root_id'))
+        assert values == {(user.pk, parent.pk)}
+
+    def test_recompute_roots(self):
+        """Statuses and artifacts of chords saved with missing or wrong roots should be corrected."""
+        user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        chord = UserTaskStatus.objects.create(
+            user=user, task_id=str(uuid4()), task_class='celery.chord', name='Chord', total_steps=2,
+            is_container=True)
+        group = UserTaskStatus.objects.create(
+            user=user, task_id=str(uuid4()), task_class='celery.group', name='Group', total_steps=2,
+            is_container=True, parent=chord)
+        tasks = [
+            UserTaskStatus.objects.create(
+                user=user, task_id=str(uuid4()), task_class='test_models.sample_task', name='SampleTask',
+                total_steps=1, parent=group)
+            for _ in range(2)
+        ]
+        for status in [chord, group] + tasks:
+            UserTaskArtifact.objects.create(status=status, text='Lorem ipsum')
+        # As saved by the chord signal handler before the group's root was saved along with its parent
+        UserTaskStatus.objects.filter(pk=group.pk).update(root=None)
+        UserTaskStatus.objects.filter(pk__in=[task.pk for task in tasks]).update(root=group)
+        UserTaskArtifact.objects.exclude(status=chord).update(root=group)
+        migration = import_module('user_tasks.migrations.0015_recompute_roots')
+        with mock.patch.object(migration, 'BATCH_SIZE', 1):
+            migration.recompute_roots(apps, None)
+        assert set(UserTaskStatus.objects.exclude(pk=chord.pk).values_list('root_id', flat=True)) == {chord.pk}
+        assert set(UserTaskArtifact.objects.values_list('root_id', flat=True)) == {chord.pk}
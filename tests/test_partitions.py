@@ -0,0 +1,177 @@
+"""
+Tests for the monthly partitioning of the user task tables on PostgreSQL.
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+
+from django.contrib import auth
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from user_tasks.models import UserTaskArtifact, UserTaskStatus, UserTaskTombstone
+from user_tasks.partitions import (create_partitions, drop_expired_partitions, drop_partitions, month_start,
+                                   partition_name, partitioning_enabled)
+
+TABLE = 'user_tasks_partition_test'
+
+User = auth.get_user_model()
+
+
+class TestPartitionHelpers(TestCase):
+    """
+    Tests of the database-independent partition helper functions.
+    """
+
+    def test_month_start(self):
+        """month_start() should find the start of the UTC month, moving across years as needed."""
+        moment = datetime(2024, 11, 17, 12, 30, tzinfo=timezone.utc)
+        assert month_start(moment) == datetime(2024, 11, 1, tzinfo=timezone.utc)
+        assert month_start(moment, 2) == datetime(2025, 1, 1, tzinfo=timezone.utc)
+        assert month_start(moment, -11) == datetime(2023, 12, 1, tzinfo=timezone.utc)
+
+    def test_partition_name(self):
+        """Partition names should identify the table and month."""
+        assert partition_name('table', datetime(2024, 3, 1, tzinfo=timezone.utc)) == 'table_p202403'
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'Only applies to databases other than PostgreSQL')
+    @override_settings(USER_TASKS_PARTITIONED=True)
+    def test_command_requires_postgresql(self):
+        """The partition creation command should refuse to run on other databases."""
+        assert not partitioning_enabled()
+        with pytest.raises(CommandError):
+            call_command('create_user_task_partitions')
+
+    def test_command_requires_setting(self):
+        """The partition creation command should refuse to run unless partitioning is enabled."""
+        with pytest.raises(CommandError):
+            call_command('create_user_task_partitions')
+
+
+class TestDropExpiredPartitions(TestCase):
+    """
+    Tests of the cleanup around dropping the partitions of the user task tables, with the partitions themselves mocked.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('test_user', 'test@example.com', 'password')
+
+    @mock.patch('user_tasks.partitions.drop_partitions', return_value=['user_tasks_usertaskstatus_p202411'])
+    def test_cleanup(self, mock_drop_partitions):
+        """
+        Records in later partitions which depend on dropped statuses should be deleted, and the dropped ones cleaned up.
+        """
+        limit = datetime(2025, 1, 15, tzinfo=timezone.utc)
+        old = datetime(2024, 11, 30, tzinfo=timezone.utc)
+        dropped = self._status(old)
+        artifact = UserTaskArtifact.objects.create(status=dropped, file=ContentFile(b'Old', name='old.txt'))
+        UserTaskArtifact.objects.filter(pk=artifact.pk).update(created=old)
+        late_artifact = self._status(old)
+        UserTaskArtifact.objects.create(status=late_artifact, text='Lorem ipsum')
+        late_child = self._status(old)
+        self._status(old + timedelta(days=40), parent=late_child)
+        kept = self._status(limit)
+        storage = UserTaskArtifact._meta.get_field('file').storage
+        with self.captureOnCommitCallbacks(execute=True):
+            assert drop_expired_partitions(limit, 2) == ['user_tasks_usertaskstatus_p202411']
+        assert mock_drop_partitions.call_args[0][0] == limit
+        # The partitions weren't really dropped, so only the statuses with later dependents are gone
+        assert set(UserTaskStatus.objects.all()) == {dropped, kept}
+        assert UserTaskTombstone.objects.count() == 4
+        assert not storage.exists(artifact.file.name)
+
+    @mock.patch('user_tasks.partitions.delete_artifact_files')
+    @mock.patch('user_tasks.partitions.drop_partitions', return_value=['user_tasks_usertaskartifact_p202411'])
+    def test_file_batches(self, _mock_drop_partitions, mock_delete_files):
+        """Artifact files should be deleted a batch at a time, once the partitions have been dropped."""
+        old = datetime(2024, 11, 30, tzinfo=timezone.utc)
+        status = self._status(old)
+        for index in range(3):
+            artifact = UserTaskArtifact.objects.create(status=status, file=ContentFile(b'Old', name=f'old{index}.txt'))
+            UserTaskArtifact.objects.filter(pk=artifact.pk).update(created=old)
+        names = list(UserTaskArtifact.objects.order_by('pk').values_list('file', flat=True))
+        with self.captureOnCommitCallbacks() as callbacks:
+            drop_expired_partitions(datetime(2025, 1, 15, tzinfo=timezone.utc), 2)
+        assert not mock_delete_files.called
+        for callback in callbacks:
+            callback()
+        assert [call[0][0] for call in mock_delete_files.call_args_list] == [names[:2], names[2:]]
+        for name in names:
+            UserTaskArtifact._meta.get_field('file').storage.delete(name)
+
+    @mock.patch('user_tasks.partitions.drop_partitions', side_effect=DatabaseError)
+    def test_drop_failure(self, _mock_drop_partitions):
+        """Tombstones recorded before the partitions failed to be dropped should be kept."""
+        self._status(datetime(2024, 11, 30, tzinfo=timezone.utc))
+        with pytest.raises(DatabaseError):
+            drop_expired_partitions(datetime(2025, 1, 15, tzinfo=timezone.utc), 2)
+        assert UserTaskTombstone.objects.count() == 1
+
+    def _status(self, created, **kwargs):
+        """
+        Create a UserTaskStatus with the given creation time.
+        """
+        status = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_partitions.sample_task', name='SampleTask',
+            total_steps=5, **kwargs)
+        UserTaskStatus.objects.filter(pk=status.pk).update(created=created)
+        return status
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Table partitioning is only supported on PostgreSQL')
+class TestPostgresPartitions(TransactionTestCase):
+    """
+    Tests of creating and dropping partitions, using a scratch partitioned table.
+    """
+
+    def setUp(self):
+        super().setUp()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {TABLE} (id serial, created timestamp with time zone NOT NULL) '
+                'PARTITION BY RANGE (created)'
+            )
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {TABLE}')
+        super().tearDown()
+
+    def test_create_partitions(self):
+        """Missing partitions should be created for each requested month."""
+        start = datetime(2024, 11, 17, tzinfo=timezone.utc)
+        assert create_partitions(start, 3, tables=[TABLE]) == [
+            f'{TABLE}_p202411', f'{TABLE}_p202412', f'{TABLE}_p202501'
+        ]
+        assert create_partitions(start, 4, tables=[TABLE]) == [f'{TABLE}_p202502']
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLE} (created) VALUES ('2025-01-31T23:59:59Z')")
+            cursor.execute(f'SELECT COUNT(*) FROM {TABLE}_p202501')
+            assert cursor.fetchone()[0] == 1
+
+    def test_drop_partitions(self):
+        """Only partitions containing nothing newer than the limit should be dropped."""
+        create_partitions(datetime(2024, 11, 1, tzinfo=timezone.utc), 3, tables=[TABLE])
+        dropped = drop_partitions(datetime(2025, 1, 15, tzinfo=timezone.utc), tables=[TABLE])
+        assert dropped == [f'{TABLE}_p202411', f'{TABLE}_p202412']
+        assert not create_partitions(datetime(2025, 1, 1, tzinfo=timezone.utc), 1, tables=[TABLE])
+
+    @override_settings(USER_TASKS_PARTITIONED=True)
+    def test_command(self):
+        """The management command should create partitions of the user task tables."""
+        path = 'user_tasks.management.commands.create_user_task_partitions.create_partitions'
+        with mock.patch(path, return_value=['x_p202401']) as mocked:
+            out = StringIO()
+            call_command('create_user_task_partitions', months=2, stdout=out)
+        assert mocked.call_args[0][1] == 2
+        assert 'x_p202401' in out.getvalue()
@@ -11,14 +11,21 @@ from uuid import uuid4
 import rules
 
 from django.contrib import auth
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now
 
+from rest_framework.permissions import BasePermission, IsAuthenticated
 from rest_framework.test import APITestCase
 
-from user_tasks.models import UserTaskArtifact, UserTaskStatus
+from user_tasks.archive import archive_statuses
+from user_tasks.models import ArchivedUserTaskArtifact, ArchivedUserTaskStatus, UserTaskArtifact, UserTaskStatus
 from user_tasks.rules import add_rules
 from user_tasks.serializers import ArtifactSerializer, StatusSerializer
+from user_tasks.views import StatusViewSet
 
 User = auth.get_user_model()
 
@@ -41,6 +48,15 @@ def _data(response):
     return response.data
 
 
+class OwnerOnly(BasePermission):
+    """
+    Object permission which denies access to records of other users' tasks, rather than hiding them.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        return obj.user_id == request.user.id
+
+
 class TestRestApi(APITestCase):
     """
     Tests of the REST API calls.
@@ -54,7 +70,7 @@ class TestRestApi(APITestCase):
     @classmethod
     def tearDownClass(cls):
         super().tearDownClass()
-        rules.rulesets.default_rules.clear()
+        rules.permissions.permissions.clear()
 
     @classmethod
     def setUpTestData(cls):
@@ -178,6 +194,39 @@ class TestRestApi(APITestCase):
         self.status.refresh_from_db()
         assert self.status.state == UserTaskStatus.PENDING
 
+    def test_status_bulk_cancel(self):
+        """Users should be able to cancel many of their tasks in one request."""
+        self._login(self.user)
+        other_status = UserTaskStatus.objects.create(
+            user=self.other_user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 3',
+            total_steps=5)
+        url = reverse('usertaskstatus-bulk-cancel')
+        assert url == reverse('usertaskstatus-list') + 'cancel/'
+        response = self.client.post(url, {'uuids': [str(self.status.uuid), str(other_status.uuid)]}, format='json')
+        assert response.status_code == 200
+        assert _data(response) == {'canceled': [str(self.status.uuid)]}
+        other_status.refresh_from_db()
+        assert other_status.state == UserTaskStatus.PENDING
+        response = self.client.post(url, {'state': UserTaskStatus.PENDING}, format='json')
+        assert _data(response) == {'canceled': [str(self.older_status.uuid)]}
+        assert self.client.post(url, {}, format='json').status_code == 400
+
+    def test_status_bulk_cancel_superuser(self):
+        """Superusers should be able to cancel any tasks in bulk."""
+        self._login(self.superuser)
+        response = self.client.post(
+            reverse('usertaskstatus-bulk-cancel'), {'state': [UserTaskStatus.PENDING]}, format='json')
+        assert response.status_code == 200
+        assert set(_data(response)['canceled']) == {str(self.status.uuid), str(self.older_status.uuid)}
+
+    def test_status_bulk_cancel_anonymous(self):
+        """Anonymous users should be unable to cancel tasks in bulk."""
+        response = self.client.post(
+            reverse('usertaskstatus-bulk-cancel'), {'state': UserTaskStatus.PENDING}, format='json')
+        assert response.status_code == 403
+        self.status.refresh_from_db()
+        assert self.status.state == UserTaskStatus.PENDING
+
     def test_status_delete(self):
         """Users should be able to delete their own task status records when they're done with them."""
         self._login(self.user)
@@ -185,6 +234,20 @@ class TestRestApi(APITestCase):
         assert response.status_code == 204
         assert not UserTaskStatus.objects.filter(pk=self.status.id).exists()
 
+    def test_status_delete_files(self):
+        """Deleting a status record should also delete the files of its and its children's artifacts."""
+        child = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 2',
+            total_steps=5, parent=self.status)
+        artifact = UserTaskArtifact.objects.create(status=child, file=ContentFile(b'Data', name='child.txt'))
+        storage = UserTaskArtifact._meta.get_field('file').storage
+        assert storage.exists(artifact.file.name)
+        self._login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('usertaskstatus-detail', args=[self.status.uuid]))
+        assert response.status_code == 204
+        assert not storage.exists(artifact.file.name)
+
     def test_status_delete_anonymous(self):
         """Anonymous users should not be able to delete task status records."""
         response = self.client.delete(reverse('usertaskstatus-detail', args=[self.status.uuid]))
@@ -262,8 +325,879 @@ class TestRestApi(APITestCase):
         assert response.status_code == 200
         assert _data(response) == []
 
+    def test_status_list_queries(self):
+        """The number of queries needed to list statuses shouldn't depend on how many there are."""
+        self._login(self.user)
+        for index in range(10):
+            status = UserTaskStatus.objects.create(
+                user=self.user, task_id=str(uuid4()), task_class='test_rest_api.sample_task',
+                name=f'SampleTask {index + 3}', total_steps=5)
+            UserTaskArtifact.objects.create(status=status, text='Lorem ipsum')
+            UserTaskArtifact.objects.create(status=status, url='https://example.com/')
+        # One query for the listing's ETag, one for the statuses, and one for their artifacts
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('usertaskstatus-list'))
+        assert len(_data(response)) == 12
+        assert len(_data(response)[0]['artifacts']) == 2
+
+    def test_status_list_uuids(self):
+        """Clients should be able to fetch just the statuses with the given UUIDs in a single request."""
+        self._login(self.user)
+        other_status = UserTaskStatus.objects.create(
+            user=self.other_user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 3',
+            total_steps=5)
+        uuids = ','.join(str(uuid) for uuid in (self.older_status.uuid, other_status.uuid, uuid4()))
+        response = self.client.get(reverse('usertaskstatus-list'), {'uuid': uuids})
+        assert response.status_code == 200
+        serializer = StatusSerializer([self.older_status], context=_context(response), many=True)
+        assert _data(response) == serializer.data
+        response = self.client.get(reverse('usertaskstatus-list'), {'uuid': 'garbage'})
+        assert response.status_code == 400
+
+    def test_status_list_filters(self):
+        """Clients should be able to list only the statuses matching the given query parameters."""
+        self._login(self.user)
+        self.status.start()
+        child = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_rest_api.other_task', name='SampleTask 3',
+            total_steps=5, parent=self.older_status)
+        UserTaskStatus.objects.filter(pk=self.older_status.pk).update(is_container=True)
+        url = reverse('usertaskstatus-list')
+
+        def names(params):
+            response = self.client.get(url, params)
+            assert response.status_code == 200
+            return [item['name'] for item in _data(response)]
+
+        assert names({'state': UserTaskStatus.IN_PROGRESS}) == ['SampleTask 2']
+        assert names({'state__in': f'{UserTaskStatus.IN_PROGRESS},{UserTaskStatus.PENDING}'}) == [
+            'SampleTask 3', 'SampleTask 2', 'SampleTask 1']
+        assert names({'created__lt': self.status.created.isoformat()}) == ['SampleTask 1']
+        assert names({'created__gte': self.status.created.isoformat()}) == ['SampleTask 3', 'SampleTask 2']
+        assert names({'task_class': child.task_class}) == ['SampleTask 3']
+        assert names({'is_container': 'true'}) == ['SampleTask 1']
+        assert names({'root_only': 'true', 'is_container': 'false'}) == ['SampleTask 2']
+        assert names({'root_only': 'false'}) == ['SampleTask 3', 'SampleTask 2', 'SampleTask 1']
+        assert self.client.get(url, {'created__gte': 'yesterday'}).status_code == 400
+        assert self.client.get(url, {'root_only': 'maybe'}).status_code == 400
+
+    def test_status_lookup(self):
+        """Clients should be able to fetch statuses by UUIDs listed in a POST body."""
+        self._login(self.user)
+        other_status = UserTaskStatus.objects.create(
+            user=self.other_user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 3',
+            total_steps=5)
+        uuids = [str(self.status.uuid), str(self.older_status.uuid), str(other_status.uuid)]
+        url = reverse('usertaskstatus-lookup')
+        # One query for the statuses and one for their artifacts
+        with self.assertNumQueries(2):
+            response = self.client.post(url, {'uuids': uuids}, format='json')
+        assert response.status_code == 200
+        serializer = StatusSerializer(
+            [self.status, self.older_status], context=_context(response), many=True)
+        assert _data(response) == serializer.data
+        assert self.client.post(url, {'uuids': 'garbage'}, format='json').status_code == 400
+        with override_settings(USER_TASKS_MAX_PAGE_SIZE=2):
+            assert self.client.post(url, {'uuids': uuids}, format='json').status_code == 400
+
+    def test_status_lookup_anonymous(self):
+        """Anonymous users should be unable to look up task status records."""
+        response = self.client.post(
+            reverse('usertaskstatus-lookup'), {'uuids': [str(self.status.uuid)]}, format='json')
+        assert response.status_code == 403
+
+    def test_status_list_fast(self):
+        """Listing statuses from database rows should produce exactly the same output in as few queries."""
+        self._login(self.user)
+        UserTaskArtifact.objects.create(status=self.status, url='https://example.com/')
+        url = reverse('usertaskstatus-list')
+        for params in ({}, {'fields': 'artifacts,state_text,created'}, {'uuid': str(self.older_status.uuid)}):
+            expected = self.client.get(url, params).content
+            with override_settings(USER_TASKS_FAST_STATUS_LIST=True):
+                # One query for the listing's ETag, one for the statuses, and one for their artifacts
+                with self.assertNumQueries(3):
+                    response = self.client.get(url, params)
+            assert response.status_code == 200
+            assert response.content == expected
+
+    def test_artifact_list_queries(self):
+        """The number of queries needed to list artifacts shouldn't depend on how many there are."""
+        self._login(self.user)
+        for _ in range(10):
+            status = UserTaskStatus.objects.create(
+                user=self.user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask',
+                total_steps=5)
+            UserTaskArtifact.objects.create(status=status, text='Lorem ipsum')
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('usertaskartifact-list'))
+        assert len(_data(response)) == 11
+
+    def test_status_detail_not_modified(self):
+        """Unchanged statuses should be revalidated with a single query, and changes should invalidate the ETag."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-detail', args=[self.status.uuid])
+        response = self.client.get(url)
+        etag = response['ETag']
+        assert response['Last-Modified']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        UserTaskArtifact.objects.create(status=self.status, text='Consectetur')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert len(_data(response)['artifacts']) == 2
+        etag = response['ETag']
+        self.status.increment_completed_steps()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert _data(response)['completed_steps'] == 1
+
+    def test_status_detail_if_modified_since(self):
+        """Statuses unchanged since the client's copy should get a 304 response."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-detail', args=[self.status.uuid])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+    def test_status_detail_not_modified_other_user(self):
+        """Users shouldn't be able to revalidate statuses of other users' tasks."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-detail', args=[self.status.uuid])
+        etag = self.client.get(url)['ETag']
+        self._login(self.other_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 404
+
+    def test_status_list_not_modified(self):
+        """Unchanged status listings should be revalidated with a single query, without counting or joining records."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-list')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert len(queries) == 1
+        assert 'COUNT' not in queries[0]['sql']
+        assert 'JOIN' not in queries[0]['sql']
+        UserTaskArtifact.objects.create(status=self.older_status, text='Consectetur')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        etag = response['ETag']
+        self.older_status.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert len(_data(response)) == 1
+
+    def test_status_list_not_modified_filtered(self):
+        """Statuses which stop matching a listing's filters should invalidate its ETag."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-list')
+        response = self.client.get(url, {'state': UserTaskStatus.PENDING})
+        assert len(_data(response)) == 2
+        etag = response['ETag']
+        self.status.succeed()
+        response = self.client.get(url, {'state': UserTaskStatus.PENDING}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert len(_data(response)) == 1
+
+    def test_status_list_not_modified_other_users(self):
+        """Changes to other users' tasks shouldn't invalidate a user's status listing."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-list')
+        etag = self.client.get(url)['ETag']
+        UserTaskStatus.objects.create(
+            user=self.other_user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 3',
+            total_steps=5)
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        assert self.client.get(url, {'archived': 'true'}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    @override_settings(USER_TASKS_FINISHED_MAX_AGE=3600)
+    def test_status_detail_finished(self):
+        """Finished statuses should be cacheable by clients and served from the server's cache."""
+        self._login(self.user)
+        self.status.succeed()
+        url = reverse('usertaskstatus-detail', args=[self.status.uuid])
+        expected = self.client.get(url)
+        assert expected['Cache-Control'] == 'private, max-age=3600'
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        assert response.content == expected.content
+        assert response['Cache-Control'] == 'private, max-age=3600'
+        assert response['ETag'] == expected['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=expected['ETag'])
+        assert response.status_code == 304
+        self._login(self.other_user)
+        assert self.client.get(url).status_code == 404
+
+    @override_settings(USER_TASKS_FINISHED_MAX_AGE=3600)
+    def test_status_detail_finished_denied(self):
+        """Cached statuses denied by a permission class should be reported as not found, like uncached ones."""
+        self._login(self.user)
+        self.status.succeed()
+        url = reverse('usertaskstatus-detail', args=[self.status.uuid])
+        assert self.client.get(url).status_code == 200
+        self._login(self.other_user)
+        with mock.patch.object(StatusViewSet, 'permission_classes', (IsAuthenticated, OwnerOnly)):
+            with self.assertNumQueries(0):
+                assert self.client.get(url).status_code == 404
+
+    @override_settings(USER_TASKS_FINISHED_MAX_AGE=3600, USER_TASKS_FILE_URL_TIMEOUT=600)
+    def test_artifact_detail_finished_max_age(self):
+        """Clients shouldn't cache artifacts for longer than their file URLs are cached on the server."""
+        self._login(self.user)
+        url = reverse('usertaskartifact-detail', args=[self.artifact.uuid])
+        assert self.client.get(url)['Cache-Control'] == 'private, max-age=600'
+        assert self.client.get(url)['Cache-Control'] == 'private, max-age=600'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.status.succeed()
+        status_url = reverse('usertaskstatus-detail', args=[self.status.uuid])
+        assert self.client.get(status_url)['Cache-Control'] == 'private, max-age=3600'
+
+    @override_settings(USER_TASKS_FINISHED_MAX_AGE=3600)
+    def test_status_detail_unfinished(self):
+        """Statuses of tasks which may still change shouldn't be cached."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-detail', args=[self.status.uuid])
+        assert 'Cache-Control' not in self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.status.fail('Oops')
+        assert self.client.get(url)['Cache-Control'] == 'private, max-age=3600'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.status.retry()
+        response = self.client.get(url)
+        assert _data(response)['state'] == UserTaskStatus.RETRYING
+        assert 'Cache-Control' not in response
+
+    @override_settings(USER_TASKS_FINISHED_MAX_AGE=3600)
+    def test_artifact_detail_cached_delete(self):
+        """Cached artifacts should be discarded when their status is deleted."""
+        self._login(self.user)
+        url = reverse('usertaskartifact-detail', args=[self.artifact.uuid])
+        assert self.client.get(url)['Cache-Control'] == 'private, max-age=3600'
+        with self.assertNumQueries(0):
+            assert self.client.get(url).status_code == 200
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('usertaskstatus-detail', args=[self.status.uuid]))
+        assert self.client.get(url).status_code == 404
+
+    @override_settings(USER_TASKS_EVENT_BACKEND='user_tasks.events.LocalEventBackend',
+                       USER_TASKS_STREAM_KEEPALIVE=0)
+    def test_status_stream(self):
+        """Changes to the user's task statuses should be streamed as Server-Sent Events."""
+        self._login(self.user)
+        response = self.client.get(reverse('usertaskstatus-stream'), HTTP_ACCEPT='text/event-stream')
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/event-stream'
+        chunks = iter(response.streaming_content)
+        assert next(chunks) == b'retry: 3000\n\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.status.increment_completed_steps()
+            UserTaskStatus.objects.create(
+                user=self.other_user, task_id=str(uuid4()), task_class='test_rest_api.sample_task',
+                name='SampleTask 3', total_steps=5)
+        event = next(chunks).decode('utf-8')
+        assert event.startswith('event: status\ndata: {')
+        assert f'"uuid":"{self.status.uuid}"' in event
+        assert '"completed_steps":1' in event
+        assert next(chunks) == b': keepalive\n\n'
+        response.close()
+
+    def test_status_stream_anonymous(self):
+        """Anonymous users should be unable to stream task status events."""
+        response = self.client.get(reverse('usertaskstatus-stream'), HTTP_ACCEPT='text/event-stream')
+        assert response.status_code == 403
+        assert response.content.startswith(b'event: error\ndata: ')
+
+    def test_status_stream_disabled(self):
+        """Task status events should only be streamed when an event backend is configured."""
+        self._login(self.user)
+        response = self.client.get(reverse('usertaskstatus-stream'), HTTP_ACCEPT='text/event-stream')
+        assert response.status_code == 404
+
+    @override_settings(USER_TASKS_SYNC_LAG=0)
+    def test_status_changes(self):
+        """Clients should be able to fetch only the statuses changed or deleted since their last sync."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-changes')
+        response = self.client.get(url)
+        assert response.status_code == 200
+        assert [item['name'] for item in _data(response)['changed']] == ['SampleTask 1', 'SampleTask 2']
+        assert _data(response)['deleted'] == []
+        assert not _data(response)['more']
+        cursor = _data(response)['cursor']
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'since': cursor})
+        assert _data(response)['changed'] == []
+        cursor = _data(response)['cursor']
+        self.status.increment_completed_steps()
+        self.older_status.delete()
+        other_status = UserTaskStatus.objects.create(
+            user=self.other_user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 3',
+            total_steps=5)
+        other_status.delete()
+        response = self.client.get(url, {'since': cursor})
+        assert [item['completed_steps'] for item in _data(response)['changed']] == [1]
+        assert _data(response)['deleted'] == [str(self.older_status.uuid)]
+        response = self.client.get(url, {'since': _data(response)['cursor']})
+        assert _data(response)['changed'] == []
+        assert _data(response)['deleted'] == []
+
+    @override_settings(USER_TASKS_PAGE_SIZE=1, USER_TASKS_SYNC_LAG=0)
+    def test_status_changes_more(self):
+        """Changes beyond the page size should be available via immediate follow-up requests."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-changes')
+        response = self.client.get(url)
+        assert _data(response)['more']
+        assert [item['name'] for item in _data(response)['changed']] == ['SampleTask 1']
+        response = self.client.get(url, {'since': _data(response)['cursor']})
+        assert not _data(response)['more']
+        assert [item['name'] for item in _data(response)['changed']] == ['SampleTask 2']
+
+    def test_status_changes_lag(self):
+        """Recent changes should be held back, in case earlier changes haven't been committed yet."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-changes')
+        UserTaskStatus.objects.filter(pk=self.older_status.pk).update(modified=now() - timedelta(seconds=10))
+        response = self.client.get(url)
+        assert [item['name'] for item in _data(response)['changed']] == ['SampleTask 1']
+        cursor = _data(response)['cursor']
+        self.status.delete()
+        response = self.client.get(url, {'since': cursor})
+        assert _data(response)['changed'] == []
+        assert _data(response)['deleted'] == []
+        with mock.patch('user_tasks.sync.now', return_value=now() + timedelta(seconds=10)):
+            response = self.client.get(url, {'since': cursor})
+        assert _data(response)['deleted'] == [str(self.status.uuid)]
+
+    def test_status_changes_invalid_cursor(self):
+        """Malformed and expired cursors should be rejected."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-changes')
+        assert self.client.get(url, {'since': 'garbage'}).status_code == 400
+        cursor = _data(self.client.get(url))['cursor']
+        with override_settings(USER_TASKS_TOMBSTONE_MAX_AGE=timedelta(0)):
+            response = self.client.get(url, {'since': cursor})
+        assert response.status_code == 410
+
+    def test_status_tree(self):
+        """Users should be able to fetch a status with all the statuses nested in it, in a fixed number of queries."""
+        self._login(self.user)
+        chord = self._create_tree(3)
+        url = reverse('usertaskstatus-tree', args=[chord.uuid])
+        # Two queries to look up the status and its artifacts, and two for the whole tree and its artifacts
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        assert response.status_code == 200
+        data = _data(response)
+        assert data['uuid'] == str(chord.uuid)
+        assert data['name'] == 'Chord'
+        group, callback = data['children']
+        assert [child['name'] for child in group['children']] == ['Task 0', 'Task 1', 'Task 2']
+        assert all(len(child['artifacts']) == 1 for child in group['children'])
+        assert not callback['children']
+        larger = self._create_tree(30)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('usertaskstatus-tree', args=[larger.uuid]))
+        assert len(_data(response)['children'][0]['children']) == 30
+        response = self.client.get(reverse('usertaskstatus-tree', args=[group['uuid']]))
+        assert _data(response)['name'] == 'Group'
+        assert len(_data(response)['children']) == 3
+        self._login(self.other_user)
+        assert self.client.get(url).status_code == 404
+
+    def test_status_summary(self):
+        """Users should be able to get the number of their tasks in each state, cached until one changes."""
+        self._login(self.user)
+        UserTaskStatus.objects.create(
+            user=self.other_user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 3',
+            total_steps=5)
+        url = reverse('usertaskstatus-summary')
+        expected = dict.fromkeys(UserTaskStatus.STATE_TRANSLATIONS, 0)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        assert response.status_code == 200
+        assert _data(response) == {**expected, UserTaskStatus.PENDING: 2}
+        with self.assertNumQueries(0):
+            assert _data(self.client.get(url)) == {**expected, UserTaskStatus.PENDING: 2}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.status.set_state('Custom State')
+        assert _data(self.client.get(url)) == {**expected, UserTaskStatus.PENDING: 1, 'Custom State': 1}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.older_status.delete()
+        assert _data(self.client.get(url)) == {**expected, 'Custom State': 1}
+        assert _data(self.client.get(url, {'state': UserTaskStatus.PENDING})) == expected
+
+    def test_status_summary_superuser(self):
+        """Superusers should get counts of all the tasks."""
+        self._login(self.superuser)
+        response = self.client.get(reverse('usertaskstatus-summary'))
+        assert _data(response)[UserTaskStatus.PENDING] == 2
+
+    def test_status_summary_anonymous(self):
+        """Anonymous users should be unable to get task counts."""
+        assert self.client.get(reverse('usertaskstatus-summary')).status_code == 403
+
+    def test_status_wait(self):
+        """Waiting clients should get the status as soon as a change to it is announced."""
+        self._login(self.user)
+        since = self.client.get(reverse('usertaskstatus-detail', args=[self.status.uuid])).data['modified']
+
+        def change(_seconds):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.status.increment_completed_steps()
+
+        url = reverse('usertaskstatus-wait', args=[self.status.uuid])
+        with mock.patch('user_tasks.notifications.time.sleep', side_effect=change) as mock_sleep:
+            response = self.client.get(url, {'since': since, 'timeout': 10})
+        assert response.status_code == 200
+        assert _data(response)['completed_steps'] == 1
+        assert mock_sleep.call_count == 1
+
+    def test_status_wait_already_changed(self):
+        """Clients with an outdated copy of the status should get the current one without waiting."""
+        self._login(self.user)
+        since = (self.status.modified - timedelta(seconds=1)).isoformat()
+        url = reverse('usertaskstatus-wait', args=[self.status.uuid])
+        with mock.patch('user_tasks.notifications.time.sleep') as mock_sleep:
+            response = self.client.get(url, {'since': since})
+        assert response.status_code == 200
+        assert _data(response)['name'] == 'SampleTask 2'
+        assert not mock_sleep.called
+
+    def test_status_wait_timeout(self):
+        """The unchanged status should be returned once the timeout expires."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-wait', args=[self.status.uuid])
+        with mock.patch('user_tasks.notifications.time.monotonic', side_effect=[100, 100, 102]):
+            with mock.patch('user_tasks.notifications.time.sleep') as mock_sleep:
+                response = self.client.get(url, {'since': self.status.modified.isoformat(), 'timeout': 2})
+        assert response.status_code == 200
+        assert _data(response)['completed_steps'] == 0
+        mock_sleep.assert_called_once_with(0.5)
+
+    def test_status_wait_invalid(self):
+        """Invalid wait parameters should be rejected."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-wait', args=[self.status.uuid])
+        assert self.client.get(url).status_code == 400
+        assert self.client.get(url, {'since': 'yesterday'}).status_code == 400
+        response = self.client.get(url, {'since': self.status.modified.isoformat(), 'timeout': 'forever'})
+        assert response.status_code == 400
+
+    def test_status_wait_other_user(self):
+        """Users should be unable to wait for changes to other users' tasks."""
+        self._login(self.other_user)
+        url = reverse('usertaskstatus-wait', args=[self.status.uuid])
+        response = self.client.get(url, {'since': self.status.modified.isoformat(), 'timeout': 0})
+        assert response.status_code == 404
+
+    def test_status_list_fields(self):
+        """Clients should be able to list just the status fields they need, without loading artifacts."""
+        self._login(self.user)
+        UserTaskArtifact.objects.create(status=self.status, url='https://example.com/')
+        # One query for the listing's ETag and one for the statuses
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('usertaskstatus-list'), {'fields': 'state,completed_steps,total_steps'})
+        assert response.status_code == 200
+        assert _data(response) == [
+            {'state': UserTaskStatus.PENDING, 'completed_steps': 0, 'total_steps': 5},
+        ] * 2
+
+    def test_status_detail_fields(self):
+        """Clients should be able to fetch just the status fields they need."""
+        self._login(self.user)
+        url = reverse('usertaskstatus-detail', args=[self.status.uuid])
+        # One query for the ETag and one for the status, without any for artifacts
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'fields': 'state_text'})
+        assert response.status_code == 200
+        assert _data(response) == {'state_text': 'Pending'}
+        response = self.client.get(url, {'fields': 'name,artifacts'})
+        assert set(_data(response)) == {'name', 'artifacts'}
+        assert len(_data(response)['artifacts']) == 1
+        assert self.client.get(url, {'fields': 'state,user'}).status_code == 400
+        assert self.client.get(url, {'fields': ''}).status_code == 400
+
+    def test_artifact_list_fields(self):
+        """Artifact text should only be loaded if requested."""
+        self._login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('usertaskartifact-list'), {'fields': 'name,status,url'})
+        assert response.status_code == 200
+        assert len(queries) == 1
+        assert '"text"' not in queries[0]['sql']
+        assert _data(response) == [{
+            'name': self.artifact.name,
+            'status': response.wsgi_request.build_absolute_uri(
+                reverse('usertaskstatus-detail', args=[self.status.uuid])),
+            'url': '',
+        }]
+
+    def test_artifact_list_single_table(self):
+        """Artifacts should be listed by their own user, without joining the status table unless needed."""
+        self._login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('usertaskartifact-list'), {'fields': 'name,text'})
+        assert response.status_code == 200
+        assert _data(response) == [{'name': self.artifact.name, 'text': 'Lorem ipsum'}]
+        assert len(queries) == 1
+        assert 'user_tasks_usertaskstatus' not in queries[0]['sql']
+
+    def test_artifact_download(self):
+        """Artifact files should be streamed as attachments."""
+        artifact = UserTaskArtifact.objects.create(status=self.status, file=ContentFile(b'0123456789', name='out.csv'))
+        self._login(self.user)
+        response = self.client.get(reverse('usertaskartifact-download', args=[artifact.uuid]))
+        assert response.status_code == 200
+        assert b''.join(response.streaming_content) == b'0123456789'
+        assert response['Content-Length'] == '10'
+        assert response['Content-Type'] == 'text/csv'
+        assert response['Content-Disposition'] == f'attachment; filename="{artifact.file.name.split("/")[-1]}"'
+        assert response['Accept-Ranges'] == 'bytes'
+
+    def test_artifact_download_range(self):
+        """Byte ranges of artifact files should be downloadable, so interrupted downloads can resume."""
+        artifact = UserTaskArtifact.objects.create(status=self.status, file=ContentFile(b'0123456789', name='out.csv'))
+        url = reverse('usertaskartifact-download', args=[artifact.uuid])
+        self._login(self.user)
+        for header, content, content_range in (
+                ('bytes=2-5', b'2345', 'bytes 2-5/10'),
+                ('bytes=7-', b'789', 'bytes 7-9/10'),
+                ('bytes=-3', b'789', 'bytes 7-9/10'),
+                ('bytes=8-20', b'89', 'bytes 8-9/10')):
+            response = self.client.get(url, HTTP_RANGE=header)
+            assert response.status_code == 206
+            assert b''.join(response.streaming_content) == content
+            assert response['Content-Length'] == str(len(content))
+            assert response['Content-Range'] == content_range
+        for header in ('bytes=5-2', 'bytes=0-1,4-5', 'items=0-1'):
+            response = self.client.get(url, HTTP_RANGE=header)
+            assert response.status_code == 200
+            assert b''.join(response.streaming_content) == b'0123456789'
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        assert response.status_code == 200
+        response = self.client.get(url, HTTP_RANGE='bytes=10-')
+        assert response.status_code == 416
+        assert response['Content-Range'] == 'bytes */10'
+
+    def test_artifact_download_no_file(self):
+        """Downloading an artifact without a file should fail."""
+        self._login(self.user)
+        response = self.client.get(reverse('usertaskartifact-download', args=[self.artifact.uuid]))
+        assert response.status_code == 404
+
+    def test_artifact_download_permissions(self):
+        """Only users who can view an artifact should be able to download its file."""
+        artifact = UserTaskArtifact.objects.create(status=self.status, file=ContentFile(b'Data', name='out.csv'))
+        url = reverse('usertaskartifact-download', args=[artifact.uuid])
+        assert self.client.get(url).status_code == 403
+        self._login(self.other_user)
+        response = self.client.get(url, HTTP_ACCEPT='application/octet-stream')
+        assert response.status_code == 404
+        assert 'detail' in response.json()
+
+    def test_artifact_download_sendfile(self):
+        """The web server should be told which file to send when configured to do so."""
+        artifact = UserTaskArtifact.objects.create(status=self.status, file=ContentFile(b'Data', name='out.csv'))
+        url = reverse('usertaskartifact-download', args=[artifact.uuid])
+        self._login(self.user)
+        with override_settings(USER_TASKS_SENDFILE_HEADER='X-Sendfile'):
+            response = self.client.get(url)
+        assert response.status_code == 200
+        assert response['X-Sendfile'] == artifact.file.path
+        assert response['Content-Type'] == 'text/csv'
+        assert response['Content-Disposition'].startswith('attachment; ')
+        assert not response.content
+        with override_settings(USER_TASKS_SENDFILE_HEADER='X-Accel-Redirect', USER_TASKS_SENDFILE_PREFIX='/files/'):
+            response = self.client.get(url)
+        assert response['X-Accel-Redirect'] == f'/files/{artifact.file.name}'
+        assert not response.content
+
+    def _create_tree(self, size):
+        """
+        Create the statuses of a chord whose header is a group of the given number of tasks, each with an artifact.
+        """
+        def create(name, parent=None, is_container=False):
+            return UserTaskStatus.objects.create(
+                user=self.user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name=name,
+                total_steps=1, parent=parent, is_container=is_container)
+        chord = create('Chord', is_container=True)
+        group = create('Group', chord, is_container=True)
+        for index in range(size):
+            UserTaskArtifact.objects.create(status=create(f'Task {index}', group), text='Lorem ipsum')
+        create('Callback', chord)
+        return chord
+
     def _login(self, user):
         """
         Log the test client in as the specified user.
         """
         self.client.force_authenticate(user)
+
+
+@override_settings(USER_TASKS_ARCHIVE_AGE=timedelta(days=1))
+class TestArchivedRestApi(APITestCase):
+    """
+    Tests of the REST API calls for records which have been archived.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        add_rules()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        rules.permissions.permissions.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        cls.other_user = User.objects.create_user('other_user', 'other@example.com', 'password')
+        status = UserTaskStatus.objects.create(
+            user=cls.user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask',
+            total_steps=5, state=UserTaskStatus.SUCCEEDED)
+        UserTaskArtifact.objects.create(status=status, text='Lorem ipsum')
+        archive_statuses(now() + timedelta(seconds=1), 10)
+        cls.live_status = UserTaskStatus.objects.create(
+            user=cls.user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 2',
+            total_steps=5)
+        cls.status = ArchivedUserTaskStatus.objects.get()
+        cls.artifact = ArchivedUserTaskArtifact.objects.get()
+
+    def test_artifact_detail(self):
+        """Archived artifacts should be available at the same URL as before archiving."""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskartifact-detail', args=[self.artifact.uuid]))
+        assert response.status_code == 200
+        assert _data(response)['text'] == 'Lorem ipsum'
+        assert _data(response)['status'].endswith(reverse('usertaskstatus-detail', args=[self.status.uuid]))
+
+    def test_artifact_detail_fields(self):
+        """Clients should be able to fetch just the archived artifact fields they need."""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskartifact-detail', args=[self.artifact.uuid]), {'fields': 'text'})
+        assert response.status_code == 200
+        assert _data(response) == {'text': 'Lorem ipsum'}
+
+    def test_artifact_download(self):
+        """Archived artifact files should be downloadable at the same URL as before archiving."""
+        status = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_rest_api.sample_task', name='SampleTask 3',
+            total_steps=5, state=UserTaskStatus.SUCCEEDED)
+        UserTaskArtifact.objects.create(status=status, file=ContentFile(b'Data', name='out.csv'))
+        archive_statuses(now() + timedelta(seconds=1), 10)
+        artifact = ArchivedUserTaskArtifact.objects.get(status__uuid=status.uuid)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskartifact-download', args=[artifact.uuid]))
+        assert response.status_code == 200
+        assert b''.join(response.streaming_content) == b'Data'
+
+    def test_status_tree(self):
+        """Archived status trees should be available at the same URL as before archiving."""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskstatus-tree', args=[self.status.uuid]))
+        assert response.status_code == 200
+        assert _data(response)['uuid'] == str(self.status.uuid)
+        assert len(_data(response)['artifacts']) == 1
+        assert not _data(response)['children']
+
+    def test_artifact_detail_other_user(self):
+        """Users should be unable to access archived artifacts for another user's tasks."""
+        self.client.force_authenticate(self.other_user)
+        response = self.client.get(reverse('usertaskartifact-detail', args=[self.artifact.uuid]))
+        assert response.status_code == 404
+
+    def test_status_detail(self):
+        """Archived statuses should be available at the same URL as before archiving."""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskstatus-detail', args=[self.status.uuid]))
+        assert response.status_code == 200
+        serializer = StatusSerializer(self.status, context=_context(response))
+        assert _data(response) == serializer.data
+        assert len(_data(response)['artifacts']) == 1
+
+    @override_settings(USER_TASKS_ARCHIVE_AGE=None)
+    def test_status_detail_disabled(self):
+        """The archive shouldn't be consulted when archiving is disabled."""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskstatus-detail', args=[self.status.uuid]))
+        assert response.status_code == 404
+
+    def test_status_cancel(self):
+        """Archived tasks have already finished, so can't be canceled."""
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('usertaskstatus-cancel', args=[self.status.uuid]))
+        assert response.status_code == 404
+
+    def test_status_delete(self):
+        """Users should be able to delete their own archived status records."""
+        self.client.force_authenticate(self.user)
+        response = self.client.delete(reverse('usertaskstatus-detail', args=[self.status.uuid]))
+        assert response.status_code == 204
+        assert not ArchivedUserTaskStatus.objects.exists()
+        assert not ArchivedUserTaskArtifact.objects.exists()
+
+    def test_status_list(self):
+        """Archived statuses should be listed along with the others, unless only one table is requested."""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskstatus-list'))
+        assert [item['name'] for item in _data(response)] == ['SampleTask 2', 'SampleTask']
+        response = self.client.get(reverse('usertaskstatus-list'), {'archived': 'false'})
+        assert [item['name'] for item in _data(response)] == ['SampleTask 2']
+        response = self.client.get(reverse('usertaskstatus-list'), {'archived': 'true'})
+        assert response.status_code == 200
+        serializer = StatusSerializer([self.status], context=_context(response), many=True)
+        assert _data(response) == serializer.data
+
+    @override_settings(USER_TASKS_PAGINATION_CLASS='user_tasks.pagination.UserTaskCursorPagination',
+                       USER_TASKS_PAGE_SIZE=1)
+    def test_status_list_paginated(self):
+        """Pages of the combined listing should continue from the main table into the archive."""
+        self.client.force_authenticate(self.user)
+        names = []
+        url = reverse('usertaskstatus-list')
+        while url:
+            response = self.client.get(url)
+            names.extend(item['name'] for item in response.data['results'])
+            url = response.data['next']
+        assert names == ['SampleTask 2', 'SampleTask']
+
+    @override_settings(USER_TASKS_ARCHIVE_AGE=None)
+    def test_status_list_disabled(self):
+        """The archive shouldn't be listed by default when archiving is disabled."""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskstatus-list'))
+        assert [item['name'] for item in _data(response)] == ['SampleTask 2']
+
+    def test_status_list_combined_fast(self):
+        """Combined listings from database rows should be serialized the same way, with links to archived artifacts."""
+        self.client.force_authenticate(self.user)
+        expected = self.client.get(reverse('usertaskstatus-list')).content
+        with override_settings(USER_TASKS_FAST_STATUS_LIST=True):
+            response = self.client.get(reverse('usertaskstatus-list'))
+        assert response.content == expected
+        assert len(_data(response)[1]['artifacts']) == 1
+
+    def test_artifact_list(self):
+        """Archived artifacts should be listed along with the others."""
+        UserTaskArtifact.objects.create(status=self.live_status, text='Dolor sit amet')
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('usertaskartifact-list'))
+        assert [item['text'] for item in _data(response)] == ['Dolor sit amet', 'Lorem ipsum']
+
+    def test_status_list_not_modified(self):
+        """Deleting an archived status should invalidate cached listings of the archive."""
+        self.client.force_authenticate(self.user)
+        url = reverse('usertaskstatus-list')
+        etag = self.client.get(url, {'archived': 'true'})['ETag']
+        assert self.client.get(url, {'archived': 'true'}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        self.status.delete()
+        response = self.client.get(url, {'archived': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert _data(response) == []
+
+    def test_status_list_fast(self):
+        """Archived statuses listed from database rows should be serialized the same way."""
+        self.client.force_authenticate(self.user)
+        expected = self.client.get(reverse('usertaskstatus-list'), {'archived': 'true'}).content
+        with override_settings(USER_TASKS_FAST_STATUS_LIST=True):
+            response = self.client.get(reverse('usertaskstatus-list'), {'archived': 'true'})
+        assert response.content == expected
+
+    def test_status_list_other_user(self):
+        """Users should be unable to see archived tasks for other users."""
+        self.client.force_authenticate(self.other_user)
+        response = self.client.get(reverse('usertaskstatus-list'), {'archived': 'true'})
+        assert response.status_code == 200
+        assert _data(response) == []
+
+
+@override_settings(USER_TASKS_PAGINATION_CLASS='user_tasks.pagination.UserTaskCursorPagination',
+                   USER_TASKS_PAGE_SIZE=2)
+class TestPaginatedRestApi(APITestCase):
+    """
+    Tests of the REST API listings when using cursor pagination.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        add_rules()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        rules.permissions.permissions.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        created = now()
+        for index in range(7):
+            status = UserTaskStatus.objects.create(
+                user=cls.user, task_id=str(uuid4()), task_class='test_rest_api.sample_task',
+                name=f'SampleTask {index}', total_steps=5)
+            UserTaskArtifact.objects.create(status=status, text=f'Artifact {index}')
+            # Include some ties, which should be ordered by id
+            if index % 2:
+                created -= timedelta(minutes=1)
+            UserTaskStatus.objects.filter(pk=status.pk).update(created=created)
+            UserTaskArtifact.objects.filter(status=status).update(created=created)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_status_list(self):
+        """All the statuses should be listed across the pages, newest first, with constant queries per page."""
+        names = []
+        url = reverse('usertaskstatus-list')
+        while url:
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            assert response.status_code == 200
+            assert 'count' not in _data(response)
+            assert len(_data(response)['results']) <= 2
+            names.extend(item['name'] for item in _data(response)['results'])
+            url = _data(response)['next']
+        assert names == [f'SampleTask {index}' for index in (0, 1, 2, 3, 4, 5, 6)]
+
+    @override_settings(USER_TASKS_FAST_STATUS_LIST=True)
+    def test_status_list_fast(self):
+        """Each page of statuses listed from database rows should match the usual output."""
+        url = reverse('usertaskstatus-list')
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            with override_settings(USER_TASKS_FAST_STATUS_LIST=False):
+                assert response.content == self.client.get(url).content
+            url = _data(response)['next']
+            pages += 1
+        assert pages == 4
+
+    def test_artifact_list(self):
+        """All the artifacts should be listed across the pages, newest first."""
+        texts = []
+        url = reverse('usertaskartifact-list')
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            texts.extend(item['text'] for item in _data(response)['results'])
+            url = _data(response)['next']
+        assert texts == [f'Artifact {index}' for index in range(7)]
+
+    def test_page_size(self):
+        """Clients should be able to request a different page size, up to the configured maximum."""
+        response = self.client.get(reverse('usertaskstatus-list'), {'page_size': 5})
+        assert len(_data(response)['results']) == 5
+        with override_settings(USER_TASKS_MAX_PAGE_SIZE=3):
+            response = self.client.get(reverse('usertaskstatus-list'), {'page_size': 5})
+        assert len(_data(response)['results']) == 3
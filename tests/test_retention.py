@@ -0,0 +1,147 @@
+"""
+Tests for the user task retention rules.
+"""
+
+from datetime import timedelta
+from uuid import uuid4
+
+import pytest
+
+from django.contrib import auth
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from user_tasks.models import UserTaskStatus
+from user_tasks.retention import expected_deletions, max_age
+from user_tasks.tasks import purge_old_user_tasks
+
+User = auth.get_user_model()
+
+REPORT_TASK = 'test_retention.generate_report'
+POLICIES = [
+    {'state': UserTaskStatus.FAILED, 'max_age': timedelta(days=90)},
+    {'state': UserTaskStatus.SUCCEEDED, 'task_class': REPORT_TASK, 'max_age': timedelta(days=2)},
+]
+
+
+@override_settings(CELERY_ALWAYS_EAGER=True, USER_TASKS_RETENTION_POLICIES=POLICIES)
+class TestRetentionPolicies(TestCase):
+    """
+    Tests of purging user tasks according to retention policies.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        cls.other_user = User.objects.create_user('other_user', 'other@example.com', 'password')
+
+    def test_policies(self):
+        """The first matching policy should determine when a task is deleted, with a default for the rest."""
+        kept = [
+            self._status(days=60, state=UserTaskStatus.FAILED),
+            self._status(days=1, task_class=REPORT_TASK),
+            self._status(days=29),
+            self._status(days=3, task_class=REPORT_TASK, state=UserTaskStatus.FAILED),
+        ]
+        self._status(days=91, state=UserTaskStatus.FAILED)
+        self._status(days=3, task_class=REPORT_TASK)
+        self._status(days=31)
+        purge_old_user_tasks.delay()
+        assert set(UserTaskStatus.objects.all()) == set(kept)
+
+    def test_nested_statuses(self):
+        """Policies should be applied to the outermost status of each task, deleting nested ones along with it."""
+        parent = self._status(days=60, state=UserTaskStatus.FAILED, is_container=True)
+        child = self._status(days=60, parent=parent)
+        purge_old_user_tasks.delay()
+        assert set(UserTaskStatus.objects.all()) == {parent, child}
+
+    @override_settings(USER_TASKS_RETENTION_POLICIES=[
+        {'state': [UserTaskStatus.SUCCEEDED], 'since': 'modified', 'max_age': timedelta(days=1)}
+    ])
+    def test_since_modified(self):
+        """Policies should be able to measure age from the last modification instead of creation."""
+        kept = self._status(days=5)
+        UserTaskStatus.objects.filter(pk=kept.pk).update(modified=now())
+        self._status(days=5)
+        purge_old_user_tasks.delay()
+        assert list(UserTaskStatus.objects.all()) == [kept]
+
+    @override_settings(USER_TASKS_RETENTION_POLICIES=[], USER_TASKS_MAX_PER_USER=2)
+    def test_max_per_user(self):
+        """Only the newest tasks of each user should be kept when the per-user limit is exceeded."""
+        kept = [self._status(days=1), self._status(days=2), self._status(days=3, user=self.other_user)]
+        self._status(days=4)
+        self._status(days=5)
+        purge_old_user_tasks.delay()
+        assert set(UserTaskStatus.objects.all()) == set(kept)
+
+    @override_settings(USER_TASKS_RETENTION_POLICIES=[], USER_TASKS_MAX_PER_USER=1)
+    def test_max_per_user_unfinished(self):
+        """Tasks which haven't finished yet should neither be purged nor count towards the per-user limit."""
+        kept = [
+            self._status(days=1, state=UserTaskStatus.PENDING), self._status(days=2),
+            self._status(days=3, state=UserTaskStatus.IN_PROGRESS),
+        ]
+        self._status(days=4)
+        kept.append(self._status(days=5, user=self.other_user))
+        kept.append(self._status(days=6, user=self.other_user, state=UserTaskStatus.PENDING))
+        # One query for USER_TASKS_MAX_AGE, and one for all the users together
+        with self.assertNumQueries(2):
+            assert expected_deletions(now())['USER_TASKS_MAX_PER_USER'] == 1
+        purge_old_user_tasks.delay()
+        assert set(UserTaskStatus.objects.all()) == set(kept)
+
+    @override_settings(USER_TASKS_MAX_PER_USER=1)
+    def test_dry_run(self):
+        """A dry run should report how many tasks each rule would delete, without deleting anything."""
+        self._status(days=91, state=UserTaskStatus.FAILED)
+        self._status(days=3, task_class=REPORT_TASK)
+        self._status(days=31)
+        self._status(days=1)
+        expected = purge_old_user_tasks.delay(dry_run=True).get()
+        assert expected['live'] == {
+            'policy 1 (state=Failed)': 1,
+            f'policy 2 (state=Succeeded, task_class={REPORT_TASK})': 1,
+            'USER_TASKS_MAX_AGE': 1,
+            'USER_TASKS_MAX_PER_USER': 3,
+        }
+        assert expected['archived']['USER_TASKS_MAX_AGE'] == 0
+        assert UserTaskStatus.objects.count() == 4
+
+    def test_max_age(self):
+        """The longest age of any rule should be available for deciding which table partitions can be dropped."""
+        assert max_age() == timedelta(days=90)
+
+    @override_settings(USER_TASKS_RETENTION_POLICIES=[{'max_age': timedelta(days=1)}])
+    def test_missing_criteria(self):
+        """Policies which don't say which tasks they apply to should be rejected."""
+        with pytest.raises(ImproperlyConfigured):
+            expected_deletions(now())
+
+    @override_settings(USER_TASKS_RETENTION_POLICIES=[{'state': UserTaskStatus.FAILED}])
+    def test_missing_age(self):
+        """Policies which don't say how long to keep tasks should be rejected."""
+        with pytest.raises(ImproperlyConfigured):
+            expected_deletions(now())
+
+    @override_settings(USER_TASKS_RETENTION_POLICIES=[
+        {'state': UserTaskStatus.FAILED, 'since': 'completed', 'max_age': timedelta(days=1)}
+    ])
+    def test_invalid_since(self):
+        """Policies measuring age from an unsupported field should be rejected."""
+        with pytest.raises(ImproperlyConfigured):
+            expected_deletions(now())
+
+    def _status(self, days, state=UserTaskStatus.SUCCEEDED, task_class='test_retention.sample_task', **kwargs):
+        """
+        Create a UserTaskStatus which was created and last modified the given number of days ago.
+        """
+        kwargs.setdefault('user', self.user)
+        status = UserTaskStatus.objects.create(
+            task_id=str(uuid4()), task_class=task_class, name='SampleTask', total_steps=1, state=state, **kwargs)
+        moment = now() - timedelta(days=days)
+        UserTaskStatus.objects.filter(pk=status.pk).update(created=moment, modified=moment)
+        return status
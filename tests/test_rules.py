@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Tests for the sample rules-based permissions.
+"""
+
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+import rules
+
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from user_tasks import filters
+from user_tasks.conf import settings
+from user_tasks.models import UserTaskArtifact, UserTaskStatus
+from user_tasks.rules import ARTIFACT_PERMISSION, STATUS_PERMISSION, PermissionFilterBackend, add_rules
+
+User = auth.get_user_model()
+
+
+class TestRules(TestCase):
+    """
+    Tests of the rules and the filter backend which applies them to querysets.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        add_rules()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        rules.permissions.permissions.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        cls.other_user = User.objects.create_user('other_user', 'other@example.com', 'password')
+        cls.superuser = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.status = UserTaskStatus.objects.create(
+            user=cls.user, task_id=str(uuid4()), task_class='test_rules.sample_task', name='SampleTask',
+            total_steps=5)
+        cls.artifact = UserTaskArtifact.objects.create(status=cls.status, text='Lorem ipsum')
+        cls.other_status = UserTaskStatus.objects.create(
+            user=cls.other_user, task_id=str(uuid4()), task_class='test_rules.sample_task', name='SampleTask',
+            total_steps=5)
+        UserTaskArtifact.objects.create(status=cls.other_status, text='Lorem ipsum')
+
+    def test_artifact_permission(self):
+        """Artifact permission checks shouldn't query the database for the artifact's status."""
+        artifact = UserTaskArtifact.objects.get(pk=self.artifact.pk)
+        with self.assertNumQueries(0):
+            assert ARTIFACT_PERMISSION.test(self.user, artifact)
+            assert not ARTIFACT_PERMISSION.test(self.other_user, artifact)
+
+    def test_artifact_permission_unsaved(self):
+        """Artifacts which haven't been saved yet should be checked via their status."""
+        artifact = UserTaskArtifact(status=self.status, text='Lorem ipsum')
+        assert ARTIFACT_PERMISSION.test(self.user, artifact)
+        assert not ARTIFACT_PERMISSION.test(self.other_user, artifact)
+
+    def test_filter_statuses(self):
+        """Users should only get their own statuses, and superusers all of them."""
+        assert list(self._filter(UserTaskStatus, self.user)) == [self.status]
+        assert list(self._filter(UserTaskStatus, self.other_user)) == [self.other_status]
+        assert self._filter(UserTaskStatus, self.superuser).count() == 2
+        assert not self._filter(UserTaskStatus, AnonymousUser()).exists()
+
+    def test_filter_artifacts(self):
+        """Users should only get the artifacts of their own tasks, and superusers all of them."""
+        assert list(self._filter(UserTaskArtifact, self.user)) == [self.artifact]
+        assert self._filter(UserTaskArtifact, self.superuser).count() == 2
+        assert not self._filter(UserTaskArtifact, AnonymousUser()).exists()
+
+    def test_filter_bulk_cancel(self):
+        """The cancel permission's rule should be applied for the bulk cancel endpoint."""
+        assert list(self._filter(UserTaskStatus, self.user, action='bulk_cancel')) == [self.status]
+
+    def test_filter_unknown_rule(self):
+        """Rules without an equivalent queryset filter should be reported as a configuration error."""
+        rules.set_perm('user_tasks.view_usertaskstatus', rules.predicates.is_authenticated)
+        try:
+            with pytest.raises(ImproperlyConfigured):
+                self._filter(UserTaskStatus, self.user)
+        finally:
+            rules.set_perm('user_tasks.view_usertaskstatus', STATUS_PERMISSION)
+
+    @override_settings(USER_TASKS_STATUS_FILTERS=(filters.StatusFilterBackend,),
+                       USER_TASKS_ARTIFACT_FILTERS=(PermissionFilterBackend,))
+    def test_artifact_filters_setting(self):
+        """The filter backend can be configured for artifact listings separately from status listings."""
+        assert settings.USER_TASKS_ARTIFACT_FILTERS == (PermissionFilterBackend,)
+
+    @staticmethod
+    def _filter(model, user, action='list'):
+        """
+        Filter all the records of the given model as the filter backend would for a REST API request by the user.
+        """
+        request = SimpleNamespace(user=user)
+        view = SimpleNamespace(action=action)
+        return PermissionFilterBackend().filter_queryset(request, model.objects.order_by('pk'), view)
@@ -4,12 +4,16 @@ Tests for the REST API model serializers.
 """
 
 import shutil
+import tempfile
+from unittest import mock
 from uuid import uuid4
 
 from django.conf import settings
 from django.contrib import auth
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils.timezone import localtime
 
@@ -28,6 +32,20 @@ def _format(datetime):
     return localtime(datetime).isoformat()
 
 
+class CountingStorage(FileSystemStorage):
+    """
+    File storage which counts the URLs it generates, as a stand-in for storage which signs them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url_calls = 0
+
+    def url(self, name):
+        self.url_calls += 1
+        return f'https://files.example.com/{name}?signature={self.url_calls}'
+
+
 class TestStatusSerializer(TestCase):
     """
     Tests of the serializer for UserTaskStatus model instances.
@@ -140,3 +158,63 @@ class TestArtifactSerializer(TestCase):
         request = APIRequestFactory().get(reverse('usertaskartifact-detail', args=[artifact.uuid]))
         serializer = ArtifactSerializer(artifact, context={'request': request})
         assert serializer.data == expected
+
+
+class TestArtifactFileUrls(TestCase):
+    """
+    Tests of the generation of artifact file URLs.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        user = User.objects.create_user('test_user', 'test@example.com', 'password')
+        cls.status = UserTaskStatus.objects.create(user=user, task_id=str(uuid4()), name='SampleTask', total_steps=4)
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.storage = CountingStorage(location=directory.name)
+        patcher = mock.patch.object(UserTaskArtifact._meta.get_field('file'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for index in range(3):
+            UserTaskArtifact.objects.create(status=self.status, file=ContentFile(b'Data', name=f'file {index}.txt'))
+        UserTaskArtifact.objects.create(status=self.status, text='Lorem ipsum')
+        self.request = APIRequestFactory().get(reverse('usertaskartifact-list'))
+
+    def test_uncached(self):
+        """File URLs should be generated for every artifact listing by default."""
+        self._list()
+        self._list()
+        assert self.storage.url_calls == 6
+
+    @override_settings(USER_TASKS_FILE_URL_TIMEOUT=60)
+    def test_cached(self):
+        """Cached file URLs should be reused until they expire."""
+        urls = self._list()
+        assert self.storage.url_calls == 3
+        assert urls[0] == ''
+        assert len(set(urls[1:])) == 3
+        assert self._list() == urls
+        artifact = UserTaskArtifact.objects.exclude(file='').first()
+        serializer = ArtifactSerializer(artifact, context={'request': self.request})
+        assert serializer.data['file'] in urls
+        assert self.storage.url_calls == 3
+
+    @override_settings(USER_TASKS_FILE_URL_TIMEOUT=60)
+    def test_cached_new_file(self):
+        """Only the URLs of files not seen before should be generated."""
+        self._list()
+        UserTaskArtifact.objects.create(status=self.status, file=ContentFile(b'Data', name='new.txt'))
+        self._list()
+        assert self.storage.url_calls == 4
+
+    def _list(self):
+        """
+        Serialize all the artifacts as a listing would, returning their file URLs.
+        """
+        artifacts = UserTaskArtifact.objects.order_by('file')
+        data = ArtifactSerializer(artifacts, many=True, context={'request': self.request}).data
+        return [item['file'] for item in data]
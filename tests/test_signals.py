@@ -292,6 +292,11 @@ class TestCreateUserTask(TestCase):
         assert body_status.total_steps == 1
         verify_state(body_status, eager)
 
+        # Every nested status should know the chord is the root of its tree
+        assert chord_status.root_id is None
+        for status in UserTaskStatus.objects.exclude(pk=chord_status.pk):
+            assert status.root_id == chord_status.id
+
     def _create_group(self, eager):
         """Create a celery group and verify some assertions about the corresponding status records"""
         result = group(sample_task.s(self.user.id, '1'),
@@ -3,18 +3,31 @@
 Tests for the user_tasks subclasses of celery.Task.
 """
 
+import gzip
+import json
 import logging
 from datetime import timedelta
+from unittest import mock
 from uuid import uuid4
 
+import pytest
 from celery import Task, shared_task
 
 from django.contrib import auth
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.test import TestCase, override_settings
 from django.utils.timezone import now
 
-from user_tasks.models import UserTaskArtifact, UserTaskStatus
-from user_tasks.tasks import UserTask, UserTaskMixin, purge_old_user_tasks
+import user_tasks.tasks
+from user_tasks.conf import settings
+from user_tasks.models import (ArchivedUserTaskArtifact, ArchivedUserTaskStatus, UserTaskArtifact, UserTaskStatus,
+                               UserTaskTombstone)
+from user_tasks.notifications import cached_summary_key
+from user_tasks.purge import pk_ranges
+from user_tasks.tasks import (UserTask, UserTaskMixin, archive_old_user_tasks, purge_old_user_tasks,
+                              purge_user_task_range, summarize_user_task_purge)
 
 User = auth.get_user_model()
 
@@ -142,6 +155,195 @@ class TestPurgeOldUserTasks(TestCase):
         assert UserTaskArtifact.objects.count() == 1
         assert UserTaskStatus.objects.filter(pk=status.id).exists()
 
+    @override_settings(USER_TASKS_PURGE_BATCH_SIZE=2, USER_TASKS_PURGE_BATCH_DELAY=0.5)
+    @mock.patch('user_tasks.purge.time.sleep')
+    def test_chunks(self, mock_sleep):
+        """Old records should be deleted in chunks, pausing between them."""
+        for _ in range(5):
+            self._create_records(now() - timedelta(days=31))
+        self._create_records(now() - timedelta(days=29))
+        stats = purge_old_user_tasks.delay().get()
+        assert UserTaskStatus.objects.count() == 1
+        assert UserTaskArtifact.objects.count() == 1
+        assert stats['deleted'] == 10
+        assert stats['complete']
+        assert stats['rate'] > 0
+        assert mock_sleep.call_count == 2
+        mock_sleep.assert_called_with(0.5)
+
+    @override_settings(USER_TASKS_PURGE_BATCH_SIZE=2, USER_TASKS_PURGE_TIME_LIMIT=timedelta(seconds=10))
+    @mock.patch('user_tasks.purge.time.monotonic')
+    def test_time_limit(self, mock_monotonic):
+        """A purge which runs out of time should stop, and the next one should pick up where it left off."""
+        for _ in range(3):
+            self._create_records(now() - timedelta(days=31))
+        mock_monotonic.side_effect = [100, 100, 111, 111]
+        stats = purge_old_user_tasks.delay().get()
+        assert not stats['complete']
+        assert UserTaskStatus.objects.count() == 1
+        mock_monotonic.side_effect = [200, 200, 200, 200, 200]
+        stats = purge_old_user_tasks.delay().get()
+        assert stats['complete']
+        assert UserTaskStatus.objects.count() == 0
+
+    @override_settings(USER_TASKS_PURGE_CONCURRENCY=3)
+    @mock.patch('user_tasks.tasks.chord')
+    def test_fan_out(self, mock_chord):
+        """With concurrency enabled, old records should be split into ranges purged by parallel tasks."""
+        statuses = [self._create_records(now() - timedelta(days=31)) for _ in range(7)]
+        self._create_records(now() - timedelta(days=29))
+        assert purge_old_user_tasks.delay().get() == {'ranges': 3}
+        header = mock_chord.call_args[0][0]
+        assert [signature.args[:2] for signature in header] == [
+            (statuses[0].pk, statuses[2].pk), (statuses[3].pk, statuses[5].pk), (statuses[6].pk, statuses[6].pk)
+        ]
+        results = [signature.apply().get() for signature in header]
+        # Retrying a range should be harmless
+        assert header[0].apply().get()['deleted'] == 0
+        stats = summarize_user_task_purge.delay(results).get()
+        assert stats['deleted'] == 14
+        assert stats['complete']
+        assert UserTaskStatus.objects.count() == 1
+
+    def test_range(self):
+        """A range purge should only delete old records within the range."""
+        first = self._create_records(now() - timedelta(days=31))
+        self._create_records(now() - timedelta(days=31))
+        recent = self._create_records(now() - timedelta(days=29))
+        stats = purge_user_task_range.delay(first.pk, recent.pk - 1, now().isoformat()).get()
+        assert stats['deleted'] == 4
+        assert list(UserTaskStatus.objects.all()) == [recent]
+
+    def test_pk_ranges(self):
+        """Primary key ranges should cover the whole span without overlapping."""
+        assert pk_ranges(1, 10, 3) == [(1, 4), (5, 8), (9, 10)]
+        assert pk_ranges(5, 6, 4) == [(5, 5), (6, 6)]
+
+    def test_artifact_files(self):
+        """Purging old records should also delete their artifact files from storage."""
+        status = self._create_records(now() - timedelta(days=31))
+        UserTaskArtifact.objects.create(status=status, file=ContentFile(b'Old', name='old.txt'))
+        recent = self._create_records(now() - timedelta(days=29))
+        UserTaskArtifact.objects.create(status=recent, file=ContentFile(b'Recent', name='recent.txt'))
+        storage = UserTaskArtifact._meta.get_field('file').storage
+        names = list(UserTaskArtifact.objects.exclude(file='').order_by('pk').values_list('file', flat=True))
+        self.addCleanup(storage.delete, names[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_old_user_tasks.delay()
+        assert not storage.exists(names[0])
+        assert storage.exists(names[1])
+
+    @override_settings(USER_TASKS_DELETE_ARTIFACT_FILES=False)
+    def test_artifact_files_disabled(self):
+        """Artifact files should be left alone if their deletion has been disabled."""
+        status = self._create_records(now() - timedelta(days=31))
+        artifact = UserTaskArtifact.objects.create(status=status, file=ContentFile(b'Old', name='old.txt'))
+        storage = UserTaskArtifact._meta.get_field('file').storage
+        self.addCleanup(storage.delete, artifact.file.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_old_user_tasks.delay()
+        assert storage.exists(artifact.file.name)
+
+    @mock.patch('user_tasks.tasks.partitioning_enabled', return_value=True)
+    @mock.patch('user_tasks.tasks.drop_expired_partitions')
+    def test_partitioned(self, mock_drop_partitions, _mock_enabled):
+        """Old partitions should be dropped before deleting any remaining old records."""
+        self._create_records(now() - timedelta(days=31))
+        purge_old_user_tasks.delay()
+        assert mock_drop_partitions.call_count == 1
+        assert now() - mock_drop_partitions.call_args[0][0] >= timedelta(days=30)
+        assert UserTaskStatus.objects.count() == 0
+
+    def test_archived_data(self):
+        """The cleanup task should also purge old archived records."""
+        self._create_records(now() - timedelta(days=31))
+        with override_settings(USER_TASKS_ARCHIVE_AGE=timedelta(days=1)):
+            archive_old_user_tasks.delay()
+        assert ArchivedUserTaskStatus.objects.count() == 1
+        purge_old_user_tasks.delay()
+        assert ArchivedUserTaskStatus.objects.count() == 0
+        assert ArchivedUserTaskArtifact.objects.count() == 0
+
+    @override_settings(USER_TASKS_EXPORT_STORAGE='django.core.files.storage.FileSystemStorage',
+                       USER_TASKS_EXPORT_CHUNK_SIZE=2)
+    def test_export(self):
+        """Records due for deletion should be exported, nested statuses and artifacts included, before the purge."""
+        archived = self._create_records(now() - timedelta(days=31))
+        with override_settings(USER_TASKS_ARCHIVE_AGE=timedelta(days=1)):
+            archive_old_user_tasks.delay()
+        parent = self._create_records(now() - timedelta(days=31))
+        child = self._create_records(now() - timedelta(days=31))
+        UserTaskStatus.objects.filter(pk=child.pk).update(parent=parent)
+        for _ in range(5):
+            self._create_records(now() - timedelta(days=31))
+        recent = self._create_records(now() - timedelta(days=29))
+        stats = purge_old_user_tasks.delay().get()
+        assert list(UserTaskStatus.objects.all()) == [recent]
+        assert stats['export'].startswith('user_task_exports/purge-')
+        storage = FileSystemStorage()
+        with storage.open(stats['export']) as export:
+            lines = [json.loads(line) for line in gzip.open(export)]
+        assert len(lines) == 8
+        assert len({line['uuid'] for line in lines}) == 8
+        exported_child = next(line for line in lines if line['uuid'] == str(child.uuid))
+        assert exported_child['parent_id'] == parent.pk
+        assert not exported_child['archived']
+        assert exported_child['artifacts'][0]['text'] == 'Lorem ipsum'
+        assert exported_child['artifacts'][0]['file'] is None
+        assert next(line for line in lines if line['uuid'] == str(archived.uuid))['archived']
+        storage.delete(stats['export'])
+
+    @override_settings(USER_TASKS_EXPORT_STORAGE='django.core.files.storage.FileSystemStorage',
+                       USER_TASKS_MAX_PER_USER=1)
+    def test_export_max_per_user(self):
+        """Tasks pushed past the per-user limit while the export is being written shouldn't be purged unexported."""
+        older = self._create_records(now() - timedelta(days=3))
+        newer = self._create_records(now() - timedelta(days=2))
+        export_statuses = user_tasks.tasks.export_statuses
+
+        def export_and_finish_another(*args, **kwargs):
+            result = export_statuses(*args, **kwargs)
+            # Finished just now, after the purge's reference time
+            self._create_records(now() - timedelta(hours=1))
+            return result
+
+        with mock.patch('user_tasks.tasks.export_statuses', side_effect=export_and_finish_another):
+            stats = purge_old_user_tasks.delay().get()
+        storage = FileSystemStorage()
+        with storage.open(stats['export']) as export:
+            assert [json.loads(line)['uuid'] for line in gzip.open(export)] == [str(older.uuid)]
+        storage.delete(stats['export'])
+        assert not UserTaskStatus.objects.filter(pk=older.pk).exists()
+        assert UserTaskStatus.objects.filter(pk=newer.pk).exists()
+        purge_old_user_tasks.delay()
+        assert not UserTaskStatus.objects.filter(pk=newer.pk).exists()
+
+    @override_settings(USER_TASKS_EXPORT_STORAGE='django.core.files.storage.FileSystemStorage')
+    def test_export_nothing_due(self):
+        """No export file should be saved when no records are due for deletion."""
+        self._create_records(now() - timedelta(days=29))
+        with mock.patch('django.core.files.storage.FileSystemStorage.save') as save:
+            stats = purge_old_user_tasks.delay().get()
+        assert 'export' not in stats
+        assert not save.called
+        assert UserTaskStatus.objects.count() == 1
+
+    @override_settings(USER_TASKS_EXPORT_STORAGE='django.core.files.storage.FileSystemStorage')
+    @mock.patch('user_tasks.tasks.export_statuses', side_effect=OSError)
+    def test_export_failure(self, _mock_export):
+        """Nothing should be purged if the records due for deletion couldn't be exported."""
+        self._create_records(now() - timedelta(days=31))
+        with pytest.raises(OSError):
+            purge_old_user_tasks.delay().get()
+        assert UserTaskStatus.objects.count() == 1
+
+    def test_tombstones(self):
+        """Purged statuses should leave tombstones, which are purged in turn once they're old enough."""
+        status = self._create_records(now() - timedelta(days=31))
+        UserTaskTombstone.objects.create(uuid=uuid4(), user=self.user, deleted=now() - timedelta(days=8))
+        purge_old_user_tasks.delay()
+        assert list(UserTaskTombstone.objects.values_list('uuid', flat=True)) == [status.uuid]
+
     def _create_records(self, created):
         """
         Create a UserTaskStatus and UserTaskArtifact with the specified creation date.
@@ -155,3 +357,78 @@ class TestPurgeOldUserTasks(TestCase):
         UserTaskStatus.objects.filter(pk=status.id).update(created=created, modified=completed)
         artifact = UserTaskArtifact.objects.create(status=status, text='Lorem ipsum')
         UserTaskArtifact.objects.filter(pk=artifact.id).update(created=completed, modified=completed)
+        return status
+
+
+@override_settings(CELERY_ALWAYS_EAGER=True, USER_TASKS_ARCHIVE_AGE=timedelta(days=1), USER_TASKS_ARCHIVE_BATCH_SIZE=2)
+class TestArchiveOldUserTasks(TestCase):
+    """
+    Tests of the Celery task which moves finished user task records into the archive tables.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user('test_user', 'test@example.com', 'password')
+
+    def test_old_finished_tree(self):
+        """Old finished task trees should be moved to the archive intact."""
+        parent = self._create_status(now() - timedelta(days=2), is_container=True)
+        child = self._create_status(now() - timedelta(days=2), parent=parent)
+        artifact = UserTaskArtifact.objects.create(status=child, text='Lorem ipsum')
+        archive_old_user_tasks.delay()
+        assert UserTaskStatus.objects.count() == 0
+        assert UserTaskArtifact.objects.count() == 0
+        archived_parent = ArchivedUserTaskStatus.objects.get(uuid=parent.uuid)
+        archived_child = ArchivedUserTaskStatus.objects.get(uuid=child.uuid)
+        assert archived_parent.pk == parent.pk
+        assert archived_parent.modified == parent.modified
+        assert archived_child.parent == archived_parent
+        archived_artifact = ArchivedUserTaskArtifact.objects.get(uuid=artifact.uuid)
+        assert archived_artifact.status == archived_child
+        assert archived_artifact.text == 'Lorem ipsum'
+        assert set(UserTaskTombstone.objects.values_list('uuid', flat=True)) == {parent.uuid, child.uuid}
+
+    def test_summary_discarded(self):
+        """The cached task summaries of the owners of archived tasks should be discarded."""
+        self._create_status(now() - timedelta(days=2))
+        cache = caches[settings.USER_TASKS_CACHE]
+        cache.set(cached_summary_key(self.user.pk), {UserTaskStatus.SUCCEEDED: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_old_user_tasks.delay()
+        assert cache.get(cached_summary_key(self.user.pk)) is None
+
+    def test_batches(self):
+        """Backlogs larger than the batch size should be archived completely."""
+        for _ in range(5):
+            self._create_status(now() - timedelta(days=2))
+        archive_old_user_tasks.delay()
+        assert UserTaskStatus.objects.count() == 0
+        assert ArchivedUserTaskStatus.objects.count() == 5
+
+    def test_recent_or_unfinished(self):
+        """Recently modified and unfinished tasks should stay in the main table."""
+        recent = self._create_status(now() - timedelta(hours=2))
+        running = self._create_status(now() - timedelta(days=2), state=UserTaskStatus.IN_PROGRESS)
+        archive_old_user_tasks.delay()
+        assert set(UserTaskStatus.objects.values_list('pk', flat=True)) == {recent.pk, running.pk}
+        assert ArchivedUserTaskStatus.objects.count() == 0
+
+    @override_settings(USER_TASKS_ARCHIVE_AGE=None)
+    def test_disabled(self):
+        """Nothing should be archived unless an archive age has been configured."""
+        self._create_status(now() - timedelta(days=2))
+        archive_old_user_tasks.delay()
+        assert UserTaskStatus.objects.count() == 1
+        assert ArchivedUserTaskStatus.objects.count() == 0
+
+    def _create_status(self, modified, state=UserTaskStatus.SUCCEEDED, **kwargs):
+        """
+        Create a UserTaskStatus with the specified state and modification date.
+        """
+        status = UserTaskStatus.objects.create(
+            user=self.user, task_id=str(uuid4()), task_class='test_tasks.sample_task', name='SampleTask',
+            total_steps=5, state=state, **kwargs)
+        UserTaskStatus.objects.filter(pk=status.id).update(created=modified, modified=modified)
+        status.refresh_from_db()
+        return status
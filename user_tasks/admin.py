@@ -3,8 +3,10 @@ Django admin configuration for the ``django-user-tasks`` models.
 """
 
 from django.contrib import admin
+from django.db import transaction
 
-from .models import UserTaskArtifact, UserTaskStatus
+from .models import (ArchivedUserTaskArtifact, ArchivedUserTaskStatus, UserTaskArtifact, UserTaskStatus,
+                     UserTaskTombstone)
 
 
 @admin.register(UserTaskArtifact)
@@ -33,3 +35,65 @@ class UserTaskStatusAdmin(admin.ModelAdmin):
         'uuid', 'task_id', 'task_class', 'name', 'user__username', 'user__email'
     )
     readonly_fields = ('parent', )
+
+    def delete_queryset(self, request, queryset):
+        """
+        Delete the selected statuses, leaving tombstones for clients syncing changes.
+        """
+        with transaction.atomic():
+            UserTaskTombstone.record(queryset)
+            super().delete_queryset(request, queryset)
+
+
+class ReadOnlyAdminMixin:
+    """
+    Admin mixin which allows records to be viewed and deleted, but not added or changed.
+    """
+
+    def has_add_permission(self, request):
+        """
+        Prevent creation of records other than by moving them from the main tables.
+        """
+        return False
+
+    def has_change_permission(self, request, obj=None):  # pylint: disable=unused-argument
+        """
+        Prevent modification of records which are kept only for reference.
+        """
+        return False
+
+
+@admin.register(ArchivedUserTaskArtifact)
+class ArchivedUserTaskArtifactAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    """
+    Configuration for ArchivedUserTaskArtifact admin panel.
+    """
+
+    list_display = ('created', 'uuid', 'status', 'name', 'text')
+    list_filter = ('name',)
+    ordering = ('-created',)
+    search_fields = ('uuid', 'name', 'text')
+    raw_id_fields = ('status',)
+
+
+@admin.register(ArchivedUserTaskStatus)
+class ArchivedUserTaskStatusAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    """
+    Configuration for ArchivedUserTaskStatus admin panel.
+    """
+
+    list_display = ('created', 'uuid', 'state', 'user', 'name')
+    list_filter = ('state',)
+    ordering = ('-created',)
+    search_fields = (
+        'uuid', 'task_id', 'task_class', 'name', 'user__username', 'user__email'
+    )
+    raw_id_fields = ('parent',)
+
+    def delete_queryset(self, request, queryset):
+        """
+        Delete the selected archived statuses, leaving tombstones so cached listings of them are invalidated.
+        """
+        with transaction.atomic():
+            UserTaskTombstone.record(queryset)
+            super().delete_queryset(request, queryset)
@@ -0,0 +1,66 @@
+"""
+Moving the status records of finished tasks into the archive tables.
+"""
+
+import logging
+
+from django.db import transaction
+
+from .models import (ArchivedUserTaskArtifact, ArchivedUserTaskStatus, UserTaskArtifact, UserTaskStatus,
+                     UserTaskTombstone)
+from .notifications import summaries_changed
+
+LOGGER = logging.getLogger(__name__)
+
+
+def archive_statuses(limit, batch_size):
+    """
+    Move finished task status trees last modified before ``limit`` into the archive tables.
+
+    Only trees whose root status is in a terminal state are moved, and each
+    one is moved in its entirety (with all nested statuses and artifacts).
+    Work is done in transactions of at most ``batch_size`` trees apiece, so
+    a large backlog doesn't hold locks for long.
+
+    Arguments:
+        limit (datetime): Trees whose root was last modified before this time are moved
+        batch_size (int): The maximum number of trees to move per transaction
+
+    Returns:
+        int: The total number of status records moved
+
+    """
+    roots = UserTaskStatus.objects.filter(
+        parent__isnull=True, state__in=UserTaskStatus.TERMINAL_STATES, modified__lt=limit).order_by('pk')
+    moved = 0
+    while True:
+        with transaction.atomic():
+            root_ids = list(roots.values_list('pk', flat=True)[:batch_size])
+            if not root_ids:
+                break
+            statuses = UserTaskStatus.objects.filter(pk__in=root_ids).with_descendants().order_by('pk')
+            status_ids = [status.pk for status in statuses]
+            ArchivedUserTaskStatus.objects.bulk_create(_copy(status, ArchivedUserTaskStatus) for status in statuses)
+            artifacts = UserTaskArtifact.objects.filter(status_id__in=status_ids)
+            ArchivedUserTaskArtifact.objects.bulk_create(
+                _copy(artifact, ArchivedUserTaskArtifact) for artifact in artifacts)
+            # Moved records disappear from the main status listing, so clients syncing it need to know
+            UserTaskTombstone.objects.bulk_create(
+                UserTaskTombstone(uuid=status.uuid, user_id=status.user_id) for status in statuses)
+            summaries_changed({status.user_id for status in statuses})
+            UserTaskStatus.objects.filter(pk__in=status_ids).delete()
+        moved += len(status_ids)
+        LOGGER.info('Archived %d user task statuses', len(status_ids))
+    return moved
+
+
+def _copy(instance, model):
+    """
+    Create an unsaved instance of ``model`` with the field values of ``instance`` which it has room for.
+    """
+    names = {field.attname for field in model._meta.concrete_fields}
+    return model(**{
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname in names
+    })
@@ -9,6 +9,8 @@ from django.core.files.storage import default_storage as django_default_storage
 from django.core.files.storage import storages
 from django.utils.module_loading import import_string
 
+from rest_framework.settings import api_settings
+
 from user_tasks import filters
 
 
@@ -37,6 +39,30 @@ class LazySettings():
     The behavior of ``django-user-tasks`` can be customized via the following Django settings.
     """
 
+    @property
+    def USER_TASKS_ARCHIVE_AGE(self):  # pylint: disable=invalid-name
+        """
+        ``timedelta`` after which finished UserTaskStatus records are moved to the archive tables, or ``None``.
+
+        For this setting to be useful, ``user_tasks.tasks.archive_old_user_tasks``
+        should be configured to run on an appropriate schedule.  The age is
+        calculated from the last modification of the outermost status of a
+        task (typically when it finished).  Archived records are still
+        available via the REST API and the Django admin, and are purged along
+        with the others once they reach ``USER_TASKS_MAX_AGE``.  The default
+        value of ``None`` disables archiving.
+        """
+        return getattr(django_settings, 'USER_TASKS_ARCHIVE_AGE', None)
+
+    @property
+    def USER_TASKS_ARCHIVE_BATCH_SIZE(self):  # pylint: disable=invalid-name
+        """
+        The maximum number of task status trees to archive in a single database transaction.
+
+        The default value is 500.
+        """
+        return getattr(django_settings, 'USER_TASKS_ARCHIVE_BATCH_SIZE', 500)
+
     @property
     def USER_TASKS_ARTIFACT_FILTERS(self):  # pylint: disable=invalid-name
         """
@@ -48,7 +74,7 @@ class LazySettings():
         which allows superusers to see all artifacts but other users to see only
         those for artifacts they triggered themselves.
         """
-        return getattr(django_settings, 'USER_TASKS_STATUS_FILTERS', (filters.ArtifactFilterBackend,))
+        return getattr(django_settings, 'USER_TASKS_ARTIFACT_FILTERS', (filters.ArtifactFilterBackend,))
 
     @property
     def USER_TASKS_ARTIFACT_STORAGE(self):  # pylint: disable=invalid-name
@@ -61,6 +87,134 @@ class LazySettings():
         import_path = getattr(django_settings, 'USER_TASKS_ARTIFACT_STORAGE', None)
         return get_storage(import_path)
 
+    @property
+    def USER_TASKS_CACHE(self):  # pylint: disable=invalid-name
+        """
+        The alias of the Django cache used to share information about task status changes between processes.
+
+        Waiting for status changes via the REST API only works across
+        processes if this is a cache shared between them, such as Redis or
+        Memcached.  The default value is ``'default'``.
+        """
+        return getattr(django_settings, 'USER_TASKS_CACHE', 'default')
+
+    @property
+    def USER_TASKS_DELETE_ARTIFACT_FILES(self):  # pylint: disable=invalid-name
+        """
+        ``True`` if artifact files should be removed from storage when their status records are deleted.
+
+        Applies to deletions via the REST API and ``user_tasks.tasks.purge_old_user_tasks``.
+        The default value is ``True``.
+        """
+        return getattr(django_settings, 'USER_TASKS_DELETE_ARTIFACT_FILES', True)
+
+    @property
+    def USER_TASKS_EVENT_BACKEND(self):  # pylint: disable=invalid-name
+        """
+        Import path of the publish/subscribe backend class used to stream task status changes to REST API clients.
+
+        ``'user_tasks.events.CacheEventBackend'`` passes events through the
+        cache named by ``USER_TASKS_CACHE``, which must then be shared by all
+        the web and Celery worker processes.
+        ``'user_tasks.events.LocalEventBackend'`` delivers events without
+        polling, but only within a single process.  Custom backends should
+        subclass ``user_tasks.events.EventBackend``.  The default value of
+        ``None`` publishes no events and disables the ``tasks/stream/``
+        endpoint.
+        """
+        return getattr(django_settings, 'USER_TASKS_EVENT_BACKEND', None)
+
+    @property
+    def USER_TASKS_EXPORT_CHUNK_SIZE(self):  # pylint: disable=invalid-name
+        """
+        The number of UserTaskStatus records to load from the database at a time when exporting them before a purge.
+
+        The default value is 1000.
+        """
+        return getattr(django_settings, 'USER_TASKS_EXPORT_CHUNK_SIZE', 1000)
+
+    @property
+    def USER_TASKS_EXPORT_STORAGE(self):  # pylint: disable=invalid-name
+        """
+        File storage backend in which to save an export of the records being purged, or ``None``.
+
+        When configured, ``user_tasks.tasks.purge_old_user_tasks`` first writes
+        all the status and artifact records due for deletion to a gzipped
+        NDJSON file under ``user_task_exports/`` in this storage, and doesn't
+        delete anything if that fails.  If explicitly set, the setting should
+        be the import path of a storage backend class.  The default value of
+        ``None`` disables exports.
+        """
+        import_path = getattr(django_settings, 'USER_TASKS_EXPORT_STORAGE', None)
+        if import_path is None:
+            return None
+        return import_string(import_path)()
+
+    @property
+    def USER_TASKS_FAST_STATUS_LIST(self):  # pylint: disable=invalid-name
+        """
+        True if REST API status listings should be serialized from plain database rows rather than model instances.
+
+        This skips instantiating a model and running ``StatusSerializer`` for
+        each status, and generating each artifact link separately, which
+        considerably reduces the CPU time needed to list many statuses.  The
+        response content is identical either way.  Projects which customize
+        the status serializer or URLs shouldn't enable it.  The default value
+        is False.
+        """
+        return getattr(django_settings, 'USER_TASKS_FAST_STATUS_LIST', False)
+
+    @property
+    def USER_TASKS_FILE_DELETION_THREADS(self):  # pylint: disable=invalid-name
+        """
+        The number of threads to use for concurrently deleting artifact files from storage.
+
+        Remote storage backends like Amazon S3 need a network round trip per
+        file deleted, so overlapping them speeds up large deletions
+        considerably.  The default value is 8.
+        """
+        return getattr(django_settings, 'USER_TASKS_FILE_DELETION_THREADS', 8)
+
+    @property
+    def USER_TASKS_FILE_URL_TIMEOUT(self):  # pylint: disable=invalid-name
+        """
+        The number of seconds for which the storage URLs of artifact files are cached for REST API responses.
+
+        Generating a URL for a file in storage like Amazon S3 means signing
+        it, and sometimes a network request as well, for every file in every
+        artifact listing.  When set, URLs are kept in the cache named by
+        ``USER_TASKS_CACHE`` and those missing are generated together for
+        each listing.  It must be shorter than the lifetime of the signed
+        URLs (``AWS_QUERYSTRING_EXPIRE`` for S3, for example), or clients
+        may receive URLs which have already expired.  The default value of
+        ``None`` disables this caching.
+        """
+        return getattr(django_settings, 'USER_TASKS_FILE_URL_TIMEOUT', None)
+
+    @property
+    def USER_TASKS_FINISHED_MAX_AGE(self):  # pylint: disable=invalid-name
+        """
+        The number of seconds for which REST API responses for finished task statuses and artifacts may be cached.
+
+        Once a task has succeeded, failed, or been canceled, its status and
+        artifacts effectively never change.  When set, REST API responses for
+        them get a ``Cache-Control: private, max-age=<value>`` header, and the
+        records are kept for that long in the cache named by
+        ``USER_TASKS_CACHE`` so repeated requests for them only need a
+        permission check.  Cached statuses are discarded whenever they change
+        (when canceled, for example), and cached records are discarded when
+        deleted via the REST API; records purged or deleted by other means
+        may be served until they expire.  Cached records are checked
+        against the object permissions but not the filter backends, so the
+        permissions must be at least as strict as the filters (as they are
+        for the defaults); records they deny are reported as not found.
+        Responses for artifacts include the signed storage URLs of their
+        files, so their ``max-age`` is capped at ``USER_TASKS_FILE_URL_TIMEOUT``
+        when that's set; otherwise this should be shorter than the lifetime
+        of those URLs.  The default value of ``None`` disables this caching.
+        """
+        return getattr(django_settings, 'USER_TASKS_FINISHED_MAX_AGE', None)
+
     @property
     def USER_TASKS_MAX_AGE(self):  # pylint: disable=invalid-name
         """
@@ -73,6 +227,163 @@ class LazySettings():
         """
         return getattr(django_settings, 'USER_TASKS_MAX_AGE', timedelta(days=30))
 
+    @property
+    def USER_TASKS_MAX_PAGE_SIZE(self):  # pylint: disable=invalid-name
+        """
+        The largest number of records per page which REST API clients can request via the ``page_size`` parameter.
+
+        Only used by ``user_tasks.pagination.UserTaskCursorPagination``.  The default value is 1000.
+        """
+        return getattr(django_settings, 'USER_TASKS_MAX_PAGE_SIZE', 1000)
+
+    @property
+    def USER_TASKS_MAX_PER_USER(self):  # pylint: disable=invalid-name
+        """
+        The maximum number of finished tasks to keep for each user, or ``None``.
+
+        When set, ``user_tasks.tasks.purge_old_user_tasks`` deletes each
+        user's oldest finished tasks beyond this number, regardless of their
+        age; pending and in-progress tasks are left alone.
+        Archived tasks are counted separately from those in the main table.
+        The default value of ``None`` imposes no limit.
+        """
+        return getattr(django_settings, 'USER_TASKS_MAX_PER_USER', None)
+
+    @property
+    def USER_TASKS_PAGE_SIZE(self):  # pylint: disable=invalid-name
+        """
+        The number of records per page returned by REST API listings by default.
+
+        Used by ``user_tasks.pagination.UserTaskCursorPagination`` and the
+        ``tasks/changes/`` endpoint.  The default value is 100.
+        """
+        return getattr(django_settings, 'USER_TASKS_PAGE_SIZE', 100)
+
+    @property
+    def USER_TASKS_PAGINATION_CLASS(self):  # pylint: disable=invalid-name
+        """
+        Django REST Framework pagination class for UserTaskStatus and UserTaskArtifact listing REST API calls.
+
+        ``user_tasks.pagination.UserTaskCursorPagination`` is recommended when
+        there can be many records to list, since its cost doesn't grow with the
+        page number and it doesn't count all the matching records.  The default
+        value is the ``DEFAULT_PAGINATION_CLASS`` configured for Django REST
+        Framework, which is ``None`` (no pagination) unless customized.  Either
+        a class or its import path may be given.
+        """
+        default = api_settings.DEFAULT_PAGINATION_CLASS
+        pagination_class = getattr(django_settings, 'USER_TASKS_PAGINATION_CLASS', default)
+        if isinstance(pagination_class, str):
+            return import_string(pagination_class)
+        return pagination_class
+
+    @property
+    def USER_TASKS_PARTITIONED(self):  # pylint: disable=invalid-name
+        """
+        ``True`` if the UserTaskStatus and UserTaskArtifact tables are PostgreSQL tables partitioned by month.
+
+        When enabled, ``user_tasks.tasks.purge_old_user_tasks`` drops whole
+        partitions of old records instead of deleting them row by row, and the
+        ``create_user_task_partitions`` management command should be run
+        regularly (at least monthly) to create partitions for upcoming months.
+        The tables must have been converted to partitioned tables as described
+        in the data cleanup documentation.  Ignored for other databases.  The
+        default value is ``False``.
+        """
+        return getattr(django_settings, 'USER_TASKS_PARTITIONED', False)
+
+    @property
+    def USER_TASKS_PURGE_BATCH_DELAY(self):  # pylint: disable=invalid-name
+        """
+        Number of seconds ``user_tasks.tasks.purge_old_user_tasks`` waits between deleting chunks of records.
+
+        A small delay leaves the database some capacity for other queries while
+        working through a large backlog.  The default value is 0.
+        """
+        return getattr(django_settings, 'USER_TASKS_PURGE_BATCH_DELAY', 0)
+
+    @property
+    def USER_TASKS_PURGE_BATCH_SIZE(self):  # pylint: disable=invalid-name
+        """
+        The maximum number of UserTaskStatus records ``user_tasks.tasks.purge_old_user_tasks`` deletes per chunk.
+
+        Each chunk is deleted in its own transaction, so this also bounds the
+        memory used and how long locks are held.  The default value is 1000.
+        """
+        return getattr(django_settings, 'USER_TASKS_PURGE_BATCH_SIZE', 1000)
+
+    @property
+    def USER_TASKS_PURGE_CONCURRENCY(self):  # pylint: disable=invalid-name
+        """
+        The number of parallel Celery tasks per table which ``user_tasks.tasks.purge_old_user_tasks`` may start.
+
+        Values greater than 1 split the old records into that many ranges of
+        primary keys, each purged by a separate
+        ``user_tasks.tasks.purge_user_task_range`` task; this requires a Celery
+        result backend.  The time limit set by ``USER_TASKS_PURGE_TIME_LIMIT``
+        then applies to each range separately.  The default value is 1.
+        """
+        return getattr(django_settings, 'USER_TASKS_PURGE_CONCURRENCY', 1)
+
+    @property
+    def USER_TASKS_PURGE_TIME_LIMIT(self):  # pylint: disable=invalid-name
+        """
+        ``timedelta`` after which ``user_tasks.tasks.purge_old_user_tasks`` stops starting new chunks, or ``None``.
+
+        Any records left over are deleted by the next run of the task.  The
+        default value of ``None`` lets the task run until it's done.
+        """
+        return getattr(django_settings, 'USER_TASKS_PURGE_TIME_LIMIT', None)
+
+    @property
+    def USER_TASKS_RETENTION_POLICIES(self):  # pylint: disable=invalid-name
+        """
+        List of retention policies overriding ``USER_TASKS_MAX_AGE`` for particular kinds of tasks.
+
+        Each policy is a dictionary with a ``max_age`` ``timedelta`` and at
+        least one of ``state`` and ``task_class`` (each either a single value or
+        a list of values) to select the tasks it applies to.  Ages are measured
+        from task creation unless the policy specifies ``'since': 'modified'``.
+        For example:
+
+        .. code-block:: python
+
+            USER_TASKS_RETENTION_POLICIES = [
+                {'state': 'Failed', 'max_age': timedelta(days=90)},
+                {'state': 'Succeeded', 'task_class': 'reports.tasks.generate_report', 'max_age': timedelta(days=2)},
+            ]
+
+        The first policy matching a task determines when it's deleted; tasks
+        not matching any policy are deleted after ``USER_TASKS_MAX_AGE``.
+        Policies are evaluated against the outermost status of each task.
+        The default value is an empty list.
+        """
+        return getattr(django_settings, 'USER_TASKS_RETENTION_POLICIES', [])
+
+    @property
+    def USER_TASKS_SENDFILE_HEADER(self):  # pylint: disable=invalid-name
+        """
+        The header used to have the web server send artifact files downloaded via the REST API, if any.
+
+        ``'X-Sendfile'`` (Apache's mod_xsendfile, lighttpd) gives the web
+        server the absolute path of the file, so it only applies to storage
+        backends which support ``path()``; files in other storage are still
+        streamed by Django.  ``'X-Accel-Redirect'`` (nginx) gives it the file
+        name appended to ``USER_TASKS_SENDFILE_PREFIX``, which should be an
+        ``internal`` location serving the storage directory.  The default
+        value is ``None``, which streams every file through Django.
+        """
+        return getattr(django_settings, 'USER_TASKS_SENDFILE_HEADER', None)
+
+    @property
+    def USER_TASKS_SENDFILE_PREFIX(self):  # pylint: disable=invalid-name
+        """
+        The URL path prefix of artifact files for ``USER_TASKS_SENDFILE_HEADER = 'X-Accel-Redirect'``.
+
+        The default value is ``'/user_tasks/artifacts/'``.
+        """
+        return getattr(django_settings, 'USER_TASKS_SENDFILE_PREFIX', '/user_tasks/artifacts/')
+
     @property
     def USER_TASKS_STATUS_FILTERS(self):
         """
@@ -80,11 +391,91 @@ class LazySettings():
 
         Each entry should be a Django REST Framework filter backend class
         object, such as ``django_filters.rest_framework.DjangoFilterBackend``.
-        The default value contains only ``user_tasks.filters.StatusFilterBackend``,
+        The default value contains ``user_tasks.filters.StatusFilterBackend``,
         which allows superusers to see all task statuses but other users to see only
-        those for tasks they triggered themselves.
+        those for tasks they triggered themselves, and
+        ``user_tasks.filters.StatusQueryFilterBackend``, which supports filtering by
+        state, creation time, task class, and nesting via query parameters.
+        """
+        return getattr(django_settings, 'USER_TASKS_STATUS_FILTERS',
+                       (filters.StatusFilterBackend, filters.StatusQueryFilterBackend))
+
+    @property
+    def USER_TASKS_STREAM_KEEPALIVE(self):  # pylint: disable=invalid-name
+        """
+        The number of seconds after which an idle task status event stream sends a comment to keep the connection open.
+
+        The default value is 15.
+        """
+        return getattr(django_settings, 'USER_TASKS_STREAM_KEEPALIVE', 15)
+
+    @property
+    def USER_TASKS_STREAM_MAX_DURATION(self):  # pylint: disable=invalid-name
+        """
+        The number of seconds after which a task status event stream is ended, so the client reconnects.
+
+        Limits how long a single request can occupy a web server worker (or
+        thread).  Browsers' ``EventSource`` reconnects automatically.  The
+        default value is 300.
+        """
+        return getattr(django_settings, 'USER_TASKS_STREAM_MAX_DURATION', 300)
+
+    @property
+    def USER_TASKS_SUMMARY_TIMEOUT(self):  # pylint: disable=invalid-name
+        """
+        The maximum number of seconds for which the counts of a user's tasks in each state may be cached.
+
+        Used by the ``tasks/summary/`` REST API endpoint.  Cached counts are
+        discarded whenever one of the user's statuses is created, changed, or
+        deleted, so this only limits how long they can be out of date after
+        changes made without using the model methods (like direct database
+        updates).  The default value is 300.
+        """
+        return getattr(django_settings, 'USER_TASKS_SUMMARY_TIMEOUT', 300)
+
+    @property
+    def USER_TASKS_SYNC_LAG(self):  # pylint: disable=invalid-name
+        """
+        The number of seconds for which recent changes are held back from clients syncing via the REST API.
+
+        Modification times are set before the changes are committed, so a
+        change made in a transaction can become visible after later ones;
+        holding back the most recent changes keeps a client's cursor from
+        moving past it.  This should exceed the duration of the longest
+        transaction which changes task statuses.  The default value is 5.
+        """
+        return getattr(django_settings, 'USER_TASKS_SYNC_LAG', 5)
+
+    @property
+    def USER_TASKS_TOMBSTONE_MAX_AGE(self):  # pylint: disable=invalid-name
+        """
+        ``timedelta`` after which records of UserTaskStatus deletions are purged.
+
+        Clients syncing changes to their tasks via the REST API must do so at
+        least this often, or they'll be told to fetch all their tasks again.
+        The records are deleted by ``user_tasks.tasks.purge_old_user_tasks``.
+        The default value is 7 days.
+        """
+        return getattr(django_settings, 'USER_TASKS_TOMBSTONE_MAX_AGE', timedelta(days=7))
+
+    @property
+    def USER_TASKS_WAIT_MAX_TIMEOUT(self):  # pylint: disable=invalid-name
+        """
+        The maximum number of seconds a REST API client can wait for a task status to change.
+
+        Each waiting client occupies a web server worker (or thread) for up to
+        this long.  The default value is 60.
+        """
+        return getattr(django_settings, 'USER_TASKS_WAIT_MAX_TIMEOUT', 60)
+
+    @property
+    def USER_TASKS_WAIT_POLL_INTERVAL(self):  # pylint: disable=invalid-name
+        """
+        The number of seconds between checks of the cache by REST API clients waiting for a task status to change.
+
+        The default value is 0.5.
         """
-        return getattr(django_settings, 'USER_TASKS_STATUS_FILTERS', (filters.StatusFilterBackend,))
+        return getattr(django_settings, 'USER_TASKS_WAIT_POLL_INTERVAL', 0.5)
 
 
 settings = LazySettings()
@@ -0,0 +1,174 @@
+"""
+Delivering artifact files to clients, via their storage URLs or downloads streamed by Django or the web server.
+"""
+
+import mimetypes
+import os
+import re
+from hashlib import md5
+from urllib.parse import quote
+
+from django.core.cache import caches
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header
+
+from .conf import settings
+
+BLOCK_SIZE = FileResponse.block_size
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_urls(files):
+    """
+    Get the storage URLs of the given files, from the cache where possible.
+
+    URLs are only cached if ``settings.USER_TASKS_FILE_URL_TIMEOUT`` is set;
+    the cached ones are fetched in a single request to the cache named by
+    ``settings.USER_TASKS_CACHE``, and any others are generated and then
+    cached together.
+
+    Arguments:
+        files (iterable): The ``FieldFile`` objects of the artifacts which have files
+
+    Returns:
+        dict: The URL of each file, keyed by file name
+
+    """
+    files = {file.name: file for file in files}
+    timeout = settings.USER_TASKS_FILE_URL_TIMEOUT
+    if timeout is None:
+        return {name: file.url for name, file in files.items()}
+    cache = caches[settings.USER_TASKS_CACHE]
+    keys = {_url_key(name): name for name in files}
+    urls = {keys[key]: url for key, url in cache.get_many(keys).items()}
+    generated = {key: files[name].url for key, name in keys.items() if name not in urls}
+    if generated:
+        cache.set_many(generated, timeout)
+        urls.update((keys[key], url) for key, url in generated.items())
+    return urls
+
+
+def file_response(request, field):
+    """
+    Get a response which delivers the given file to the client as an attachment.
+
+    If ``settings.USER_TASKS_SENDFILE_HEADER`` is set, the response is empty
+    and tells the web server which file to send in its place; otherwise the
+    file is streamed from storage a block at a time.  A streamed response
+    honors a single-range ``Range`` header, so interrupted downloads of large
+    files can be resumed.
+
+    Arguments:
+        request (HttpRequest): The request for the file
+        field (FieldFile): The file to deliver
+
+    """
+    filename = os.path.basename(field.name)
+    response = _offloaded_response(field, filename)
+    if response is not None:
+        return response
+    size = field.size
+    try:
+        byte_range = _byte_range(request, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = field.storage.open(field.name, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, as_attachment=True, filename=filename)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(_FileRange(file, end - start + 1), as_attachment=True, filename=filename, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _offloaded_response(field, filename):
+    """
+    Get an empty response telling the web server to send the file itself, if so configured and possible.
+    """
+    header = settings.USER_TASKS_SENDFILE_HEADER
+    if header is None:
+        return None
+    if header == 'X-Accel-Redirect':
+        location = settings.USER_TASKS_SENDFILE_PREFIX + quote(field.name)
+    else:
+        try:
+            location = field.path
+        except NotImplementedError:
+            # Not stored on the local filesystem, so it can only be streamed
+            return None
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response[header] = location
+    return response
+
+
+def _byte_range(request, size):
+    """
+    Get the first and last byte positions requested by the ``Range`` header, or None to send the whole file.
+
+    Malformed ranges, multiple ranges, and ranges made conditional by
+    ``If-Range`` are ignored, as HTTP allows.
+
+    Raises:
+        ValueError: If the range doesn't overlap the file at all
+
+    """
+    header = request.META.get('HTTP_RANGE', '')
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or 'HTTP_IF_RANGE' in request.META:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _url_key(name):
+    """
+    Get the cache key of the URL of the file with the given name, which may be too long or contain spaces.
+    """
+    return f'user_tasks.file_url.{md5(name.encode("utf-8"), usedforsecurity=False).hexdigest()}'
+
+
+class _FileRange:
+    """
+    A file-like view of the next ``length`` bytes of an open file, for streaming in a :py:class:`FileResponse`.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=BLOCK_SIZE):
+        """
+        Read up to ``size`` bytes without going past the end of the range.
+        """
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        """
+        Close the underlying file.
+        """
+        self.file.close()
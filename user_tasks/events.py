@@ -0,0 +1,235 @@
+"""
+Publish/subscribe backends for streaming task status change events to REST API clients.
+
+Events are published by :py:func:`user_tasks.notifications.status_changed`
+whenever a :py:class:`user_tasks.models.UserTaskStatus` is modified, on a
+channel per user.  The backend in use is configured by
+``settings.USER_TASKS_EVENT_BACKEND`` (no events are published unless one
+is); a custom backend can be provided by subclassing :py:class:`EventBackend`
+(to use Redis pub/sub directly, for example).
+"""
+
+import queue
+import threading
+import time
+from functools import lru_cache
+
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from .conf import settings
+
+# Events older than this are discarded by the cache backend even if some subscriber hasn't received them yet
+EVENT_TIMEOUT = 60
+
+
+def get_backend():
+    """
+    Get the event backend configured by ``settings.USER_TASKS_EVENT_BACKEND``, or None if there isn't one.
+    """
+    import_path = settings.USER_TASKS_EVENT_BACKEND
+    if import_path is None:
+        return None
+    return _backend(import_path)
+
+
+@lru_cache(maxsize=None)
+def _backend(import_path):
+    """
+    Get the shared instance of the event backend class with the given import path.
+    """
+    return import_string(import_path)()
+
+
+class EventBackend:
+    """
+    Base class for task status event publish/subscribe backends.
+    """
+
+    def publish(self, user_id, event):
+        """
+        Send an event to all current subscribers to the given user's channel.
+
+        Arguments:
+            user_id (int): The ID of the user who owns the status the event is about
+            event (dict): JSON-serializable event data
+
+        """
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """
+        Start receiving the events published for the given user.
+
+        Returns:
+            Subscription: An object with a ``get(timeout)`` method returning a list of the events published since the
+            previous call (waiting up to ``timeout`` seconds for one if there are none yet), and a ``close()`` method
+            to call when no more events are wanted
+
+        """
+        raise NotImplementedError
+
+
+class LocalEventBackend(EventBackend):
+    """
+    Event backend which only delivers events to subscribers in the same process.
+
+    Events are delivered immediately, without any polling, but changes made
+    by Celery workers or other web server processes are never seen.  Mainly
+    useful for tests and development servers.
+    """
+
+    def __init__(self):
+        """
+        Create an event backend with no subscribers.
+        """
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def publish(self, user_id, event):
+        """
+        Send an event to all current subscribers to the given user's channel.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.events.put(event)
+
+    def subscribe(self, user_id):
+        """
+        Start receiving the events published for the given user.
+        """
+        subscription = _LocalSubscription(self, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Stop delivering events to the given subscription.
+        """
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+
+class _LocalSubscription:
+    """
+    A subscription to a user's channel of a :py:class:`LocalEventBackend`.
+    """
+
+    def __init__(self, backend, user_id):
+        self.backend = backend
+        self.user_id = user_id
+        self.events = queue.SimpleQueue()
+
+    def get(self, timeout):
+        """
+        Get the events published since the last call, waiting up to ``timeout`` seconds for one if necessary.
+        """
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        """
+        Stop receiving events.
+        """
+        self.backend.unsubscribe(self)
+
+
+class CacheEventBackend(EventBackend):
+    """
+    Event backend which passes events between processes via the cache named by ``settings.USER_TASKS_CACHE``.
+
+    Each user's events are numbered by an atomically incremented counter
+    and stored under their own cache keys for a short time; subscribers
+    check the counter every ``settings.USER_TASKS_WAIT_POLL_INTERVAL``
+    seconds and fetch any new events in a single request.  Requires a cache
+    shared by all the web and Celery worker processes, such as Redis or
+    Memcached.
+    """
+
+    # The most events a subscriber will catch up on after falling behind
+    max_backlog = 1000
+
+    def publish(self, user_id, event):
+        """
+        Send an event to all current subscribers to the given user's channel.
+        """
+        cache = caches[settings.USER_TASKS_CACHE]
+        key = _counter_key(user_id)
+        cache.add(key, 0, None)
+        number = cache.incr(key)
+        cache.set(_event_key(user_id, number), event, EVENT_TIMEOUT)
+
+    def subscribe(self, user_id):
+        """
+        Start receiving the events published for the given user.
+        """
+        return _CacheSubscription(user_id)
+
+
+class _CacheSubscription:
+    """
+    A subscription to a user's channel of a :py:class:`CacheEventBackend`.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.cache = caches[settings.USER_TASKS_CACHE]
+        self.position = self._last()
+
+    def get(self, timeout):
+        """
+        Get the events published since the last call, waiting up to ``timeout`` seconds for one if necessary.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            last = self._last()
+            if last < self.position:
+                # The counter was evicted from the cache and restarted
+                self.position = 0
+            if last > self.position:
+                first = max(self.position, last - CacheEventBackend.max_backlog) + 1
+                keys = [_event_key(self.user_id, number) for number in range(first, last + 1)]
+                found = self.cache.get_many(keys)
+                self.position = last
+                return [found[key] for key in keys if key in found]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(settings.USER_TASKS_WAIT_POLL_INTERVAL, remaining))
+
+    def close(self):
+        """
+        Stop receiving events.
+        """
+
+    def _last(self):
+        """
+        Get the number of the last event published for this subscription's user.
+        """
+        return self.cache.get(_counter_key(self.user_id)) or 0
+
+
+def _counter_key(user_id):
+    """
+    Get the cache key of the counter of events published for a user.
+    """
+    return f'user_tasks.events.{user_id}'
+
+
+def _event_key(user_id, number):
+    """
+    Get the cache key of a particular event published for a user.
+    """
+    return f'user_tasks.events.{user_id}.{number}'
@@ -0,0 +1,90 @@
+"""
+Exporting user task records to compressed files before they're purged.
+"""
+
+import gzip
+import json
+import logging
+import tempfile
+
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.fields.files import FieldFile
+
+LOGGER = logging.getLogger(__name__)
+
+
+def export_statuses(querysets, storage, name, chunk_size):
+    """
+    Write the given statuses, the statuses nested inside them, and all of their artifacts to a gzipped NDJSON file.
+
+    Each line of the file is a JSON object with the field values of one
+    status, an ``archived`` flag, and an ``artifacts`` list of the field
+    values of its artifacts.  Statuses are read from the database with
+    ``QuerySet.iterator()``, so only ``chunk_size`` of them (and their
+    artifacts) are in memory at once.  The compressed output is spooled
+    through a temporary file before being saved to ``storage``, since not
+    all storage backends can accept streamed writes.
+
+    Arguments:
+        querysets (list): Querysets of either UserTaskStatus or ArchivedUserTaskStatus records; each status should
+            only be matched by one of them
+        storage (Storage): The file storage to save the export in
+        name (str): The name to save the file under; the storage may adjust it to avoid overwriting another file
+        chunk_size (int): The number of statuses to fetch from the database at a time
+
+    Returns:
+        tuple: The name the file was saved under (or None if there was nothing to export, so no file was saved), and
+        the number of statuses exported
+
+    """
+    count = 0
+    with tempfile.TemporaryFile() as temporary:
+        with gzip.GzipFile(fileobj=temporary, mode='wb') as compressed:
+            for queryset in querysets:
+                archived = queryset.model._meta.model_name.startswith('archived')
+                for status in _tree(queryset, chunk_size):
+                    line = _values(status)
+                    line['archived'] = archived
+                    line['artifacts'] = [_values(artifact) for artifact in status.artifacts.all()]
+                    compressed.write(json.dumps(line, cls=DjangoJSONEncoder).encode('utf-8') + b'\n')
+                    count += 1
+        if count == 0:
+            LOGGER.info('No user task statuses to export')
+            return None, 0
+        temporary.seek(0)
+        name = storage.save(name, File(temporary))
+    LOGGER.info('Exported %d user task statuses to %s', count, name)
+    return name, count
+
+
+def _tree(queryset, chunk_size):
+    """
+    Generate the statuses in ``queryset`` followed by each level of the statuses nested inside them.
+
+    Each level is selected via a subquery on the previous one rather than
+    a list of primary keys, so memory usage doesn't grow with the number of
+    statuses.
+    """
+    level = queryset.order_by('pk')
+    while True:
+        found = False
+        for status in level.prefetch_related('artifacts').iterator(chunk_size=chunk_size):
+            found = True
+            yield status
+        if not found:
+            return
+        level = queryset.model.objects.filter(parent__in=level.values('pk')).order_by('pk')
+
+
+def _values(instance):
+    """
+    Get a dictionary of the database field values of a model instance.
+    """
+    values = {}
+    for field in instance._meta.concrete_fields:
+        value = getattr(instance, field.attname)
+        if isinstance(value, FieldFile):
+            value = value.name or None
+        values[field.attname] = value
+    return values
@@ -3,6 +3,10 @@
 Optional Django REST Framework filter backends for the ``django-user-tasks`` REST API.
 """
 
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import BaseFilterBackend
 
 
@@ -20,7 +24,7 @@ class ArtifactFilterBackend(BaseFilterBackend):
         """
         if request.user.is_superuser:
             return queryset
-        return queryset.filter(status__user=request.user)
+        return queryset.filter(user=request.user)
 
 
 class StatusFilterBackend(BaseFilterBackend):
@@ -38,3 +42,64 @@ class StatusFilterBackend(BaseFilterBackend):
         if request.user.is_superuser:
             return queryset
         return queryset.filter(user=request.user)
+
+
+class StatusQueryFilterBackend(BaseFilterBackend):
+    """
+    Filter for UserTaskStatus listings in the REST API by query parameters, included in the default filters.
+
+    Supports the following query parameters, each backed by an index on
+    ``(user, <field>, created)`` so that users with long histories can cheaply
+    list just the tasks they're interested in:
+
+    * ``state``: A single state, like ``Pending``
+    * ``state__in``: A comma-separated list of states
+    * ``created__gte`` and ``created__lt``: ISO 8601 timestamps bounding the creation time
+    * ``task_class``: The fully qualified class name of the task
+    * ``is_container``: ``true`` or ``false``
+    * ``root_only``: ``true`` to exclude the statuses nested inside container statuses
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Filter the status records by any of the supported query parameters.
+        """
+        params = request.query_params
+        if 'state' in params:
+            queryset = queryset.filter(state=params['state'])
+        if 'state__in' in params:
+            queryset = queryset.filter(state__in=params['state__in'].split(','))
+        for name in ('created__gte', 'created__lt'):
+            if name in params:
+                queryset = queryset.filter(**{name: _parse_timestamp(name, params[name])})
+        if 'task_class' in params:
+            queryset = queryset.filter(task_class=params['task_class'])
+        if 'is_container' in params:
+            queryset = queryset.filter(is_container=_parse_boolean('is_container', params['is_container']))
+        if 'root_only' in params and _parse_boolean('root_only', params['root_only']):
+            queryset = queryset.filter(parent__isnull=True)
+        return queryset
+
+
+def _parse_boolean(name, value):
+    """
+    Parse the ``true`` or ``false`` value of the named query parameter.
+    """
+    if value.lower() not in ('true', 'false'):
+        raise ValidationError({name: 'Must be true or false.'})
+    return value.lower() == 'true'
+
+
+def _parse_timestamp(name, value):
+    """
+    Parse the ISO 8601 timestamp value of the named query parameter, assuming the current time zone if none is given.
+    """
+    try:
+        timestamp = parse_datetime(value)
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        raise ValidationError({name: 'Must be an ISO 8601 timestamp.'})
+    if is_naive(timestamp):
+        timestamp = make_aware(timestamp)
+    return timestamp
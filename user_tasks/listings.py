@@ -0,0 +1,132 @@
+"""
+Listing the records of the main and archive tables together, as if they were in a single table.
+"""
+
+import heapq
+from itertools import islice
+
+
+class CombinedQuerySet:
+    """
+    A read-only sequence of the records of several querysets, merged in the order of their ``order_by()`` fields.
+
+    Supports just enough of the ``QuerySet`` API for the REST API listings
+    and Django REST Framework's pagination classes: ordering, filtering,
+    counting, and slicing.  A slice is taken from the start of each
+    queryset up to its end and then merged, so any page costs one query per
+    queryset, but each of those reads every row before the end of the slice.
+    Only with the keyset filtering of
+    :py:class:`user_tasks.pagination.UserTaskCursorPagination` do slices
+    always start near the beginning, keeping each page as cheap as the
+    first; with offset-based pagination, deep pages read ``offset +
+    page_size`` rows from every queryset.  Records must be ordered by
+    fields which together are unique across all the querysets, like the
+    default ``('-created', 'id')``, for the merged order to be stable.
+    """
+
+    ordered = True
+
+    def __init__(self, querysets, ordering=('-created', 'id')):
+        """
+        Combine the given querysets (of models with the ordering fields in common) into one sequence.
+        """
+        self.ordering = tuple(ordering)
+        self.querysets = [queryset.order_by(*self.ordering) for queryset in querysets]
+
+    @property
+    def model(self):
+        """
+        Get the model of the first queryset, which is checked for permissions like that of a plain queryset would be.
+        """
+        return self.querysets[0].model
+
+    def order_by(self, *fields):
+        """
+        Get a copy of this sequence ordered by the given fields instead.
+        """
+        return CombinedQuerySet(self.querysets, fields or self.ordering)
+
+    def filter(self, *args, **kwargs):
+        """
+        Get a copy of this sequence with the given filter applied to each queryset.
+        """
+        return self._map('filter', *args, **kwargs)
+
+    def prefetch_related(self, *lookups):
+        """
+        Get a copy of this sequence with the given prefetches applied to (or cleared from) each queryset.
+        """
+        return self._map('prefetch_related', *lookups)
+
+    def values(self, *fields):
+        """
+        Get a copy of this sequence listing dictionaries of the given fields of each record.
+        """
+        return self._map('values', *fields)
+
+    def count(self):
+        """
+        Count the records of all the querysets.
+        """
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def exists(self):
+        """
+        Determine whether any of the querysets has any records.
+        """
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def __iter__(self):
+        """
+        Iterate over the records of all the querysets in order.
+        """
+        return heapq.merge(*self.querysets, key=self._sort_key)
+
+    def __getitem__(self, index):
+        """
+        Get a list of the records in the given slice, or the record at the given position.
+        """
+        if not isinstance(index, slice):
+            records = self[index:index + 1]
+            if not records:
+                raise IndexError(index)
+            return records[0]
+        if index.step is not None or (index.start or 0) < 0 or (index.stop is not None and index.stop < 0):
+            raise ValueError('Only non-negative slices without a step are supported.')
+        querysets = self.querysets if index.stop is None else [queryset[:index.stop] for queryset in self.querysets]
+        return list(islice(heapq.merge(*querysets, key=self._sort_key), index.start, index.stop))
+
+    def _map(self, method, *args, **kwargs):
+        """
+        Get a copy of this sequence with the given QuerySet method applied to each queryset.
+        """
+        querysets = [getattr(queryset, method)(*args, **kwargs) for queryset in self.querysets]
+        return CombinedQuerySet(querysets, self.ordering)
+
+    def _sort_key(self, record):
+        """
+        Get the key by which the given model instance or values dictionary is ordered.
+        """
+        key = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = record[name] if isinstance(record, dict) else getattr(record, name)
+            key.append(_Descending(value) if field.startswith('-') else value)
+        return tuple(key)
+
+
+class _Descending:
+    """
+    Wrapper for a sort key value which reverses its order.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
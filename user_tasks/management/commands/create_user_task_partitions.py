@@ -0,0 +1,37 @@
+"""
+Management command for creating upcoming monthly partitions of the user task tables.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from user_tasks.partitions import create_partitions, partitioning_enabled
+
+
+class Command(BaseCommand):
+    """
+    Create any missing monthly partitions of the UserTaskStatus and UserTaskArtifact tables.
+
+    Should be run regularly (at least once a month) when the ``USER_TASKS_PARTITIONED`` setting is enabled, so that
+    there is always a partition ready for newly created records.
+    """
+
+    help = 'Create missing monthly partitions of the user task tables, starting with the current month'
+
+    def add_arguments(self, parser):
+        """
+        Add the command-line options supported by this command.
+        """
+        parser.add_argument('--months', type=int, default=3,
+                            help='The number of months to create partitions for, including the current one')
+        parser.add_argument('--database', default='default', help='The database to create the partitions in')
+
+    def handle(self, *args, **options):
+        """
+        Create the partitions.
+        """
+        if not partitioning_enabled(options['database']):
+            raise CommandError('USER_TASKS_PARTITIONED must be enabled and the database must be PostgreSQL')
+        created = create_partitions(now(), options['months'], using=options['database'])
+        for name in created:
+            self.stdout.write(f'Created partition {name}')
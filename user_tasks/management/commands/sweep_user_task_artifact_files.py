@@ -0,0 +1,105 @@
+"""
+Management command for deleting artifact files which no longer belong to any artifact record.
+"""
+
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from user_tasks.models import ArchivedUserTaskArtifact, UserTaskArtifact
+from user_tasks.purge import delete_artifact_files
+
+
+class Command(BaseCommand):
+    """
+    Delete files in the artifact storage which aren't referenced by any UserTaskArtifact or ArchivedUserTaskArtifact.
+
+    Files can be orphaned by status records deleted before artifact file
+    cleanup was supported, by deletions bypassing it, or by storage errors.
+    The storage is walked incrementally, so the command runs in bounded
+    memory regardless of how many files there are.  Recently modified files
+    are skipped, since their artifact records may not have been committed
+    yet.
+    """
+
+    help = 'Delete user task artifact files which are no longer referenced by any artifact record'
+
+    def add_arguments(self, parser):
+        """
+        Add the command-line options supported by this command.
+        """
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='The number of file names to check against the database at a time')
+        parser.add_argument('--min-age', type=int, default=24,
+                            help='Only delete files last modified at least this many hours ago')
+        parser.add_argument('--dry-run', action='store_true', help='List the orphaned files without deleting them')
+
+    def handle(self, *args, **options):
+        """
+        Find and delete the orphaned files.
+        """
+        storage = UserTaskArtifact._meta.get_field('file').storage
+        limit = now() - timedelta(hours=options['min_age'])
+        found = 0
+        batch = []
+        for name in _walk(storage, _prefix()):
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                found += self._sweep(storage, batch, limit, options['dry_run'])
+                batch = []
+        if batch:
+            found += self._sweep(storage, batch, limit, options['dry_run'])
+        verb = 'Found' if options['dry_run'] else 'Deleted'
+        self.stdout.write(f'{verb} {found} orphaned user task artifact files')
+
+    def _sweep(self, storage, names, limit, dry_run):
+        """
+        Delete those of the given files which aren't referenced by any artifact record.
+
+        Returns:
+            int: The number of orphaned files found
+
+        """
+        referenced = set()
+        for model in (UserTaskArtifact, ArchivedUserTaskArtifact):
+            referenced.update(model.objects.filter(file__in=names).values_list('file', flat=True))
+        orphans = [name for name in names if name not in referenced and _modified_before(storage, name, limit)]
+        for name in orphans:
+            self.stdout.write(name)
+        if not dry_run:
+            delete_artifact_files(orphans)
+        return len(orphans)
+
+
+def _prefix():
+    """
+    Get the storage directory under which all artifact files are stored.
+    """
+    upload_to = UserTaskArtifact._meta.get_field('file').upload_to
+    return upload_to.split('/', 1)[0]
+
+
+def _walk(storage, directory):
+    """
+    Generate the names of all files in the given storage directory and its subdirectories.
+    """
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in sorted(files):
+        yield posixpath.join(directory, name)
+    for name in sorted(directories):
+        yield from _walk(storage, posixpath.join(directory, name))
+
+
+def _modified_before(storage, name, limit):
+    """
+    Determine if the given file was last modified before ``limit``, assuming so if the storage can't tell.
+    """
+    try:
+        return storage.get_modified_time(name) < limit
+    except NotImplementedError:
+        return True
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:11
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_tasks', '0005_mariadb_uuid_conversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedUserTaskStatus',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField()),
+                ('modified', models.DateTimeField()),
+                ('uuid', models.UUIDField(editable=False, help_text='Unique ID for use in APIs', unique=True)),
+                ('task_id', models.CharField(help_text='UUID of the associated Celery task', max_length=128, unique=True)),
+                ('is_container', models.BooleanField(default=False, help_text='True if this status corresponds to a container of multiple tasks')),
+                ('task_class', models.CharField(help_text='Fully qualified class name of the task being performed', max_length=128)),
+                ('name', models.CharField(help_text='A name for this task which the triggering user will understand', max_length=255)),
+                ('state', models.CharField(max_length=128)),
+                ('completed_steps', models.PositiveSmallIntegerField(default=0)),
+                ('total_steps', models.PositiveSmallIntegerField()),
+                ('attempts', models.PositiveSmallIntegerField(default=1, help_text='How many times has execution been attempted?')),
+                ('parent', models.ForeignKey(blank=True, default=None, help_text='Status of the containing task grouping (if any)', null=True, on_delete=django.db.models.deletion.CASCADE, to='user_tasks.archivedusertaskstatus')),
+                ('user', models.ForeignKey(help_text='The user who triggered the task', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'archived user task statuses',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedUserTaskArtifact',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField()),
+                ('modified', models.DateTimeField()),
+                ('uuid', models.UUIDField(editable=False, help_text='Unique ID for use in APIs', unique=True)),
+                ('name', models.CharField(default='Output', help_text='Distinguishes between multiple artifact types for the same task', max_length=255)),
+                ('file', models.FileField(blank=True, null=True, upload_to='user_tasks/%Y/%m/%d/')),
+                ('url', models.TextField(blank=True, validators=[django.core.validators.URLValidator()])),
+                ('text', models.TextField(blank=True)),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artifacts', to='user_tasks.archivedusertaskstatus')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedusertaskstatus',
+            index=models.Index(fields=['user', '-created'], name='user_tasks_archived_user_idx'),
+        ),
+    ]
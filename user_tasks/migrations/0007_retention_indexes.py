@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_tasks', '0006_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedusertaskstatus',
+            index=models.Index(fields=['state', 'task_class', 'created'], name='user_tasks_archived_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['state', 'task_class', 'created'], name='user_tasks_state_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['user', '-created'], name='user_tasks_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_tasks', '0007_retention_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='archivedusertaskstatus',
+            name='user_tasks_archived_user_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='usertaskstatus',
+            name='user_tasks_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='archivedusertaskartifact',
+            index=models.Index(fields=['-created', 'id'], name='user_tasks_archived_art_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedusertaskstatus',
+            index=models.Index(fields=['user', '-created', 'id'], name='user_tasks_archived_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedusertaskstatus',
+            index=models.Index(fields=['-created', 'id'], name='user_tasks_arch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskartifact',
+            index=models.Index(fields=['-created', 'id'], name='user_tasks_art_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['user', '-created', 'id'], name='user_tasks_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['-created', 'id'], name='user_tasks_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_tasks', '0008_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['user', 'modified'], name='user_tasks_user_modified_idx'),
+        ),
+    ]
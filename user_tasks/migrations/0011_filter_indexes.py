@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_tasks', '0010_tombstones'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['user', 'state', '-created', 'id'], name='user_tasks_user_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['user', 'task_class', '-created', 'id'], name='user_tasks_user_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['user', 'is_container', '-created', 'id'], name='user_tasks_user_container_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskstatus',
+            index=models.Index(fields=['user', 'parent', '-created', 'id'], name='user_tasks_user_parent_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+# The number of statuses to update per query
+BATCH_SIZE = 1000
+
+
+def backfill_roots(apps, schema_editor):
+    """
+    Set the root of every existing nested status, in batches.
+
+    Each batch contains statuses whose parent is a root or already has its
+    root set, so the roots are filled in from the top of each tree down.
+    """
+    for model_name in ('UserTaskStatus', 'ArchivedUserTaskStatus'):
+        model = apps.get_model('user_tasks', model_name)
+        ready = model.objects.filter(root__isnull=True, parent__isnull=False).filter(
+            Q(parent__parent__isnull=True) | Q(parent__root__isnull=False)).order_by('pk')
+        while True:
+            batch = list(ready.values_list('pk', 'parent_id', 'parent__root_id')[:BATCH_SIZE])
+            if not batch:
+                break
+            model.objects.bulk_update(
+                [model(pk=pk, root_id=parent_root_id or parent_id) for pk, parent_id, parent_root_id in batch],
+                ['root'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_tasks', '0011_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedusertaskstatus',
+            name='root',
+            field=models.ForeignKey(blank=True, db_constraint=False, default=None, help_text='Status of the outermost containing task grouping (if any)', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='user_tasks.archivedusertaskstatus'),
+        ),
+        migrations.AddField(
+            model_name='usertaskstatus',
+            name='root',
+            field=models.ForeignKey(blank=True, db_constraint=False, default=None, help_text='Status of the outermost containing task grouping (if any)', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='user_tasks.usertaskstatus'),
+        ),
+        migrations.RunPython(backfill_roots, migrations.RunPython.noop),
+    ]
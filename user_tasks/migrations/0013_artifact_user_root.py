@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# The number of artifacts to update per query
+BATCH_SIZE = 1000
+
+
+def backfill_artifacts(apps, schema_editor):
+    """
+    Copy the user and root of each existing artifact's status onto the artifact, in batches.
+    """
+    for model_name in ('UserTaskArtifact', 'ArchivedUserTaskArtifact'):
+        model = apps.get_model('user_tasks', model_name)
+        missing = model.objects.filter(user__isnull=True).order_by('pk')
+        while True:
+            batch = list(missing.values_list('pk', 'status_id', 'status__user_id', 'status__root_id')[:BATCH_SIZE])
+            if not batch:
+                break
+            model.objects.bulk_update(
+                [model(pk=pk, user_id=user_id, root_id=root_id or status_id)
+                 for pk, status_id, user_id, root_id in batch],
+                ['user', 'root'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_tasks', '0012_status_root'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedusertaskartifact',
+            name='root',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Status of the outermost task grouping containing the task', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='user_tasks.archivedusertaskstatus'),
+        ),
+        migrations.AddField(
+            model_name='archivedusertaskartifact',
+            name='user',
+            field=models.ForeignKey(blank=True, help_text='The user who triggered the task', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='usertaskartifact',
+            name='root',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Status of the outermost task grouping containing the task', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='user_tasks.usertaskstatus'),
+        ),
+        migrations.AddField(
+            model_name='usertaskartifact',
+            name='user',
+            field=models.ForeignKey(blank=True, help_text='The user who triggered the task', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_artifacts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='archivedusertaskartifact',
+            index=models.Index(fields=['user', '-created', 'id'], name='user_tasks_archived_art_u_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskartifact',
+            index=models.Index(fields=['user', '-created', 'id'], name='user_tasks_artifact_user_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:31
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Catch any artifacts saved without these fields by older code since the previous migration ran
+backfill_artifacts = import_module('user_tasks.migrations.0013_artifact_user_root').backfill_artifacts
+
+
+class Migration(migrations.Migration):
+
+    # PostgreSQL can't alter a table with pending constraint checks from updates in the same transaction
+    atomic = False
+
+    dependencies = [
+        ('user_tasks', '0013_artifact_user_root'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_artifacts, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='archivedusertaskartifact',
+            name='root',
+            field=models.ForeignKey(db_constraint=False, help_text='Status of the outermost task grouping containing the task', on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='user_tasks.archivedusertaskstatus'),
+        ),
+        migrations.AlterField(
+            model_name='archivedusertaskartifact',
+            name='user',
+            field=models.ForeignKey(help_text='The user who triggered the task', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='usertaskartifact',
+            name='root',
+            field=models.ForeignKey(db_constraint=False, help_text='Status of the outermost task grouping containing the task', on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='user_tasks.usertaskstatus'),
+        ),
+        migrations.AlterField(
+            model_name='usertaskartifact',
+            name='user',
+            field=models.ForeignKey(help_text='The user who triggered the task', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
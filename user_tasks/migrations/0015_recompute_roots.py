@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:10
+
+from django.db import migrations
+from django.db.models import F, Q
+
+# The number of records to update per query
+BATCH_SIZE = 1000
+
+
+def recompute_roots(apps, schema_editor):
+    """
+    Correct the roots of statuses and artifacts saved with wrong ones, in batches.
+
+    The statuses of chords created before the root of a status moved into a
+    parent was saved have a missing or wrong root.  Each pass corrects the
+    statuses whose root doesn't match that of their parent, so the right
+    values propagate down one level of nesting per pass; the artifacts are
+    then corrected from their statuses.
+    """
+    for status_name, artifact_name in (('UserTaskStatus', 'UserTaskArtifact'),
+                                       ('ArchivedUserTaskStatus', 'ArchivedUserTaskArtifact')):
+        status_model = apps.get_model('user_tasks', status_name)
+        artifact_model = apps.get_model('user_tasks', artifact_name)
+        wrong = status_model.objects.filter(
+            Q(parent__parent__isnull=True) & (Q(root__isnull=True) | ~Q(root=F('parent')))
+            | Q(parent__parent__isnull=False) & (Q(root__isnull=True) | ~Q(root=F('parent__root'))),
+            parent__isnull=False,
+        ).order_by('pk')
+        while True:
+            batch = list(wrong.values_list('pk', 'parent_id', 'parent__root_id')[:BATCH_SIZE])
+            if not batch:
+                break
+            status_model.objects.bulk_update(
+                [status_model(pk=pk, root_id=parent_root_id or parent_id) for pk, parent_id, parent_root_id in batch],
+                ['root'])
+        wrong = artifact_model.objects.filter(
+            Q(status__root__isnull=True) & ~Q(root=F('status'))
+            | Q(status__root__isnull=False) & ~Q(root=F('status__root'))
+        ).order_by('pk')
+        while True:
+            batch = list(wrong.values_list('pk', 'status_id', 'status__root_id')[:BATCH_SIZE])
+            if not batch:
+                break
+            artifact_model.objects.bulk_update(
+                [artifact_model(pk=pk, root_id=root_id or status_id) for pk, status_id, root_id in batch], ['root'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_tasks', '0014_artifact_user_root_required'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_roots, migrations.RunPython.noop),
+    ]
@@ -21,6 +21,7 @@ from user_tasks import user_task_stopped
 
 from .conf import settings
 from .exceptions import TaskCanceledException
+from .notifications import status_changed, summaries_changed
 
 LOGGER = logging.getLogger(__name__)
 
@@ -28,6 +29,57 @@ LOGGER = logging.getLogger(__name__)
 # See https://github.com/landscapeio/pylint-django/issues/35 for more details
 
 
+class UserTaskStatusQuerySet(models.QuerySet):
+    """
+    Custom QuerySet for task status models, which form trees via their ``parent`` field.
+    """
+
+    def with_descendants(self):
+        """
+        Get a QuerySet of the statuses in this one plus all the statuses nested inside them.
+
+        Runs one query per level of nesting; that's rarely more than three
+        (a chord containing a group of tasks).
+        """
+        ids = set(self.values_list('pk', flat=True))
+        level = ids
+        while level:
+            level = set(self.model.objects.filter(parent_id__in=level).values_list('pk', flat=True)) - ids
+            ids |= level
+        return self.model.objects.filter(pk__in=ids)
+
+    def cancel(self):
+        """
+        Cancel the tasks of these statuses (and of the statuses nested inside them) which haven't finished running.
+
+        Equivalent to calling :py:meth:`UserTaskStatus.cancel` on each of
+        them, but all the statuses are marked as canceled by a single
+        ``UPDATE`` and all the Celery tasks still waiting to run are revoked
+        by a single broadcast.
+
+        Returns:
+            list: The statuses which were canceled
+
+        """
+        statuses = self.with_descendants()
+        with transaction.atomic():
+            canceled = list(statuses.exclude(state__in=UserTaskStatus.TERMINAL_STATES).select_for_update())
+            modified = now()
+            self.model.objects.filter(pk__in=[status.pk for status in canceled]).exclude(
+                state__in=UserTaskStatus.TERMINAL_STATES).update(state=UserTaskStatus.CANCELED, modified=modified)
+            stopped = [status for status in canceled
+                       if not status.is_container and status.state in (UserTaskStatus.PENDING, UserTaskStatus.RETRYING)]
+            for status in canceled:
+                status.state = UserTaskStatus.CANCELED
+                status.modified = modified
+                status_changed(status)
+        if stopped:
+            current_app.control.revoke([status.task_id for status in stopped])
+        for status in stopped:
+            user_task_stopped.send_robust(UserTaskStatus, status=status)
+        return canceled
+
+
 class UserTaskStatus(TimeStampedModel):
     """
     The current status of an asynchronous task running on behalf of a particular user.
@@ -46,6 +98,9 @@ class UserTaskStatus(TimeStampedModel):
     CANCELED = 'Canceled'
     RETRYING = 'Retrying'
 
+    # States in which a task has stopped running for good
+    TERMINAL_STATES = (SUCCEEDED, FAILED, CANCELED)
+
     STATE_TRANSLATIONS = {
         PENDING: _('Pending'),
         IN_PROGRESS: _('In Progress'),
@@ -66,6 +121,11 @@ class UserTaskStatus(TimeStampedModel):
                                help_text='UUID of the associated Celery task')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, default=None,
                                help_text='Status of the containing task grouping (if any)')
+    # Denormalized from the parent chain so a whole tree can be fetched in one query; without a database constraint,
+    # since nested statuses are already deleted along with their parents
+    root = models.ForeignKey('self', on_delete=models.DO_NOTHING, null=True, blank=True, default=None,
+                             db_constraint=False, related_name='+',
+                             help_text='Status of the outermost containing task grouping (if any)')
     is_container = models.BooleanField(default=False,
                                        help_text='True if this status corresponds to a container of multiple tasks')
     task_class = models.CharField(max_length=128, help_text='Fully qualified class name of the task being performed')
@@ -75,12 +135,44 @@ class UserTaskStatus(TimeStampedModel):
     total_steps = models.PositiveSmallIntegerField()
     attempts = models.PositiveSmallIntegerField(default=1, help_text='How many times has execution been attempted?')
 
+    objects = UserTaskStatusQuerySet.as_manager()
+
     class Meta:
         """
         Additional configuration for the UserTaskStatus model.
         """
 
         verbose_name_plural = 'user task statuses'
+        indexes = [
+            models.Index(fields=['state', 'task_class', 'created'], name='user_tasks_state_class_idx'),
+            models.Index(fields=['user', '-created', 'id'], name='user_tasks_user_created_idx'),
+            models.Index(fields=['-created', 'id'], name='user_tasks_status_created_idx'),
+            models.Index(fields=['user', 'modified'], name='user_tasks_user_modified_idx'),
+            models.Index(fields=['user', 'state', '-created', 'id'], name='user_tasks_user_state_idx'),
+            models.Index(fields=['user', 'task_class', '-created', 'id'], name='user_tasks_user_class_idx'),
+            models.Index(fields=['user', 'is_container', '-created', 'id'], name='user_tasks_user_container_idx'),
+            models.Index(fields=['user', 'parent', '-created', 'id'], name='user_tasks_user_parent_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Save the status, and announce the change to any clients waiting for one.
+        """
+        if self.parent_id and self.root_id is None:  # pylint: disable=access-member-before-definition
+            self.root_id = self.parent.root_id or self.parent_id  # pylint: disable=attribute-defined-outside-init
+            if kwargs.get('update_fields') is not None:
+                # A status being moved into a parent also needs its new root saved
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'root'}
+        super().save(*args, **kwargs)
+        status_changed(self)
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete the status and the statuses nested inside it, leaving tombstones for clients syncing changes.
+        """
+        with transaction.atomic():
+            UserTaskTombstone.record(UserTaskStatus.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
 
     def start(self):
         """
@@ -111,6 +203,7 @@ class UserTaskStatus(TimeStampedModel):
         UserTaskStatus.objects.filter(pk=self.id).update(completed_steps=F('completed_steps') + steps,
                                                          modified=now())
         self.refresh_from_db(fields={'completed_steps', 'modified', 'state'})
+        status_changed(self)
         if self.parent:
             self.parent.increment_completed_steps(steps)
         # Was a cancellation command recently sent?
@@ -122,6 +215,7 @@ class UserTaskStatus(TimeStampedModel):
         # Assume that other processes may be making concurrent changes
         UserTaskStatus.objects.filter(pk=self.id).update(total_steps=F('total_steps') + steps, modified=now())
         self.refresh_from_db(fields={'total_steps', 'modified'})
+        status_changed(self)
         if self.parent:
             self.parent.increment_total_steps(steps)
 
@@ -225,6 +319,32 @@ class UserTaskStatus(TimeStampedModel):
         return f'<UserTaskStatus: {self.name}>'
 
 
+class UserTaskArtifactQuerySet(models.QuerySet):
+    """
+    Custom QuerySet for UserTaskArtifact, which fills in the fields copied from each artifact's status.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Create the given artifacts, first copying the user and root of the statuses of any which lack them.
+
+        ``bulk_create()`` doesn't call ``save()``, so the statuses are looked
+        up here instead, all in one query.
+        """
+        objs = list(objs)
+        status_ids = {obj.status_id for obj in objs if obj.user_id is None}
+        if status_ids:
+            owners = {
+                pk: (user_id, root_id or pk)
+                for pk, user_id, root_id in UserTaskStatus.objects.filter(pk__in=status_ids).values_list(
+                    'pk', 'user_id', 'root_id')
+            }
+            for obj in objs:
+                if obj.user_id is None:
+                    obj.user_id, obj.root_id = owners[obj.status_id]
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class UserTaskArtifact(TimeStampedModel):
     """
     An artifact (or error message) generated for a user by an asynchronous task.
@@ -236,6 +356,11 @@ class UserTaskArtifact(TimeStampedModel):
 
     uuid = models.UUIDField(default=uuid4, unique=True, editable=False, help_text='Unique ID for use in APIs')
     status = models.ForeignKey(UserTaskStatus, on_delete=models.CASCADE, related_name='artifacts')
+    # Denormalized from the status so artifacts can be filtered by owner or tree without joining the status table
+    user = models.ForeignKey(django_settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                             help_text='The user who triggered the task')
+    root = models.ForeignKey(UserTaskStatus, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+                             help_text='Status of the outermost task grouping containing the task')
     name = models.CharField(max_length=255, default='Output',
                             help_text='Distinguishes between multiple artifact types for the same task')
     file = models.FileField(null=True, blank=True, storage=settings.USER_TASKS_ARTIFACT_STORAGE,
@@ -243,6 +368,27 @@ class UserTaskArtifact(TimeStampedModel):
     url = models.TextField(blank=True, validators=[URLValidator()])
     text = models.TextField(blank=True)
 
+    objects = UserTaskArtifactQuerySet.as_manager()
+
+    class Meta:
+        """
+        Additional configuration for the UserTaskArtifact model.
+        """
+
+        indexes = [
+            models.Index(fields=['-created', 'id'], name='user_tasks_art_created_idx'),
+            models.Index(fields=['user', '-created', 'id'], name='user_tasks_artifact_user_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Save the artifact, copying the user and root of its status when first saved.
+        """
+        if self.user_id is None:  # pylint: disable=access-member-before-definition
+            self.user_id = self.status.user_id  # pylint: disable=attribute-defined-outside-init
+            self.root_id = self.status.root_id or self.status_id  # pylint: disable=attribute-defined-outside-init
+        super().save(*args, **kwargs)
+
     def __str__(self):
         """
         Get a string representation of this artifact.
@@ -256,3 +402,173 @@ class UserTaskArtifact(TimeStampedModel):
         else:
             content = self.text
         return f'<UserTaskArtifact: ({self.name}) {content}>'
+
+
+class UserTaskTombstone(models.Model):
+    """
+    A record of the deletion of a :py:class:`UserTaskStatus`, so clients syncing changes to their tasks can notice it.
+
+    Created whenever a status is deleted or moved to the archive, or an
+    archived status is deleted (so cached listings of the archive are
+    invalidated too; sync clients already saw it deleted).  Purged
+    by :py:func:`user_tasks.tasks.purge_old_user_tasks` after
+    ``settings.USER_TASKS_TOMBSTONE_MAX_AGE``.
+
+    .. no_pii:
+    """
+
+    uuid = models.UUIDField(editable=False, help_text='The UUID of the deleted status')
+    user = models.ForeignKey(
+        django_settings.AUTH_USER_MODEL,
+        help_text='The user who triggered the task',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    deleted = models.DateTimeField(default=now, db_index=True)
+
+    class Meta:
+        """
+        Additional configuration for the UserTaskTombstone model.
+        """
+
+        indexes = [
+            models.Index(fields=['user', 'id'], name='user_tasks_tombstone_user_idx'),
+        ]
+
+    @classmethod
+    def record(cls, statuses):
+        """
+        Record the impending deletion of the given statuses and all the statuses nested inside them.
+
+        Should be called in the same transaction as the deletion.  Also
+        discards the cached task summaries of the statuses' owners.
+
+        Arguments:
+            statuses (UserTaskStatusQuerySet): The UserTaskStatus or ArchivedUserTaskStatus records about to be deleted
+
+        """
+        deleted = now()
+        tombstones = cls.objects.bulk_create(
+            cls(uuid=uuid, user_id=user_id, deleted=deleted)
+            for uuid, user_id in statuses.with_descendants().values_list('uuid', 'user_id')
+        )
+        summaries_changed({tombstone.user_id for tombstone in tombstones})
+
+    def __str__(self):
+        """
+        Get a string representation of this tombstone.
+        """
+        return f'<UserTaskTombstone: {self.uuid}>'
+
+
+class ArchivedUserTaskStatus(models.Model):
+    """
+    A copy of a :py:class:`UserTaskStatus` for a finished task, moved out of the main table.
+
+    Records are moved here by :py:func:`user_tasks.tasks.archive_old_user_tasks`
+    when the ``USER_TASKS_ARCHIVE_AGE`` setting is configured, so the main
+    table only needs to hold the statuses of recently active tasks.  Primary
+    keys, UUIDs, and timestamps are preserved from the original records.
+
+    .. no_pii:
+    """
+
+    created = models.DateTimeField()
+    modified = models.DateTimeField()
+    uuid = models.UUIDField(unique=True, editable=False, help_text='Unique ID for use in APIs')
+    user = models.ForeignKey(
+        django_settings.AUTH_USER_MODEL,
+        help_text='The user who triggered the task',
+        on_delete=models.CASCADE,
+    )
+    task_id = models.CharField(max_length=128, unique=True, help_text='UUID of the associated Celery task')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, default=None,
+                               help_text='Status of the containing task grouping (if any)')
+    # Denormalized from the parent chain so a whole tree can be fetched in one query; without a database constraint,
+    # since nested statuses are already deleted along with their parents
+    root = models.ForeignKey('self', on_delete=models.DO_NOTHING, null=True, blank=True, default=None,
+                             db_constraint=False, related_name='+',
+                             help_text='Status of the outermost containing task grouping (if any)')
+    is_container = models.BooleanField(default=False,
+                                       help_text='True if this status corresponds to a container of multiple tasks')
+    task_class = models.CharField(max_length=128, help_text='Fully qualified class name of the task being performed')
+    name = models.CharField(max_length=255, help_text='A name for this task which the triggering user will understand')
+    state = models.CharField(max_length=128)
+    completed_steps = models.PositiveSmallIntegerField(default=0)
+    total_steps = models.PositiveSmallIntegerField()
+    attempts = models.PositiveSmallIntegerField(default=1, help_text='How many times has execution been attempted?')
+
+    objects = UserTaskStatusQuerySet.as_manager()
+
+    class Meta:
+        """
+        Additional configuration for the ArchivedUserTaskStatus model.
+        """
+
+        verbose_name_plural = 'archived user task statuses'
+        indexes = [
+            models.Index(fields=['user', '-created', 'id'], name='user_tasks_archived_user_idx'),
+            models.Index(fields=['state', 'task_class', 'created'], name='user_tasks_archived_state_idx'),
+            models.Index(fields=['-created', 'id'], name='user_tasks_arch_created_idx'),
+        ]
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete the archived status and the statuses nested inside it, leaving tombstones so listings notice.
+        """
+        with transaction.atomic():
+            UserTaskTombstone.record(ArchivedUserTaskStatus.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
+
+    @property
+    def state_text(self):
+        """
+        Get the translation into the current language of the state of this archived status instance.
+        """
+        return UserTaskStatus.STATE_TRANSLATIONS.get(self.state, self.state)
+
+    def __str__(self):
+        """
+        Get a string representation of this archived task.
+        """
+        return f'<ArchivedUserTaskStatus: {self.name}>'
+
+
+class ArchivedUserTaskArtifact(models.Model):
+    """
+    A copy of a :py:class:`UserTaskArtifact` whose status has been archived.
+
+    .. no_pii:
+    """
+
+    created = models.DateTimeField()
+    modified = models.DateTimeField()
+    uuid = models.UUIDField(unique=True, editable=False, help_text='Unique ID for use in APIs')
+    status = models.ForeignKey(ArchivedUserTaskStatus, on_delete=models.CASCADE, related_name='artifacts')
+    user = models.ForeignKey(django_settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+                             help_text='The user who triggered the task')
+    root = models.ForeignKey(ArchivedUserTaskStatus, on_delete=models.DO_NOTHING, db_constraint=False,
+                             related_name='+', help_text='Status of the outermost task grouping containing the task')
+    name = models.CharField(max_length=255, default='Output',
+                            help_text='Distinguishes between multiple artifact types for the same task')
+    file = models.FileField(null=True, blank=True, storage=settings.USER_TASKS_ARTIFACT_STORAGE,
+                            upload_to='user_tasks/%Y/%m/%d/')
+    url = models.TextField(blank=True, validators=[URLValidator()])
+    text = models.TextField(blank=True)
+
+    class Meta:
+        """
+        Additional configuration for the ArchivedUserTaskArtifact model.
+        """
+
+        indexes = [
+            models.Index(fields=['-created', 'id'], name='user_tasks_archived_art_idx'),
+            models.Index(fields=['user', '-created', 'id'], name='user_tasks_archived_art_u_idx'),
+        ]
+
+    def __str__(self):
+        """
+        Get a string representation of this archived artifact.
+        """
+        content = self.file.name if self.file else self.url or self.text[:50]
+        return f'<ArchivedUserTaskArtifact: ({self.name}) {content}>'
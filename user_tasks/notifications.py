@@ -0,0 +1,148 @@
+"""
+Notification of changes to task status records, so that clients can wait for them without polling the database.
+"""
+
+import logging
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .conf import settings
+from .events import get_backend
+
+LOGGER = logging.getLogger(__name__)
+
+
+def status_changed(status):
+    """
+    Announce that the given status record has just been changed, once the current transaction is committed.
+
+    Called by the :py:class:`user_tasks.models.UserTaskStatus` methods which
+    modify it.  Clients waiting for a change to the status are notified via
+    the cache, any copy of the status and summary of its owner's tasks cached
+    for the REST API are discarded, and a compact event describing its new progress is published to the
+    owning user's channel of the event backend, if one is configured.  Failures to do
+    so are logged rather than raised, since the change itself has already
+    been committed.
+
+    Arguments:
+        status (UserTaskStatus): The status which was changed, with its new ``modified`` time
+
+    """
+    key = _modified_key(status.uuid)
+    record_key = cached_record_key('status', status.uuid)
+    summary_key = cached_summary_key(status.user_id)
+    modified = status.modified.timestamp()
+    event = {
+        'uuid': str(status.uuid),
+        'state': status.state,
+        'completed_steps': status.completed_steps,
+        'total_steps': status.total_steps,
+        'modified': status.modified.isoformat(),
+    }
+    user_id = status.user_id
+    backend = get_backend()
+
+    def announce():
+        _cache().set(key, modified, settings.USER_TASKS_WAIT_MAX_TIMEOUT * 2)
+        _cache().delete_many([record_key, summary_key])
+        if backend is not None:
+            backend.publish(user_id, event)
+
+    _on_commit(announce)
+
+
+def forget_records(status_uuids=(), artifact_uuids=()):
+    """
+    Discard any copies of the given statuses and artifacts cached for the REST API, once the transaction is committed.
+    """
+    keys = [cached_record_key('status', uuid) for uuid in status_uuids]
+    keys.extend(cached_record_key('artifact', uuid) for uuid in artifact_uuids)
+    if keys:
+        _on_commit(lambda: _cache().delete_many(keys))
+
+
+def summaries_changed(user_ids):
+    """
+    Discard the cached summaries of the given users' tasks, once the current transaction is committed.
+    """
+    keys = [cached_summary_key(user_id) for user_id in user_ids]
+    if keys:
+        _on_commit(lambda: _cache().delete_many(keys))
+
+
+def wait_for_change(uuid, since, timeout):
+    """
+    Wait until the status with the given UUID is announced to have been modified after ``since``.
+
+    Only the cache is checked while waiting, so many clients can wait at
+    once without adding load to the database.  The caller should check the
+    database itself first, since changes made before the last cache
+    expiration can't be detected.
+
+    Arguments:
+        uuid (UUID): The UUID of the status to wait for
+        since (datetime): The last modification time of the status already known to the client
+        timeout (float): The maximum number of seconds to wait
+
+    Returns:
+        bool: True if a change was announced, False if the timeout expired first
+
+    """
+    key = _modified_key(uuid)
+    since = since.timestamp()
+    deadline = time.monotonic() + timeout
+    while True:
+        modified = _cache().get(key)
+        if modified is not None and modified > since:
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(settings.USER_TASKS_WAIT_POLL_INTERVAL, remaining))
+
+
+def cached_record_key(kind, uuid):
+    """
+    Get the cache key under which the REST API caches a finished status (``kind='status'``) or an artifact.
+    """
+    return f'user_tasks.{kind}.{uuid}.record'
+
+
+def cached_summary_key(user_id):
+    """
+    Get the cache key under which the REST API caches the counts of a user's tasks in each state.
+    """
+    return f'user_tasks.summary.{user_id}'
+
+
+def _on_commit(callback):
+    """
+    Call the given function once the current transaction is committed, logging any error instead of raising it.
+
+    Outside a transaction (in a Celery worker updating its progress, for
+    example) the function is called immediately, and an unavailable cache
+    or event backend mustn't make the task fail.
+    """
+    def call():
+        try:
+            callback()
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('Failed to announce a change to user task records')
+
+    transaction.on_commit(call)
+
+
+def _cache():
+    """
+    Get the cache used to announce changes.
+    """
+    return caches[settings.USER_TASKS_CACHE]
+
+
+def _modified_key(uuid):
+    """
+    Get the cache key under which the last modification time of a status is announced.
+    """
+    return f'user_tasks.status.{uuid}.modified'
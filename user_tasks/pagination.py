@@ -0,0 +1,30 @@
+"""
+Django REST Framework pagination classes for the ``django-user-tasks`` REST API.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+from .conf import settings
+
+
+class UserTaskCursorPagination(CursorPagination):
+    """
+    Cursor pagination for UserTaskStatus and UserTaskArtifact listings, newest first.
+
+    Each page is selected by comparing ``created`` to the position encoded
+    in the cursor rather than by an ``OFFSET``, and no ``COUNT(*)`` query is
+    made, so deep pages are as cheap to fetch as the first one even for
+    superusers who can see every record.  Records created at the same moment
+    are ordered by ``id``, matching the ``(created, id)`` indexes of each
+    table.
+    """
+
+    ordering = ('-created', 'id')
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        """
+        Apply the configured page sizes.
+        """
+        self.page_size = settings.USER_TASKS_PAGE_SIZE
+        self.max_page_size = settings.USER_TASKS_MAX_PAGE_SIZE
@@ -0,0 +1,248 @@
+"""
+Maintenance of month-based PostgreSQL table partitions for the ``django-user-tasks`` models.
+
+Only used when the ``USER_TASKS_PARTITIONED`` setting is enabled; see the
+:doc:`data cleanup documentation <data_cleanup>` for how the tables need to
+be set up for that.  Each partition of a table ``<table>`` holds the records
+created during one calendar month (in UTC), and is named ``<table>_pYYYYMM``.
+"""
+
+import logging
+import re
+import tempfile
+from datetime import datetime, timezone
+from itertools import islice
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .conf import settings
+from .models import UserTaskArtifact, UserTaskStatus, UserTaskTombstone
+from .notifications import summaries_changed
+from .purge import delete_artifact_files, purge
+
+LOGGER = logging.getLogger(__name__)
+
+# Artifacts first, so that a status is never dropped before its artifacts
+PARTITIONED_MODELS = (UserTaskArtifact, UserTaskStatus)
+
+
+def partitioning_enabled(using='default'):
+    """
+    Determine whether the user task tables in the given database are expected to be partitioned by month.
+    """
+    return settings.USER_TASKS_PARTITIONED and connections[using].vendor == 'postgresql'
+
+
+def month_start(moment, months_later=0):
+    """
+    Get the start of the UTC calendar month containing ``moment``, optionally moved ahead by a number of months.
+    """
+    moment = moment.astimezone(timezone.utc)
+    index = moment.year * 12 + moment.month - 1 + months_later
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table, start):
+    """
+    Get the name of the partition of ``table`` holding records created in the month beginning at ``start``.
+    """
+    return f'{table}_p{start:%Y%m}'
+
+
+def create_partitions(start, months, tables=None, using='default'):
+    """
+    Create any missing partitions covering the given number of months, beginning with the one containing ``start``.
+
+    Arguments:
+        start (datetime): A moment in the first month to create partitions for
+        months (int): The number of consecutive months to create partitions for
+        tables (list): The partitioned tables to add partitions to; defaults to those of the user task models
+        using (str): The alias of the database to create the partitions in
+
+    Returns:
+        list: The names of the partitions which were created
+
+    """
+    connection = connections[using]
+    tables = tables or _default_tables()
+    existing = {name for partitions in _partitions(tables, using).values() for name in partitions}
+    created = []
+    with connection.cursor() as cursor:
+        for table in tables:
+            for offset in range(months):
+                lower, upper = month_start(start, offset), month_start(start, offset + 1)
+                name = partition_name(table, lower)
+                if name in existing:
+                    continue
+                cursor.execute(
+                    f'CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF {connection.ops.quote_name(table)} '
+                    f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+                )
+                created.append(name)
+    for name in created:
+        LOGGER.info('Created user task table partition %s', name)
+    return created
+
+
+def drop_partitions(limit, tables=None, using='default'):
+    """
+    Detach and drop each partition which only holds records created before ``limit``.
+
+    This is much faster than deleting the records, and immediately returns
+    the disk space to the operating system.  Records older than ``limit``
+    in the partition which contains it are left for a regular deletion.
+
+    Arguments:
+        limit (datetime): Partitions whose month ends on or before this moment are dropped
+        tables (list): The partitioned tables to drop partitions from; defaults to those of the user task models
+        using (str): The alias of the database to drop the partitions from
+
+    Returns:
+        list: The names of the partitions which were dropped
+
+    """
+    connection = connections[using]
+    dropped = []
+    with connection.cursor() as cursor:
+        for table, names in _partitions(tables or _default_tables(), using).items():
+            for name, start in sorted(names.items(), key=lambda item: item[1]):
+                if month_start(start, 1) > limit:
+                    continue
+                cursor.execute(
+                    f'ALTER TABLE {connection.ops.quote_name(table)} DETACH PARTITION {connection.ops.quote_name(name)}'
+                )
+                cursor.execute(f'DROP TABLE {connection.ops.quote_name(name)}')
+                dropped.append(name)
+    for name in dropped:
+        LOGGER.info('Dropped user task table partition %s', name)
+    return dropped
+
+
+def drop_expired_partitions(limit, batch_size):
+    """
+    Drop the user task table partitions which only hold records created before ``limit``, cleaning up after them.
+
+    Statuses nested in a dropped status, and artifacts of one, may have been
+    created in a later month than it; those live in partitions which are
+    kept, so their whole trees are first deleted as usual.  Tombstones are
+    then recorded for the statuses in the partitions about to be dropped,
+    and the names of their artifact files spooled to a temporary file, a
+    batch at a time and outside the transaction detaching the partitions, so
+    that it only holds its locks for as long as the detaching takes.  Once
+    the partitions are gone, cached summaries are discarded and the files
+    are deleted from storage a batch at a time, as if the records had been
+    deleted one by one.
+
+    Arguments:
+        limit (datetime): Partitions whose month ends on or before this moment are dropped
+        batch_size (int): The maximum number of records to delete, record tombstones for, or delete the files of at a
+            time
+
+    Returns:
+        list: The names of the partitions which were dropped
+
+    """
+    cutoff = month_start(limit)
+    statuses = UserTaskStatus.objects.filter(created__lt=cutoff).order_by('pk')
+    late_statuses = UserTaskStatus.objects.filter(created__gte=cutoff, root__isnull=False).values('root_id')
+    late_artifacts = UserTaskArtifact.objects.filter(created__gte=cutoff).values('root_id')
+    purge([statuses.filter(Q(pk__in=late_statuses) | Q(pk__in=late_artifacts), parent__isnull=True)], batch_size)
+    user_ids = _record_tombstones(statuses, batch_size)
+    spool = _spool_artifact_files(cutoff, batch_size) if settings.USER_TASKS_DELETE_ARTIFACT_FILES else None
+    with transaction.atomic():
+        dropped = drop_partitions(limit)
+        transaction.on_commit(lambda: summaries_changed(user_ids))
+        if spool is not None:
+            transaction.on_commit(lambda: _delete_spooled_files(spool, batch_size))
+    return dropped
+
+
+def _record_tombstones(statuses, batch_size):
+    """
+    Record tombstones for the given statuses, loading only a batch of them into memory at a time.
+
+    Returns:
+        set: The IDs of the users whose statuses they were
+
+    """
+    deleted = now()
+    user_ids = set()
+    last_pk = 0
+    while True:
+        batch = list(statuses.filter(pk__gt=last_pk).values_list('pk', 'uuid', 'user_id')[:batch_size])
+        if not batch:
+            break
+        UserTaskTombstone.objects.bulk_create(
+            UserTaskTombstone(uuid=uuid, user_id=user_id, deleted=deleted) for _, uuid, user_id in batch)
+        user_ids.update(user_id for _, _, user_id in batch)
+        last_pk = batch[-1][0]
+    return user_ids
+
+
+def _spool_artifact_files(cutoff, batch_size):
+    """
+    Write the names of the files of the artifacts created before ``cutoff`` to a temporary file, one per line.
+
+    The names are read from the database a batch at a time, so memory usage
+    doesn't grow with the number of files.
+    """
+    artifacts = UserTaskArtifact.objects.filter(created__lt=cutoff).exclude(file='').exclude(file=None).order_by('pk')
+    spool = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+    last_pk = 0
+    while True:
+        batch = list(artifacts.filter(pk__gt=last_pk).values_list('pk', 'file')[:batch_size])
+        if not batch:
+            break
+        spool.writelines(f'{name}\n' for _, name in batch)
+        last_pk = batch[-1][0]
+    return spool
+
+
+def _delete_spooled_files(spool, batch_size):
+    """
+    Delete the artifact files named in a temporary file written by :py:func:`_spool_artifact_files`, then close it.
+    """
+    with spool:
+        spool.seek(0)
+        while True:
+            names = [line.rstrip('\n') for line in islice(spool, batch_size)]
+            if not names:
+                break
+            delete_artifact_files(names)
+
+
+def _default_tables():
+    """
+    Get the names of the tables for the partitioned models, in a safe order for dropping partitions.
+    """
+    return [model._meta.db_table for model in PARTITIONED_MODELS]
+
+
+def _partitions(tables, using):
+    """
+    Get the existing month partitions of the given tables.
+
+    Returns:
+        dict: For each table, a dictionary mapping partition names to the start of the month they hold
+
+    """
+    result = {}
+    with connections[using].cursor() as cursor:
+        for table in tables:
+            cursor.execute(
+                'SELECT child.relname FROM pg_inherits '
+                'JOIN pg_class parent ON pg_inherits.inhparent = parent.oid '
+                'JOIN pg_class child ON pg_inherits.inhrelid = child.oid '
+                'WHERE parent.relname = %s',
+                [table]
+            )
+            pattern = re.compile(re.escape(table) + r'_p(\d{4})(\d{2})$')
+            partitions = {}
+            for (name,) in cursor.fetchall():
+                match = pattern.match(name)
+                if match:
+                    partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+            result[table] = partitions
+    return result
@@ -0,0 +1,177 @@
+"""
+Deletion of old user task records in bounded chunks.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+from django.db.models import Q
+
+from .conf import settings
+from .models import UserTaskArtifact, UserTaskTombstone
+
+LOGGER = logging.getLogger(__name__)
+
+
+def artifact_file_names(statuses):
+    """
+    Get the names of any files stored for artifacts of the given statuses or the statuses nested inside them.
+
+    Arguments:
+        statuses (UserTaskStatusQuerySet): Statuses from either the main or the archive table
+
+    Returns:
+        list: The names of the files, relative to the artifact file storage
+
+    """
+    artifact_model = statuses.model.artifacts.rel.related_model
+    # Whole trees can be found via the artifacts' root, without walking down them level by level
+    roots = statuses.filter(parent__isnull=True).values('pk')
+    nested = statuses.filter(parent__isnull=False).with_descendants()
+    artifacts = artifact_model.objects.filter(Q(root__in=roots) | Q(status__in=nested)).exclude(file='')
+    return list(artifacts.exclude(file=None).values_list('file', flat=True))
+
+
+def delete_artifact_files(names):
+    """
+    Delete the given files from the artifact file storage, using a pool of threads to overlap the requests.
+
+    Failures are logged rather than raised, since a file left behind can
+    always be cleaned up later by the ``sweep_user_task_artifact_files``
+    management command.
+
+    Arguments:
+        names (list): The names of the files to delete, relative to the artifact file storage
+
+    """
+    if not names:
+        return
+    storage = UserTaskArtifact._meta.get_field('file').storage
+
+    def delete(name):
+        try:
+            storage.delete(name)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('Unable to delete user task artifact file %s', name)
+
+    with ThreadPoolExecutor(max_workers=settings.USER_TASKS_FILE_DELETION_THREADS) as executor:
+        for _ in executor.map(delete, names):
+            pass
+
+
+def delete_in_chunks(queryset, batch_size, delay=0, deadline=None):
+    """
+    Delete the records matched by ``queryset`` in ascending ranges of at most ``batch_size`` primary keys.
+
+    Each chunk is deleted in its own transaction, so locks are only held
+    briefly and only one chunk of records (plus anything they cascade to)
+    is ever loaded into memory by Django's deletion collector.  If the
+    deadline passes before everything has been deleted, the remaining
+    records are left for a later call with the same criteria to pick up.
+    Artifact files belonging to each chunk are deleted from storage once
+    the chunk's transaction has been committed, unless
+    ``settings.USER_TASKS_DELETE_ARTIFACT_FILES`` is disabled.  Deleted
+    statuses are recorded as tombstones for clients syncing changes to their
+    tasks or revalidating cached listings.
+
+    Arguments:
+        queryset (UserTaskStatusQuerySet): The status records to delete
+        batch_size (int): The maximum number of records matched by ``queryset`` to delete per chunk
+        delay (float): Seconds to sleep between chunks, to leave the database some capacity for other work
+        deadline (float): ``time.monotonic()`` value after which no more chunks should be started, or ``None``
+
+    Returns:
+        tuple: The total number of rows deleted (including cascades), and ``True`` if no matching records remain
+
+    """
+    queryset = queryset.order_by('pk')
+    deleted = 0
+    last_pk = None
+    while True:
+        if deadline is not None and time.monotonic() >= deadline:
+            return deleted, False
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(chunk.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted, True
+        with transaction.atomic():
+            statuses = chunk.filter(pk__lte=pks[-1])
+            if settings.USER_TASKS_DELETE_ARTIFACT_FILES:
+                names = artifact_file_names(statuses)
+                transaction.on_commit(lambda names=names: delete_artifact_files(names))
+            UserTaskTombstone.record(statuses)
+            count, _ = statuses.delete()
+        deleted += count
+        last_pk = pks[-1]
+        if len(pks) < batch_size:
+            return deleted, True
+        if delay:
+            time.sleep(delay)
+
+
+def pk_ranges(first, last, count):
+    """
+    Split the inclusive range of integer primary keys from ``first`` to ``last`` into at most ``count`` ranges.
+
+    Returns:
+        list: ``(first, last)`` tuples for the inclusive bounds of each range, in ascending order
+
+    """
+    size = -(-(last - first + 1) // count)
+    return [(start, min(start + size - 1, last)) for start in range(first, last + 1, size)]
+
+
+def combine_stats(results):
+    """
+    Combine the statistics returned by multiple :py:func:`purge` calls which ran in parallel.
+    """
+    deleted = sum(stats['deleted'] for stats in results)
+    seconds = max((stats['seconds'] for stats in results), default=0)
+    stats = {
+        'deleted': deleted,
+        'seconds': seconds,
+        'rate': round(deleted / seconds, 1) if seconds else float(deleted),
+        'complete': all(stats['complete'] for stats in results),
+    }
+    LOGGER.info('Purged %(deleted)d user task records in parallel in %(seconds).1f seconds (%(rate).1f per second)',
+                stats)
+    return stats
+
+
+def purge(querysets, batch_size, delay=0, time_limit=None):
+    """
+    Delete the records matched by each of the given querysets in chunks, within an optional time limit.
+
+    Arguments:
+        querysets (list): The querysets of records to delete, in the order they should be processed
+        batch_size (int): The maximum number of records to delete per chunk
+        delay (float): Seconds to sleep between chunks
+        time_limit (timedelta): The maximum time to spend starting new chunks, or ``None`` for no limit
+
+    Returns:
+        dict: Statistics about the purge: the number of rows ``deleted``, the elapsed ``seconds``, the ``rate`` of
+        rows deleted per second, and whether it was ``complete`` (or should be resumed by a later run)
+
+    """
+    start = time.monotonic()
+    deadline = None if time_limit is None else start + time_limit.total_seconds()
+    deleted = 0
+    complete = True
+    for queryset in querysets:
+        count, complete = delete_in_chunks(queryset, batch_size, delay, deadline)
+        deleted += count
+        if not complete:
+            break
+    seconds = time.monotonic() - start
+    stats = {
+        'deleted': deleted,
+        'seconds': round(seconds, 3),
+        'rate': round(deleted / seconds, 1) if seconds else float(deleted),
+        'complete': complete,
+    }
+    LOGGER.info('Purged %(deleted)d user task records in %(seconds).1f seconds (%(rate).1f per second)', stats)
+    if not complete:
+        LOGGER.info('Purge time limit reached; the remaining user task records will be purged on the next run')
+    return stats
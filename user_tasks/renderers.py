@@ -0,0 +1,63 @@
+"""
+Django REST Framework renderers for the ``django-user-tasks`` REST API.
+"""
+
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renderer for ``text/event-stream`` (Server-Sent Events) responses.
+
+    The event stream itself is produced by the view as a streaming response;
+    this renderer allows content negotiation to accept the media type, and
+    renders any error response as a single ``error`` event.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render the given data as a single ``error`` event.
+        """
+        if data is None:
+            return b''
+        return format_event(data, 'error').encode(self.charset)
+
+
+class DownloadRenderer(BaseRenderer):
+    """
+    Renderer accepting any media type, for responses containing a downloaded file.
+
+    The file itself is sent by the view as a file response; this renderer
+    allows content negotiation to accept whatever type the client asked
+    for, and renders any error response as JSON.
+    """
+
+    media_type = '*/*'
+    format = 'download'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render the given error data as JSON, labeled as such rather than with the media type the client accepted.
+        """
+        if data is None:
+            return b''
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = f'application/json; charset={self.charset}'
+        return json.dumps(data, separators=(',', ':')).encode(self.charset)
+
+
+def format_event(data, event=None):
+    """
+    Format JSON-serializable data as a Server-Sent Event, optionally with the given event type.
+    """
+    lines = [f'event: {event}'] if event else []
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
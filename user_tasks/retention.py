@@ -0,0 +1,128 @@
+"""
+Evaluation of the rules which determine when user task records are old enough to be purged.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .conf import settings
+from .models import UserTaskStatus
+
+
+def rules(reference_time, model=UserTaskStatus):
+    """
+    Get the retention rules currently in effect, along with the statuses each one makes due for deletion.
+
+    Each entry of ``settings.USER_TASKS_RETENTION_POLICIES`` applies to the
+    statuses which match its criteria and aren't matched by an earlier
+    policy; ``settings.USER_TASKS_MAX_AGE`` applies to all other statuses.
+    ``settings.USER_TASKS_MAX_PER_USER`` additionally limits how many finished
+    tasks each user can keep, regardless of age.  Rules are evaluated against the
+    outermost status of each task only; nested statuses are deleted along
+    with it.  Every query filters on indexed columns, so the database never
+    needs to check each status individually.
+
+    Only statuses last modified before ``reference_time`` are considered, so
+    evaluating the rules again later with the same reference time can only
+    find fewer statuses due for deletion, never more: tasks created or
+    finished since then can't push older ones past
+    ``USER_TASKS_MAX_PER_USER`` or into a stricter policy.  The purge relies
+    on this to never delete a status it didn't export first.
+
+    Arguments:
+        reference_time (datetime): The moment from which status ages are calculated
+        model (class): Either :py:class:`UserTaskStatus` or :py:class:`ArchivedUserTaskStatus`
+
+    Returns:
+        list: ``(description, querysets)`` tuples, where ``querysets`` is an iterable of querysets of root statuses
+
+    """
+    roots = model.objects.filter(parent__isnull=True, modified__lt=reference_time)
+    result = []
+    matched = None
+    for index, policy in enumerate(settings.USER_TASKS_RETENTION_POLICIES, 1):
+        criteria = _criteria(policy)
+        since = policy.get('since', 'created')
+        if since not in ('created', 'modified'):
+            raise ImproperlyConfigured('USER_TASKS_RETENTION_POLICIES "since" values must be "created" or "modified"')
+        queryset = roots.filter(criteria, **{f'{since}__lt': reference_time - policy['max_age']})
+        if matched is not None:
+            queryset = queryset.exclude(matched)
+        result.append((f'policy {index} ({_describe(policy)})', [queryset]))
+        matched = criteria if matched is None else matched | criteria
+    queryset = roots.filter(created__lt=reference_time - settings.USER_TASKS_MAX_AGE)
+    if matched is not None:
+        queryset = queryset.exclude(matched)
+    result.append(('USER_TASKS_MAX_AGE', [queryset]))
+    if settings.USER_TASKS_MAX_PER_USER is not None:
+        result.append(('USER_TASKS_MAX_PER_USER', [_excess_per_user(roots, settings.USER_TASKS_MAX_PER_USER)]))
+    return result
+
+
+def expected_deletions(reference_time, model=UserTaskStatus):
+    """
+    Count how many tasks each retention rule would delete, without deleting anything.
+
+    Tasks which are due for deletion under more than one rule are counted
+    under each of them.
+
+    Returns:
+        dict: The number of tasks due for deletion, keyed by rule description
+
+    """
+    return {
+        description: sum(queryset.count() for queryset in querysets)
+        for description, querysets in rules(reference_time, model)
+    }
+
+
+def max_age():
+    """
+    Get the longest time since creation for which any retention rule may keep a task.
+
+    Policies measuring age from the last modification can keep tasks for
+    longer than this; records which must outlive every creation-based age
+    should not rely on such policies when table partitions are being dropped.
+    """
+    return max([settings.USER_TASKS_MAX_AGE] + [policy['max_age'] for policy in settings.USER_TASKS_RETENTION_POLICIES])
+
+
+def _criteria(policy):
+    """
+    Get a filter for the statuses a retention policy applies to.
+    """
+    if 'max_age' not in policy:
+        raise ImproperlyConfigured('Each entry of USER_TASKS_RETENTION_POLICIES needs a "max_age"')
+    criteria = Q()
+    for field in ('state', 'task_class'):
+        if field not in policy:
+            continue
+        value = policy[field]
+        if isinstance(value, str):
+            criteria &= Q(**{field: value})
+        else:
+            criteria &= Q(**{f'{field}__in': value})
+    if not criteria:
+        raise ImproperlyConfigured('Each entry of USER_TASKS_RETENTION_POLICIES needs a "state" or "task_class"')
+    return criteria
+
+
+def _describe(policy):
+    """
+    Get a short description of the statuses a retention policy applies to.
+    """
+    return ', '.join(f'{field}={policy[field]}' for field in ('state', 'task_class') if field in policy)
+
+
+def _excess_per_user(roots, limit):
+    """
+    Get a queryset of the finished tasks of each user beyond the newest ``limit`` of them.
+
+    Tasks are ranked within each user by a window function, so every user is
+    covered by a single query.
+    """
+    ranked = roots.filter(state__in=UserTaskStatus.TERMINAL_STATES).annotate(rank=Window(
+        RowNumber(), partition_by=[F('user_id')], order_by=[F('created').desc(), F('pk').desc()],
+    ))
+    return roots.filter(pk__in=ranked.filter(rank__gt=limit).values('pk'))
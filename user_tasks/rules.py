@@ -11,10 +11,18 @@ custom rules.)  You can register them in another application's ``rules.py``:
     import user_tasks
 
     user_tasks.rules.add_rules()
+
+:py:class:`PermissionFilterBackend` applies the same rules to REST API
+listings as a single queryset filter.
 """
 
 import rules
 
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+
+from rest_framework.filters import BaseFilterBackend
+
 
 @rules.predicate
 def is_status_creator(user, status=None):
@@ -51,6 +59,8 @@ def is_artifact_creator(user, artifact=None):
     """
     if not artifact:
         return True
+    if artifact.user_id is not None:
+        return artifact.user_id == user.id
     return is_status_creator(user, artifact.status)
 
 
@@ -58,13 +68,72 @@ STATUS_PERMISSION = is_status_creator | rules.predicates.is_superuser
 ARTIFACT_PERMISSION = is_artifact_creator | rules.predicates.is_superuser
 
 
+def status_filter(user):
+    """
+    Get a filter selecting the status records which ``STATUS_PERMISSION`` allows the given user to access.
+    """
+    if user.is_superuser:
+        return Q()
+    if not user.is_authenticated:
+        return Q(pk__in=[])
+    return Q(user_id=user.id)
+
+
+def artifact_filter(user):
+    """
+    Get a filter selecting the artifacts which ``ARTIFACT_PERMISSION`` allows the given user to access.
+    """
+    if user.is_superuser:
+        return Q()
+    if not user.is_authenticated:
+        return Q(pk__in=[])
+    return Q(user_id=user.id)
+
+
+# The queryset filter equivalent to each predicate, for PermissionFilterBackend; add any custom predicates used
+QUERY_FILTERS = {
+    STATUS_PERMISSION: status_filter,
+    ARTIFACT_PERMISSION: artifact_filter,
+}
+
+
+class PermissionFilterBackend(BaseFilterBackend):
+    """
+    Filter for REST API listings which applies the rules-based permissions as a single queryset filter.
+
+    Evaluating a predicate like ``ARTIFACT_PERMISSION`` for each record of a
+    listing would take at least one Python call, and possibly a query, per
+    record.  Instead, the predicate registered for the ``view`` permission
+    of the listed model (or ``cancel`` for the bulk cancel endpoint) is
+    looked up in :py:data:`QUERY_FILTERS` and the equivalent filter applied
+    to the queryset.  Can be used in place of the default
+    ``StatusFilterBackend`` and ``ArtifactFilterBackend``, so that listings
+    follow the rules without being kept in sync with them separately.
+    """
+
+    # The permission checked for each view action, if not "view"
+    action_permissions = {'bulk_cancel': 'cancel'}
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Filter out any records which the requesting user does not have permission to access.
+        """
+        opts = queryset.model._meta
+        action = self.action_permissions.get(getattr(view, 'action', None), 'view')
+        name = f'{opts.app_label}.{action}_{opts.model_name}'
+        predicate = rules.permissions.permissions.get(name)
+        if predicate not in QUERY_FILTERS:
+            raise ImproperlyConfigured(f'No queryset filter is defined for the rule of the {name} permission')
+        return queryset.filter(QUERY_FILTERS[predicate](request.user))
+
+
 def add_rules():
     """
     Use the rules provided in this module to implement authorization checks for the ``django-user-tasks`` models.
 
     These rules allow only superusers and the user who triggered a task to view its status or artifacts, cancel the
     task, or delete the status information and all its related artifacts.  Only superusers are allowed to directly
-    modify or delete an artifact (or to modify a task status record).
+    modify or delete an artifact (or to modify a task status record).  The same rules apply to archived records.
     """
     rules.add_perm('user_tasks.view_usertaskstatus', STATUS_PERMISSION)
     rules.add_perm('user_tasks.cancel_usertaskstatus', STATUS_PERMISSION)
@@ -73,3 +142,6 @@ def add_rules():
     rules.add_perm('user_tasks.view_usertaskartifact', ARTIFACT_PERMISSION)
     rules.add_perm('user_tasks.change_usertaskartifact', rules.predicates.is_superuser)
     rules.add_perm('user_tasks.delete_usertaskartifact', rules.predicates.is_superuser)
+    rules.add_perm('user_tasks.view_archivedusertaskstatus', STATUS_PERMISSION)
+    rules.add_perm('user_tasks.delete_archivedusertaskstatus', STATUS_PERMISSION)
+    rules.add_perm('user_tasks.view_archivedusertaskartifact', ARTIFACT_PERMISSION)
@@ -0,0 +1,113 @@
+"""
+Support for clients which keep a local copy of their task statuses in sync by fetching only what changed.
+"""
+
+import base64
+import json
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+
+from .conf import settings
+from .models import UserTaskTombstone
+
+Cursor = namedtuple('Cursor', ['modified', 'status_id', 'tombstone_id', 'issued'])
+Cursor.__doc__ = """
+A position in the sequences of status changes and deletions which a client has already seen.
+
+``modified`` and ``status_id`` identify the last changed status seen (in
+order of modification), ``tombstone_id`` the last deletion seen, and
+``issued`` the time from which unseen deletions must still be on record.
+"""
+
+
+def initial_cursor():
+    """
+    Get a cursor for a client which hasn't seen any statuses yet, and so needs no tombstones for past deletions.
+    """
+    last = UserTaskTombstone.objects.aggregate(last=Max('id'))['last'] or 0
+    return Cursor(None, 0, last, now())
+
+
+def encode_cursor(cursor):
+    """
+    Encode a cursor as an opaque URL-safe token.
+    """
+    data = [
+        cursor.modified.isoformat() if cursor.modified else None,
+        cursor.status_id,
+        cursor.tombstone_id,
+        cursor.issued.isoformat(),
+    ]
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    """
+    Decode a token produced by :py:func:`encode_cursor`.
+
+    Raises:
+        ValueError: If the token is malformed
+
+    """
+    try:
+        modified, status_id, tombstone_id, issued = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return Cursor(
+            None if modified is None else _parse(modified),
+            int(status_id),
+            int(tombstone_id),
+            _parse(issued),
+        )
+    except (TypeError, ValueError, UnicodeError) as error:
+        raise ValueError(f'Invalid cursor: {token}') from error
+
+
+def changes_since(statuses, tombstones, cursor, limit):
+    """
+    Get the statuses modified and the tombstones of statuses deleted since the given cursor.
+
+    Statuses are selected by keyset comparison on ``(modified, id)`` and
+    tombstones on ``id``, so each request costs the same regardless of how
+    many records the client has already seen.  Changes made within the last
+    ``settings.USER_TASKS_SYNC_LAG`` seconds are left for a later request,
+    since transactions which started earlier may not have committed theirs
+    yet; returning them would move the cursor past those changes.
+
+    Arguments:
+        statuses (QuerySet): The UserTaskStatus records the client can see
+        tombstones (QuerySet): The UserTaskTombstone records the client can see
+        cursor (Cursor): The client's current position
+        limit (int): The maximum number of statuses and of tombstones to return
+
+    Returns:
+        tuple: Lists of changed statuses and tombstones, a :py:class:`Cursor` for the next request, and ``True`` if
+        more changes are available immediately
+
+    """
+    horizon = now() - timedelta(seconds=settings.USER_TASKS_SYNC_LAG)
+    statuses = statuses.filter(modified__lt=horizon)
+    if cursor.modified is not None:
+        statuses = statuses.filter(
+            Q(modified__gt=cursor.modified) | Q(modified=cursor.modified, id__gt=cursor.status_id))
+    changed = list(statuses.order_by('modified', 'id')[:limit + 1])
+    deleted = list(tombstones.filter(id__gt=cursor.tombstone_id, deleted__lt=horizon).order_by('id')[:limit + 1])
+    more = len(changed) > limit or len(deleted) > limit
+    changed, deleted = changed[:limit], deleted[:limit]
+    modified, status_id = (changed[-1].modified, changed[-1].id) if changed else cursor[:2]
+    tombstone_id = deleted[-1].id if deleted else cursor.tombstone_id
+    # If some deletions haven't been returned yet, they need to be kept on record until the next request
+    issued = deleted[-1].deleted if len(deleted) == limit else horizon
+    return changed, deleted, Cursor(modified, status_id, tombstone_id, issued), more
+
+
+def _parse(value):
+    """
+    Parse a timezone-aware ISO 8601 timestamp from a cursor.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None or parsed.tzinfo is None:
+        raise ValueError(f'Invalid timestamp: {value}')
+    return parsed
@@ -4,13 +4,22 @@ Celery task abstract base classes.
 
 import inspect
 import logging
+from functools import reduce
+from operator import or_
 
-from celery import Task, shared_task
+from celery import Task, chord, shared_task
 
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_datetime
 from django.utils.timezone import now
 
+from .archive import archive_statuses
 from .conf import settings
-from .models import UserTaskStatus
+from .export import export_statuses
+from .models import ArchivedUserTaskStatus, UserTaskStatus, UserTaskTombstone
+from .partitions import drop_expired_partitions, partitioning_enabled
+from .purge import combine_stats, pk_ranges, purge
+from .retention import expected_deletions, max_age, rules
 
 LOGGER = logging.getLogger(__name__)
 
@@ -103,12 +112,164 @@ class UserTask(Task, UserTaskMixin):  # pylint: disable=abstract-method
 
 
 @shared_task
-def purge_old_user_tasks():
+def purge_old_user_tasks(dry_run=False):
     """
-    Delete any UserTaskStatus and UserTaskArtifact records older than ``settings.USER_TASKS_MAX_AGE``.
+    Delete any UserTaskStatus and UserTaskArtifact records which are due for deletion.
 
-    Intended to be run as a scheduled task.
+    By default that's any records older than ``settings.USER_TASKS_MAX_AGE``,
+    but different ages can be configured for particular states and task
+    classes via ``settings.USER_TASKS_RETENTION_POLICIES`` and the number
+    of tasks kept per user can be limited via
+    ``settings.USER_TASKS_MAX_PER_USER``; see :py:func:`user_tasks.retention.rules`.
+
+    Intended to be run as a scheduled task.  Records are deleted in chunks of
+    ``settings.USER_TASKS_PURGE_BATCH_SIZE`` statuses; if
+    ``settings.USER_TASKS_PURGE_TIME_LIMIT`` runs out first, the next run
+    picks up where this one left off.  Returns statistics about the records
+    deleted, or with ``dry_run`` the number of tasks each retention rule
+    would delete from the ``live`` and ``archived`` tables.
+
+    If ``settings.USER_TASKS_PURGE_CONCURRENCY`` is greater than 1, the
+    records are instead split by primary key into that many ranges per
+    table, which are purged in parallel by :py:func:`purge_user_task_range`
+    tasks; the combined statistics are then logged by
+    :py:func:`summarize_user_task_purge`.
+
+    Records of status deletions older than ``settings.USER_TASKS_TOMBSTONE_MAX_AGE``
+    are also deleted.
+
+    If ``settings.USER_TASKS_EXPORT_STORAGE`` is configured, all the records
+    due for deletion are first exported to a file in that storage (see
+    :py:func:`user_tasks.export.export_statuses`), whose name is included in
+    the returned statistics as ``export`` (unless nothing was due for deletion).
+    """
+    reference_time = now()
+    if dry_run:
+        expected = {
+            'live': expected_deletions(reference_time),
+            'archived': expected_deletions(reference_time, ArchivedUserTaskStatus),
+        }
+        LOGGER.info('User tasks due for deletion by retention rule: %s', expected)
+        return expected
+    export = _export(reference_time) if settings.USER_TASKS_EXPORT_STORAGE is not None else None
+    UserTaskTombstone.objects.filter(deleted__lt=reference_time - settings.USER_TASKS_TOMBSTONE_MAX_AGE).delete()
+    if partitioning_enabled():
+        # Whole months of old records can be discarded at once
+        drop_expired_partitions(reference_time - max_age(), settings.USER_TASKS_PURGE_BATCH_SIZE)
+    if settings.USER_TASKS_PURGE_CONCURRENCY > 1:
+        stats = _fan_out_purge(reference_time, settings.USER_TASKS_PURGE_CONCURRENCY)
+    else:
+        # UserTaskArtifacts will also be removed via deletion cascading
+        querysets = _due_for_deletion(reference_time, UserTaskStatus)
+        querysets += _due_for_deletion(reference_time, ArchivedUserTaskStatus)
+        stats = purge(
+            querysets,
+            settings.USER_TASKS_PURGE_BATCH_SIZE,
+            delay=settings.USER_TASKS_PURGE_BATCH_DELAY,
+            time_limit=settings.USER_TASKS_PURGE_TIME_LIMIT,
+        )
+    if export is not None:
+        stats['export'] = export
+    return stats
+
+
+@shared_task(acks_late=True)
+def purge_user_task_range(first_pk, last_pk, reference_time, archived=False):
+    """
+    Delete the status records with primary keys in the given inclusive range which are due for deletion.
+
+    Used by :py:func:`purge_old_user_tasks` to purge a large backlog in
+    parallel.  Safe to retry, since the records to delete are determined
+    entirely by the arguments.
+
+    Arguments:
+        first_pk (int): The lowest primary key in the range
+        last_pk (int): The highest primary key in the range
+        reference_time (str): ISO 8601 timestamp from which record ages are calculated
+        archived (bool): True to purge ArchivedUserTaskStatus records instead of UserTaskStatus ones
+
+    Returns:
+        dict: Statistics about the records deleted, as returned by :py:func:`user_tasks.purge.purge`
+
+    """
+    model = ArchivedUserTaskStatus if archived else UserTaskStatus
+    querysets = _due_for_deletion(parse_datetime(reference_time), model)
+    return purge(
+        [queryset.filter(pk__range=(first_pk, last_pk)) for queryset in querysets],
+        settings.USER_TASKS_PURGE_BATCH_SIZE,
+        delay=settings.USER_TASKS_PURGE_BATCH_DELAY,
+        time_limit=settings.USER_TASKS_PURGE_TIME_LIMIT,
+    )
+
+
+@shared_task
+def summarize_user_task_purge(results):
+    """
+    Combine and log the statistics returned by a set of parallel :py:func:`purge_user_task_range` tasks.
+    """
+    return combine_stats(results)
+
+
+def _due_for_deletion(reference_time, model):
+    """
+    Get a list of querysets which together cover all the statuses of the given model which are due for deletion.
+    """
+    return [queryset for _, querysets in rules(reference_time, model) for queryset in querysets]
+
+
+def _export(reference_time):
+    """
+    Export all the records which are due for deletion to a new file in ``settings.USER_TASKS_EXPORT_STORAGE``.
+
+    Returns:
+        str: The name of the export file within the storage, or None if nothing was due for deletion
+
+    """
+    querysets = [
+        # Combine the rules into one query per table, so tasks matched by more than one are only exported once
+        reduce(or_, _due_for_deletion(reference_time, model))
+        for model in (UserTaskStatus, ArchivedUserTaskStatus)
+    ]
+    name = f'user_task_exports/purge-{reference_time:%Y%m%dT%H%M%S}.ndjson.gz'
+    name, _ = export_statuses(querysets, settings.USER_TASKS_EXPORT_STORAGE, name,
+                              settings.USER_TASKS_EXPORT_CHUNK_SIZE)
+    return name
+
+
+def _fan_out_purge(reference_time, concurrency):
+    """
+    Start parallel tasks to purge each range of primary keys containing records which are due for deletion.
+
+    Returns:
+        dict: The number of ``ranges`` being purged
+
+    """
+    ranges = []
+    for archived, model in ((False, UserTaskStatus), (True, ArchivedUserTaskStatus)):
+        bounds = [
+            queryset.aggregate(first=Min('pk'), last=Max('pk'))
+            for queryset in _due_for_deletion(reference_time, model)
+        ]
+        bounds = [bound for bound in bounds if bound['first'] is not None]
+        if not bounds:
+            continue
+        first = min(bound['first'] for bound in bounds)
+        last = max(bound['last'] for bound in bounds)
+        for first_pk, last_pk in pk_ranges(first, last, concurrency):
+            ranges.append(purge_user_task_range.si(first_pk, last_pk, reference_time.isoformat(), archived))
+    if ranges:
+        chord(ranges)(summarize_user_task_purge.s())
+    return {'ranges': len(ranges)}
+
+
+@shared_task
+def archive_old_user_tasks():
+    """
+    Move finished UserTaskStatus trees older than ``settings.USER_TASKS_ARCHIVE_AGE`` into the archive tables.
+
+    Intended to be run as a scheduled task; does nothing unless that setting has been configured.
     """
-    limit = now() - settings.USER_TASKS_MAX_AGE
-    # UserTaskArtifacts will also be removed via deletion cascading
-    UserTaskStatus.objects.filter(created__lt=limit).delete()
+    if settings.USER_TASKS_ARCHIVE_AGE is None:
+        return
+    moved = archive_statuses(now() - settings.USER_TASKS_ARCHIVE_AGE, settings.USER_TASKS_ARCHIVE_BATCH_SIZE)
+    LOGGER.info('Archived %d user task statuses in total', moved)
@@ -2,13 +2,48 @@
 REST API endpoints.
 """
 
+import time
+from hashlib import md5
+from uuid import UUID
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Func, Max, Prefetch, Q, Subquery
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from django.utils.timezone import is_naive, make_aware, now
+from django.utils.translation import get_language
+
 from rest_framework import mixins, permissions, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 from .conf import settings
-from .models import UserTaskArtifact, UserTaskStatus
-from .serializers import ArtifactSerializer, StatusSerializer
+from .downloads import file_response
+from .events import get_backend
+from .listings import CombinedQuerySet
+from .models import (ArchivedUserTaskArtifact, ArchivedUserTaskStatus, UserTaskArtifact, UserTaskStatus,
+                     UserTaskTombstone)
+from .notifications import cached_record_key, cached_summary_key, forget_records, wait_for_change
+from .purge import artifact_file_names, delete_artifact_files
+from .renderers import DownloadRenderer, EventStreamRenderer, format_event
+from .serializers import ArtifactSerializer, StatusRowSerializer, StatusSerializer, StatusTreeSerializer
+from .sync import changes_since, decode_cursor, encode_cursor, initial_cursor
+
+
+class CursorExpired(APIException):
+    """
+    A sync cursor is too old for all the deletions since it was issued to still be on record.
+    """
+
+    status_code = 410
+    default_detail = 'The cursor has expired; fetch all task statuses again without one.'
+    default_code = 'cursor_expired'
 
 
 class DjangoObjectPermissionsIncludingView(permissions.DjangoObjectPermissions):
@@ -35,7 +70,438 @@ class DjangoObjectPermissionsIncludingView(permissions.DjangoObjectPermissions):
     }
 
 
+class DjangoObjectViewPermissions(DjangoObjectPermissionsIncludingView):
+    """
+    Django REST Framework object permissions requiring only ``<app>.view_<model>``, regardless of HTTP method.
+
+    For POST endpoints which only read records, like lookups whose parameters
+    are too large for a query string.
+    """
+
+    def get_required_permissions(self, method, model_cls):
+        """
+        Get the model permissions required for viewing records.
+        """
+        return super().get_required_permissions('GET', model_cls)
+
+    def get_required_object_permissions(self, method, model_cls):
+        """
+        Get the object permissions required for viewing records.
+        """
+        return super().get_required_object_permissions('GET', model_cls)
+
+
+class ArchiveMixin:
+    """
+    Viewset mixin for reading records which may have been moved to an archive table.
+
+    When archiving is enabled, listings include the archived records along
+    with the others, merged in order of creation, and detail lookups which
+    fail against the main table fall back to the archive.  Listings can be
+    limited to just the archive with an ``archived=true`` query parameter,
+    or to just the main table with ``archived=false``.  Permissions are
+    checked against the archive model when only it is being read.
+    """
+
+    archive_actions = ('retrieve',)
+    archived_queryset = None
+    archived = False
+    combined = False
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Determine which tables were requested before checking permissions.
+        """
+        archived = request.query_params.get('archived', '').lower()
+        self.archived = self.action == 'list' and archived == 'true'
+        self.combined = (self.action == 'list' and archived not in ('true', 'false')
+                         and settings.USER_TASKS_ARCHIVE_AGE is not None)
+        super().initial(request, *args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        """
+        Filter the queryset, combining it with the equally filtered archive queryset for listings of both.
+        """
+        queryset = super().filter_queryset(queryset)
+        if not self.combined:
+            return queryset
+        self.archived = True
+        try:
+            archived = super().filter_queryset(self.get_queryset())
+        finally:
+            self.archived = False
+        return CombinedQuerySet([queryset, archived])
+
+    def get_queryset(self):
+        """
+        Get the archive queryset instead of the main one if appropriate.
+        """
+        if self.archived:
+            return self.archived_queryset.all()
+        return super().get_queryset()
+
+    def get_object(self):
+        """
+        Look for the requested object in the archive if it isn't in the main table.
+        """
+        try:
+            return super().get_object()
+        except Http404:
+            if self.archived or self.action not in self.archive_actions or settings.USER_TASKS_ARCHIVE_AGE is None:
+                raise
+        self.archived = True
+        return super().get_object()
+
+
+def _events(user_id):
+    """
+    Generate the chunks of a Server-Sent Events stream of status change events for the given user.
+    """
+    subscription = get_backend().subscribe(user_id)
+    try:
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + settings.USER_TASKS_STREAM_MAX_DURATION
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = subscription.get(min(settings.USER_TASKS_STREAM_KEEPALIVE, remaining))
+            if not events:
+                yield ': keepalive\n\n'
+            for event in events:
+                yield format_event(event, 'status')
+    finally:
+        subscription.close()
+
+
+def _parse_since(value):
+    """
+    Parse the ISO 8601 timestamp of a ``since`` query parameter, assuming the current time zone if none is given.
+    """
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        since = None
+    if since is None:
+        raise ValidationError({'since': 'Must be an ISO 8601 timestamp.'})
+    if is_naive(since):
+        since = make_aware(since)
+    return since
+
+
+def _parse_uuids(values):
+    """
+    Parse a list of UUIDs requested by a client, up to ``settings.USER_TASKS_MAX_PAGE_SIZE`` of them.
+    """
+    if not isinstance(values, list) or len(values) > settings.USER_TASKS_MAX_PAGE_SIZE:
+        raise ValidationError({'uuid': f'Must be a list of at most {settings.USER_TASKS_MAX_PAGE_SIZE} UUIDs.'})
+    try:
+        return [UUID(str(value).strip()) for value in values]
+    except ValueError as error:
+        raise ValidationError({'uuid': 'Must be a list of valid UUIDs.'}) from error
+
+
+def _artifact_links(model):
+    """
+    Get a prefetch of just the artifact fields needed to serialize links to a list of statuses' artifacts.
+
+    Without it, listing statuses would run an extra query per status.
+    """
+    return Prefetch('artifacts', queryset=model.objects.only('uuid', 'status'))
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin which lets clients cheaply check whether status listings and details they've cached have changed.
+
+    Responses include ``ETag`` and ``Last-Modified`` headers derived from the
+    last modification times of the statuses and their artifacts.  Listings
+    also depend on the newest of the user's deletion tombstones, so that
+    deletions (and moves to or within the archive) are noticed too.  Requests
+    with a matching ``If-None-Match`` or ``If-Modified-Since`` header get an
+    empty 304 response without loading or serializing any records.  Only
+    records passing the filter backends are considered, so this reveals
+    nothing about records the user can't list.
+    """
+
+    def list(self, request, *args, **kwargs):
+        """
+        List the records, unless the client's copy of the listing is still current.
+        """
+        return self._conditional(request, self.get_list_versions(), super().list, *args, **kwargs)
+
+    def get_list_versions(self):
+        """
+        Get the watermarks which change whenever the requested listing does, in a single query per table.
+
+        Each is the maximum of an indexed column among the records of the
+        requesting user (or of all users for superusers), so they're found
+        without counting or joining records: the last modification of any of
+        the user's statuses, the creation of the user's newest artifact
+        (listings only link to artifacts), and the user's latest tombstone.
+        The listing's query parameter filters are deliberately ignored, since
+        a status which stops matching them (like a ``?state=Pending`` task
+        which succeeds) doesn't change the latest modification of those which
+        still do.  The latter two are uncorrelated subqueries, which the
+        database evaluates once.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        tombstones = UserTaskTombstone.objects.order_by()
+        if not self.request.user.is_superuser:
+            tombstones = tombstones.filter(user=self.request.user)
+        deleted = Subquery(tombstones.values(newest=Func('id', function='MAX')))
+        result = {'modified': None, 'artifacts_modified': None, 'deleted': None}
+        for statuses in getattr(queryset, 'querysets', [queryset]):
+            statuses = statuses.model.objects.order_by()
+            artifacts = statuses.model._meta.get_field('artifacts').related_model.objects.order_by()
+            if not self.request.user.is_superuser:
+                statuses = statuses.filter(user=self.request.user)
+                artifacts = artifacts.filter(user=self.request.user)
+            versions = statuses.aggregate(
+                modified=Max('modified'),
+                artifacts_modified=Max(Subquery(artifacts.values(newest=Func('created', function='MAX')))),
+                deleted=Max(deleted),
+            )
+            for name, value in versions.items():
+                if value is not None and (result[name] is None or value > result[name]):
+                    result[name] = value
+        return result
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Get the requested record, unless the client's copy of it is still current.
+        """
+        versions = self.get_versions()
+        if versions is None:
+            # Let the usual lookup produce the 404 (or find the record elsewhere)
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional(request, versions, super().retrieve, *args, **kwargs)
+
+    def get_versions(self):
+        """
+        Get the last modification times of the requested record and its artifacts, or None if it wasn't found.
+        """
+        lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        queryset = self.filter_queryset(self.get_queryset()).filter(**lookup).order_by().prefetch_related(None)
+        versions = list(queryset.values('modified').annotate(
+            artifacts_modified=Max('artifacts__modified'), count=Count('artifacts'))[:1])
+        return versions[0] if versions else None
+
+    @staticmethod
+    def _conditional(request, versions, view, *args, **kwargs):
+        """
+        Get a 304 response if the client's copy of the requested data is current, or the output of ``view`` if not.
+        """
+        timestamps = [versions[key] for key in ('modified', 'artifacts_modified') if versions[key] is not None]
+        latest = max(timestamps).timestamp() if timestamps else None
+        # HTTP dates only have a resolution of one second
+        last_modified = int(latest) if timestamps else None
+        # The response content also depends on the query parameters and the language of the state text
+        key = f'{request.get_full_path()}|{get_language()}|{versions.get("count")}|{versions.get("deleted")}|{latest}'
+        etag = quote_etag(md5(key.encode('utf-8'), usedforsecurity=False).hexdigest())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class SparseFieldsMixin:
+    """
+    Viewset mixin which lets clients request only some fields of each record via a ``fields`` query parameter.
+
+    For example, ``?fields=state,completed_steps,total_steps`` leaves out
+    everything but the progress of each task.  The unrequested fields are
+    removed from the serializer, and the database columns (and prefetched
+    relations) only they need aren't loaded at all.
+    """
+
+    # The actions which accept the fields parameter
+    sparse_actions = ('list', 'retrieve')
+    # Columns which are always loaded, for permission checks and pagination
+    sparse_required_columns = ('created',)
+    # The columns needed by serializer fields which aren't named after one
+    sparse_field_columns = {}
+    # The serializer fields which need the queryset's prefetched relations
+    sparse_prefetch_fields = ()
+    # The serializer fields which need the queryset's selected relations
+    sparse_related_fields = ()
+
+    @cached_property
+    def sparse_fields(self):
+        """
+        Get the names of the fields requested by the client, or None if all fields were implicitly requested.
+        """
+        if self.action not in self.sparse_actions or 'fields' not in self.request.query_params:
+            return None
+        fields = [name.strip() for name in self.request.query_params['fields'].split(',') if name.strip()]
+        allowed = self.get_serializer_class().Meta.fields
+        if not fields or not set(fields) <= set(allowed):
+            raise ValidationError({'fields': f'Must be a comma-separated list of fields from: {", ".join(allowed)}.'})
+        return fields
+
+    def get_queryset(self):
+        """
+        Load only the columns and relations needed for the requested fields.
+        """
+        queryset = super().get_queryset()
+        fields = self.sparse_fields
+        if fields is None:
+            return queryset
+        columns = set(self.sparse_required_columns)
+        for name in fields:
+            columns.update(self.sparse_field_columns.get(name, (name,)))
+        if not set(fields) & set(self.sparse_prefetch_fields):
+            queryset = queryset.prefetch_related(None)
+        if not set(fields) & set(self.sparse_related_fields):
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Get a serializer for just the requested fields.
+        """
+        if self.sparse_fields is not None:
+            kwargs['fields'] = self.sparse_fields
+        return super().get_serializer(*args, **kwargs)
+
+
+class FinishedCacheMixin:
+    """
+    Viewset mixin which caches records whose representation can no longer change, on both the server and the client.
+
+    Enabled by ``settings.USER_TASKS_FINISHED_MAX_AGE``.  Finished records
+    are kept in the cache named by ``settings.USER_TASKS_CACHE`` when first
+    retrieved, so later requests for them only need an object permission
+    check instead of any database queries, and responses for them include a
+    ``Cache-Control: private, max-age=<seconds>`` header.  A cached record
+    the permissions deny is reported as not found, like one excluded by the
+    filter backends would be, so its existence isn't revealed.
+    """
+
+    # The kind of record cached, for its cache key
+    record_kind = None
+    finished = False
+    _versions = None
+
+    def is_finished(self, instance):  # pylint: disable=unused-argument
+        """
+        Determine whether the given record's representation can no longer change.
+        """
+        return True
+
+    @cached_property
+    def cached_entry(self):
+        """
+        Get the cached copy of the requested record and its versions, if there is one.
+        """
+        if self.action != 'retrieve' or settings.USER_TASKS_FINISHED_MAX_AGE is None:
+            return None
+        return caches[settings.USER_TASKS_CACHE].get(self._record_key())
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Get the requested record, from the cache if possible.
+        """
+        entry = self.cached_entry
+        if entry is not None:
+            # Check permissions before a conditional request can skip loading the object
+            try:
+                self.check_object_permissions(request, entry['object'])
+            except PermissionDenied as error:
+                raise Http404 from error
+            self.finished = True
+        response = super().retrieve(request, *args, **kwargs)
+        if self.finished:
+            patch_cache_control(response, private=True, max_age=self.get_max_age())
+        return response
+
+    def get_max_age(self):
+        """
+        Get the number of seconds for which clients may cache the response for a finished record.
+        """
+        return settings.USER_TASKS_FINISHED_MAX_AGE
+
+    def get_versions(self):
+        """
+        Get the versions of the requested record for conditional requests, from the cache if possible.
+        """
+        if self.cached_entry is not None:
+            return self.cached_entry['versions']
+        self._versions = super().get_versions()
+        return self._versions
+
+    def get_object(self):
+        """
+        Get the requested record from the cache if possible, or cache it if it's finished.
+        """
+        if self.cached_entry is not None:
+            return self.cached_entry['object']
+        instance = super().get_object()
+        if self.action == 'retrieve' and settings.USER_TASKS_FINISHED_MAX_AGE is not None:
+            self.finished = self.is_finished(instance)
+            # Records loaded with deferred fields would need more queries to serialize in full
+            if self.finished and self.sparse_fields is None:
+                entry = {'object': instance, 'versions': self._versions}
+                caches[settings.USER_TASKS_CACHE].set(self._record_key(), entry, settings.USER_TASKS_FINISHED_MAX_AGE)
+        return instance
+
+    def _record_key(self):
+        """
+        Get the cache key for the requested record.
+        """
+        return cached_record_key(self.record_kind, self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+
+
+class FastStatusListMixin:
+    """
+    Viewset mixin which lists statuses via :py:class:`user_tasks.serializers.StatusRowSerializer` when enabled.
+
+    Enabled by ``settings.USER_TASKS_FAST_STATUS_LIST``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        """
+        List the statuses from ``QuerySet.values()`` rows if enabled, or as usual if not.
+        """
+        if not settings.USER_TASKS_FAST_STATUS_LIST:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        artifact_models = [
+            statuses.model._meta.get_field('artifacts').related_model
+            for statuses in getattr(queryset, 'querysets', [queryset])
+        ]
+        serializer = StatusRowSerializer(artifact_models, fields=self.sparse_fields,
+                                         context=self.get_serializer_context())
+        rows = queryset.prefetch_related(None).values(*serializer.columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
+
+
+class PaginationMixin:
+    """
+    Viewset mixin which paginates listings as configured by ``settings.USER_TASKS_PAGINATION_CLASS``.
+    """
+
+    @property
+    def pagination_class(self):
+        """
+        Get the pagination class to use for listings.
+        """
+        return settings.USER_TASKS_PAGINATION_CLASS
+
+
 class StatusViewSet(
+        SparseFieldsMixin,
+        ArchiveMixin,
+        FinishedCacheMixin,
+        ConditionalGetMixin,
+        FastStatusListMixin,
+        PaginationMixin,
         mixins.DestroyModelMixin,
         mixins.ListModelMixin,
         mixins.RetrieveModelMixin,
@@ -45,14 +511,53 @@ class StatusViewSet(
     REST API endpoints for user-triggered asynchronous tasks.
 
     The status of a task can be viewed, listed, deleted, or used to cancel the
-    underlying task.
+    underlying task.  Archived statuses can be viewed, listed, and deleted.
     """
 
+    archive_actions = ('retrieve', 'destroy', 'tree')
+    archived_queryset = ArchivedUserTaskStatus.objects.order_by('-created').prefetch_related(
+        _artifact_links(ArchivedUserTaskArtifact))
     filter_backends = settings.USER_TASKS_STATUS_FILTERS
     lookup_field = 'uuid'
     permission_classes = (DjangoObjectPermissionsIncludingView,)
-    queryset = UserTaskStatus.objects.order_by('-created')
+    queryset = UserTaskStatus.objects.order_by('-created').prefetch_related(_artifact_links(UserTaskArtifact))
+    record_kind = 'status'
     serializer_class = StatusSerializer
+    sparse_actions = ('list', 'retrieve', 'changes', 'lookup')
+    sparse_field_columns = {'artifacts': (), 'state_text': ('state',)}
+    sparse_prefetch_fields = ('artifacts',)
+    sparse_required_columns = ('created', 'modified', 'user')
+
+    def filter_queryset(self, queryset):
+        """
+        Apply the configured filter backends, and for listings any comma-separated ``uuid`` query parameter.
+        """
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and 'uuid' in self.request.query_params:
+            queryset = queryset.filter(uuid__in=_parse_uuids(self.request.query_params['uuid'].split(',')))
+        return queryset
+
+    def is_finished(self, instance):
+        """
+        Determine whether the given status's task has stopped running for good.
+        """
+        return instance.state in UserTaskStatus.TERMINAL_STATES
+
+    def perform_destroy(self, instance):
+        """
+        Delete the status record, along with any artifact files of it and the statuses nested in it.
+        """
+        names = []
+        statuses = type(instance).objects.filter(pk=instance.pk)
+        if settings.USER_TASKS_DELETE_ARTIFACT_FILES:
+            names = artifact_file_names(statuses)
+        if settings.USER_TASKS_FINISHED_MAX_AGE is not None:
+            statuses = statuses.with_descendants()
+            artifacts = statuses.model._meta.get_field('artifacts').related_model.objects.filter(status__in=statuses)
+            forget_records(list(statuses.values_list('uuid', flat=True)),
+                           list(artifacts.values_list('uuid', flat=True)))
+        instance.delete()
+        transaction.on_commit(lambda: delete_artifact_files(names))
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, *args, **kwargs):
@@ -71,8 +576,234 @@ class StatusViewSet(
         serializer = StatusSerializer(status, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='cancel')
+    def bulk_cancel(self, request, *args, **kwargs):
+        """
+        Cancel the tasks of all the matching status records which haven't already finished running.
+
+        Statuses are selected by the configured filter backends rather than
+        by per-object permission checks, then canceled via
+        :py:meth:`user_tasks.models.UserTaskStatusQuerySet.cancel` with a
+        single ``UPDATE`` and Celery revoke broadcast.
+
+        Arguments:
+            request (Request): A POST with a JSON body containing ``uuids`` (a list of status UUIDs), ``state`` (a
+                state or list of states), or both
+
+        Returns:
+            Response: A JSON object with a ``canceled`` list of the UUIDs of the canceled statuses
+
+        """
+        data = request.data if isinstance(request.data, dict) else {}
+        if 'uuids' not in data and 'state' not in data:
+            raise ValidationError({'uuids': 'Either uuids or state must be given.'})
+        statuses = self.filter_queryset(self.get_queryset())
+        if 'uuids' in data:
+            statuses = statuses.filter(uuid__in=_parse_uuids(data['uuids']))
+        if 'state' in data:
+            states = data['state'] if isinstance(data['state'], list) else [data['state']]
+            statuses = statuses.filter(state__in=[str(state) for state in states])
+        canceled = statuses.order_by().cancel()
+        return Response({'canceled': [str(status.uuid) for status in canceled]})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request, *args, **kwargs):
+        """
+        Get the statuses which changed and the UUIDs of those which were deleted since the client's last sync.
+
+        Clients keeping a local copy of their task statuses should pass the
+        ``cursor`` from the previous response as the ``since`` query
+        parameter; without one, all current statuses are returned.  Up to
+        ``settings.USER_TASKS_PAGE_SIZE`` of each are returned per request;
+        if ``more`` is true, the client should immediately request the
+        rest.  Statuses deleted or moved to the archive are reported in
+        ``deleted``.  Cursors older than ``settings.USER_TASKS_TOMBSTONE_MAX_AGE``
+        get a 410 response, since deletions made since then may have been
+        forgotten.
+
+        Arguments:
+            request (Request): A GET with an optional ``since`` query parameter
+
+        Returns:
+            Response: A JSON object with ``changed``, ``deleted``, ``cursor``, and ``more`` fields
+
+        """
+        token = request.query_params.get('since')
+        if token:
+            try:
+                cursor = decode_cursor(token)
+            except ValueError as error:
+                raise ValidationError({'since': 'Must be a cursor from a previous response.'}) from error
+            if cursor.issued < now() - settings.USER_TASKS_TOMBSTONE_MAX_AGE:
+                raise CursorExpired()
+        else:
+            cursor = initial_cursor()
+        tombstones = UserTaskTombstone.objects.all()
+        if not request.user.is_superuser:
+            tombstones = tombstones.filter(user=request.user)
+        changed, deleted, cursor, more = changes_since(
+            self.filter_queryset(self.get_queryset()), tombstones, cursor, settings.USER_TASKS_PAGE_SIZE)
+        return Response({
+            'changed': self.get_serializer(changed, many=True).data,
+            'deleted': [str(tombstone.uuid) for tombstone in deleted],
+            'cursor': encode_cursor(cursor),
+            'more': more,
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=(DjangoObjectViewPermissions,))
+    def lookup(self, request, *args, **kwargs):
+        """
+        Get all the requested status records visible to the user in a single query.
+
+        An alternative to ``GET tasks/?uuid=<uuid>,<uuid>,...`` for sets of
+        UUIDs too large for a URL.  Records are selected by the configured
+        filter backends rather than by per-object permission checks; requested
+        statuses which don't exist or aren't visible to the user are omitted.
+
+        Arguments:
+            request (Request): A POST with a JSON body like ``{"uuids": ["<uuid>", ...]}``
+
+        Returns:
+            Response: A JSON list of the serialized statuses, newest first
+
+        """
+        uuids = _parse_uuids(request.data.get('uuids') if isinstance(request.data, dict) else None)
+        statuses = self.filter_queryset(self.get_queryset()).filter(uuid__in=uuids)
+        serializer = self.get_serializer(statuses, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], renderer_classes=(EventStreamRenderer, JSONRenderer))
+    def stream(self, request, *args, **kwargs):
+        """
+        Stream Server-Sent Events describing each change to the requesting user's task statuses.
+
+        Each ``status`` event contains the ``uuid``, ``state``,
+        ``completed_steps``, ``total_steps``, and ``modified`` values of a
+        status as of a change to it.  Events come from the publish/subscribe
+        backend configured by ``settings.USER_TASKS_EVENT_BACKEND``.  Comments
+        are sent every ``settings.USER_TASKS_STREAM_KEEPALIVE`` idle seconds to
+        keep the connection open, and the stream ends after
+        ``settings.USER_TASKS_STREAM_MAX_DURATION`` seconds; clients should then
+        reconnect (as browsers' ``EventSource`` does automatically), fetching
+        the current statuses if any events may have been missed in between.
+
+        Arguments:
+            request (Request): A GET request, typically with an ``Accept: text/event-stream`` header
+
+        Returns:
+            StreamingHttpResponse: The ``text/event-stream`` response, or a 404 if no event backend is configured
+
+        """
+        if get_backend() is None:
+            raise Http404('Task status event streaming is not enabled.')
+        response = StreamingHttpResponse(_events(request.user.id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Don't let nginx hold events back in its buffer
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request, *args, **kwargs):
+        """
+        Get the number of statuses the user can see in each state.
+
+        Counted by a single query grouped by state, which the index on
+        ``(user, state, ...)`` answers without reading the table itself.  The
+        counts for a user's own tasks are cached for up to
+        ``settings.USER_TASKS_SUMMARY_TIMEOUT`` seconds, and discarded whenever
+        one of those tasks changes; requests with filtering query parameters
+        and requests by superusers (who can see everyone's tasks) are always
+        counted afresh.
+
+        Arguments:
+            request (Request): A GET, optionally with the same filtering query parameters as a listing
+
+        Returns:
+            Response: A JSON object mapping each state to its number of statuses, including zeroes for the standard
+            states
+
+        """
+        cache = caches[settings.USER_TASKS_CACHE]
+        key = cached_summary_key(request.user.pk)
+        cacheable = not request.query_params and not request.user.is_superuser
+        counts = cache.get(key) if cacheable else None
+        if counts is None:
+            statuses = self.filter_queryset(self.get_queryset()).order_by().prefetch_related(None)
+            counts = dict.fromkeys(UserTaskStatus.STATE_TRANSLATIONS, 0)
+            counts.update(statuses.values_list('state').annotate(count=Count('pk')))
+            if cacheable:
+                cache.set(key, counts, settings.USER_TASKS_SUMMARY_TIMEOUT)
+        return Response(counts)
+
+    @action(detail=True, methods=['get'])
+    def tree(self, request, *args, **kwargs):
+        """
+        Get the specified status record with all the statuses nested inside it.
 
-class ArtifactViewSet(viewsets.ReadOnlyModelViewSet):
+        The status's whole tree is loaded via the ``root`` field shared by all
+        its members, with the links to all of their artifacts prefetched, so
+        the number of queries doesn't depend on the size or depth of the tree.
+
+        Arguments:
+            request (Request): A GET including a task status record ID
+
+        Returns:
+            Response: The serialized status with its ``uuid``, and a ``children`` list of the similarly serialized
+            statuses directly inside it
+
+        """
+        status = self.get_object()
+        model = type(status)
+        root_id = status.root_id or status.pk
+        members = model.objects.filter(Q(pk=root_id) | Q(root_id=root_id)).order_by('created', 'pk').prefetch_related(
+            _artifact_links(model._meta.get_field('artifacts').related_model))
+        children = {}
+        for member in members:
+            if member.pk == status.pk:
+                status = member
+            children.setdefault(member.parent_id, []).append(member)
+        context = self.get_serializer_context()
+        context['children'] = children
+        return Response(StatusTreeSerializer(status, context=context).data)
+
+    @action(detail=True, methods=['get'])
+    def wait(self, request, *args, **kwargs):
+        """
+        Wait until the specified status record has been modified since the client last saw it, then get it.
+
+        Changes are detected via notifications in the cache configured by
+        ``settings.USER_TASKS_CACHE``, so waiting clients don't query the
+        database until there's something new to return.
+
+        Arguments:
+            request (Request): A GET with a ``since`` query parameter containing the ``modified`` value of the
+                status as last seen by the client, and optionally a ``timeout`` in seconds (30 by default, up to
+                ``settings.USER_TASKS_WAIT_MAX_TIMEOUT``)
+
+        Returns:
+            Response: The serialized status, which is unchanged if the timeout expired first
+
+        """
+        since = _parse_since(request.query_params.get('since', ''))
+        try:
+            timeout = float(request.query_params.get('timeout', 30))
+        except ValueError as error:
+            raise ValidationError({'timeout': 'Must be a number of seconds.'}) from error
+        timeout = max(0, min(timeout, settings.USER_TASKS_WAIT_MAX_TIMEOUT))
+        status = self.get_object()
+        if status.modified <= since and wait_for_change(status.uuid, since, timeout):
+            status = self.get_object()
+        serializer = self.get_serializer(status)
+        return Response(serializer.data)
+
+
+class ArtifactViewSet(
+        SparseFieldsMixin,
+        ArchiveMixin,
+        FinishedCacheMixin,
+        PaginationMixin,
+        viewsets.ReadOnlyModelViewSet
+):
     """
     REST API endpoints for asynchronous task artifacts.
 
@@ -80,8 +811,48 @@ class ArtifactViewSet(viewsets.ReadOnlyModelViewSet):
     this API.
     """
 
+    archive_actions = ('retrieve', 'download')
+    archived_queryset = ArchivedUserTaskArtifact.objects.select_related('status')
     filter_backends = settings.USER_TASKS_ARTIFACT_FILTERS
     lookup_field = 'uuid'
     permission_classes = (DjangoObjectPermissionsIncludingView,)
-    queryset = UserTaskArtifact.objects.all()
+    queryset = UserTaskArtifact.objects.select_related('status')
+    record_kind = 'artifact'
     serializer_class = ArtifactSerializer
+    sparse_field_columns = {'status': ('status__uuid',)}
+    sparse_related_fields = ('status',)
+    sparse_required_columns = ('created', 'user')
+
+    def get_max_age(self):
+        """
+        Get the number of seconds for which clients may cache the response for a finished artifact.
+
+        The response includes the storage URL of the artifact's file, which
+        may have been cached for up to ``settings.USER_TASKS_FILE_URL_TIMEOUT``
+        seconds already, so clients can't cache it for any longer than that.
+        """
+        max_age = settings.USER_TASKS_FINISHED_MAX_AGE
+        if settings.USER_TASKS_FILE_URL_TIMEOUT is not None:
+            max_age = min(max_age, settings.USER_TASKS_FILE_URL_TIMEOUT)
+        return max_age
+
+    @action(detail=True, methods=['get'], renderer_classes=(JSONRenderer, DownloadRenderer))
+    def download(self, request, *args, **kwargs):
+        """
+        Download the file of the specified artifact.
+
+        The file is streamed from storage (honoring a ``Range`` header) rather
+        than read into memory, or handed off to the web server if
+        ``settings.USER_TASKS_SENDFILE_HEADER`` is set.
+
+        Arguments:
+            request (Request): A GET including an artifact ID
+
+        Returns:
+            HttpResponse: The file content as an attachment, or a 404 if the artifact has no file
+
+        """
+        artifact = self.get_object()
+        if not artifact.file:
+            raise Http404('The artifact has no file.')
+        return file_response(request, artifact.file)